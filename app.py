@@ -1,8 +1,11 @@
 import streamlit as st
 
+import instrumentacion
+
 pages = {
     "Resultados": [
         st.Page("conteos.py", title="Conteos"),
+        st.Page("mapa_items.py", title="Mapa de items"),
         st.Page("conteos_items.py", title="Conteos por criterio"),
         #st.Page("conteos_procesos.py", title="Conteos por proceso"),
         st.Page("conteos_no_ponderados.py", title="Conteos no ponderados"),
@@ -12,8 +15,18 @@ pages = {
         st.Page("perfiles.py", title="Perfiles"),
         st.Page("perfiles_uni.py", title="Perfiles unidimensional"),
         #st.Page("items.py",   title="Items"),
-    ]
+    ],
+    "Diagnóstico": [
+        st.Page("cargas.py", title="Carga de datos"),
+    ],
 }
 
 pg = st.navigation(pages)
-pg.run()
+# Cada rerun completo queda registrado; el panel y el log json se activan
+# desde la barra lateral. Streamlit detiene un rerun con una excepción que sale
+# de pg.run(), igual que los errores de la página; el registro se cierra siempre
+instrumentacion.iniciar(pg.title)
+try:
+    pg.run()
+finally:
+    instrumentacion.terminar()
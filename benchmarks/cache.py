@@ -0,0 +1,84 @@
+"""Compara el costo por rerun de st.cache_data contra datos.compartido.
+
+Uso, desde la raíz del repositorio:
+    python -m benchmarks.cache [--repeticiones 200]
+
+st.cache_data guarda el resultado serializado y lo deserializa (una copia
+completa del dataframe) cada vez que la función se llama en un rerun.
+datos.compartido devuelve un clon superficial de los mismos buffers, por lo
+que el costo no depende del tamaño del archivo.
+"""
+
+import argparse
+import pickle
+import time
+
+import polars as pl
+import streamlit as st
+
+import datos
+
+ARCHIVOS = ["st_conteo", "item_conteo_ponderado", "item_irt", "personas_dist"]
+
+
+@st.cache_data(show_spinner=False)
+def leer_copia(ruta: str) -> pl.DataFrame:
+    return pl.read_parquet(ruta)
+
+
+@datos.compartido(show_spinner=False)
+def leer_compartido(ruta: str) -> pl.DataFrame:
+    return pl.read_parquet(ruta)
+
+
+def medir(funcion, ruta: str, repeticiones: int) -> float:
+    """Milisegundos promedio por llamada con la caché ya caliente."""
+    funcion(ruta)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(ruta)
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def comparten_buffers(ruta: str) -> bool:
+    """Verifica que dos llamadas apunten a la misma memoria en las columnas numéricas."""
+    uno = leer_compartido(ruta)
+    dos = leer_compartido(ruta)
+    numericas = [
+        i for i in uno.columns if uno[i].dtype.is_numeric() and uno[i].null_count() == 0
+    ]
+    return all(
+        uno[i].to_numpy(allow_copy=False).ctypes.data
+        == dos[i].to_numpy(allow_copy=False).ctypes.data
+        for i in numericas
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+
+    filas = []
+    for nombre in ARCHIVOS:
+        ruta = datos.RUTAS[nombre]
+        data = pl.read_parquet(ruta)
+        filas.append(
+            dict(
+                datos=nombre,
+                megabytes=data.estimated_size() / 1024**2,
+                bytes_copiados_cache_data=len(pickle.dumps(data)),
+                ms_cache_data=medir(leer_copia, ruta, args.repeticiones),
+                ms_compartido=medir(leer_compartido, ruta, args.repeticiones),
+                sin_copia=comparten_buffers(ruta),
+            )
+        )
+    resultado = pl.DataFrame(filas).with_columns(
+        aceleracion=pl.col("ms_cache_data") / pl.col("ms_compartido")
+    )
+    with pl.Config(tbl_cols=-1, tbl_width_chars=200, float_precision=4):
+        print(resultado)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Tiempos de calibracion.py con respuestas sintéticas a escala nacional.
+
+Uso, desde la raíz del repositorio:
+    python -m benchmarks.calibracion [--alumnos 250000] [--procesos 4]
+    python -m benchmarks.calibracion --alumnos 20000 --maximo 3 --guardar
+
+Para cada EIA de item_irt_eia.parquet se simulan las respuestas de `alumnos`
+alumnos con el modelo de crédito parcial, con las dificultades del archivo
+como umbrales verdaderos y habilidades normales con desviación estándar 1.
+Una fracción --faltantes de las respuestas se quita al azar. Las respuestas se
+escriben en un archivo por EIA y se calibran con calibracion.calibrar.
+
+Se informa el tiempo de lectura y de estimación de cada EIA, el tiempo total, y
+qué tanto se recuperan los umbrales (error cuadrático medio, en puntos de la
+escala) y las habilidades (correlación con las verdaderas).
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import polars as pl
+
+import calibracion
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_RESULTADOS = "benchmarks/resultados/calibracion.json"
+
+
+def umbrales_verdaderos(maximo: int | None = None) -> pl.DataFrame:
+    """Dificultades de item_irt_eia con el nivel y EIA de cada item."""
+    diccionario = (
+        pl.read_parquet(os.path.join(RAIZ_REPO, "data/diccionario.parquet"))
+        .select(["item", "nivel", "eia"])
+        .unique()
+    )
+    irt = pl.read_parquet(os.path.join(RAIZ_REPO, "data/item_irt_eia.parquet")).join(
+        diccionario, on="item"
+    )
+    grupos = irt.select(calibracion.LLAVES).unique().sort(calibracion.LLAVES)
+    if maximo:
+        grupos = grupos.head(maximo)
+    return irt.join(grupos, on=calibracion.LLAVES).sort([*calibracion.LLAVES, "item", "resp"])
+
+
+def simular(
+    umbrales: pl.DataFrame, alumnos: int, faltantes: float, semilla: int
+) -> tuple:
+    """Respuestas de un EIA en formato largo y la habilidad verdadera de cada alumno."""
+    rng = np.random.default_rng(semilla)
+    items = umbrales["item"].unique(maintain_order=True)
+    logits = (
+        (umbrales["dificultad"].to_numpy() - calibracion.MEDIA_ESCALA)
+        / calibracion.DE_ESCALA
+    ).reshape(len(items), calibracion.CATEGORIAS - 1)
+    theta = rng.normal(0, 1, alumnos)
+    probabilidad = np.exp(calibracion.log_probabilidades(logits, theta))
+    acumulada = np.cumsum(probabilidad, axis=1)[:, :-1, :]
+    categoria = (rng.random((len(items), 1, alumnos)) > acumulada).sum(axis=1)
+    respondida = rng.random(categoria.shape) >= faltantes
+    item, persona = np.nonzero(respondida)
+    fila = umbrales.row(0, named=True)
+    nivel, grado, eia = (fila[i] for i in calibracion.LLAVES)
+    respuestas = pl.DataFrame(
+        {
+            "persona": persona.astype(np.int32),
+            "nivel": nivel,
+            "grado": grado,
+            "eia": eia,
+            "item": items.to_numpy()[item],
+            "resp": np.array(calibracion.RESPUESTAS)[categoria[item, persona]],
+        }
+    ).with_columns(
+        pl.col("item").cast(pl.Categorical),
+        pl.col("resp").cast(pl.Enum(calibracion.RESPUESTAS)),
+    )
+    verdaderas = pl.DataFrame(
+        {
+            "persona": np.arange(alumnos, dtype=np.int32),
+            "nivel": nivel,
+            "grado": grado,
+            "eia": eia,
+            "theta": theta,
+        }
+    )
+    return respuestas, verdaderas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alumnos", type=int, default=250_000)
+    parser.add_argument("--faltantes", type=float, default=0.05)
+    parser.add_argument("--maximo", type=int, help="Número máximo de EIA")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count())
+    parser.add_argument("--salida", help="Directorio de trabajo, por omisión temporal")
+    parser.add_argument("--guardar", action="store_true")
+    args = parser.parse_args()
+    salida = args.salida or tempfile.mkdtemp(prefix="calibracion_")
+
+    inicio = time.perf_counter()
+    verdaderos = umbrales_verdaderos(args.maximo)
+    os.makedirs(os.path.join(salida, "respuestas"), exist_ok=True)
+    habilidades = []
+    for numero, (_, umbrales) in enumerate(
+        verdaderos.group_by(calibracion.LLAVES, maintain_order=True)
+    ):
+        respuestas, verdaderas = simular(
+            umbrales, args.alumnos, args.faltantes, semilla=numero
+        )
+        respuestas.write_parquet(
+            os.path.join(salida, "respuestas", f"{numero:03d}.parquet")
+        )
+        habilidades.append(verdaderas)
+    simulacion = time.perf_counter() - inicio
+    print(f"Respuestas simuladas en {salida} en {simulacion:.1f} s")
+
+    inicio = time.perf_counter()
+    tiempos = pl.DataFrame(
+        calibracion.calibrar(
+            os.path.join(salida, "respuestas", "*.parquet"),
+            os.path.join(salida, "calibracion"),
+            args.procesos,
+        )
+    )
+    total = time.perf_counter() - inicio
+
+    # Recuperación de los parámetros verdaderos
+    estimados = pl.read_parquet(
+        os.path.join(salida, "calibracion", "item_irt_eia.parquet")
+    )
+    umbrales = verdaderos.join(
+        estimados, on=["item", "grado", "resp"], suffix="_estimada"
+    ).group_by(calibracion.LLAVES).agg(
+        rmse_umbrales=(
+            (pl.col("dificultad_estimada") - pl.col("dificultad")).pow(2).mean().sqrt()
+        )
+    )
+    puntajes = pl.read_parquet(
+        os.path.join(salida, "calibracion", "personas_puntajes.parquet")
+    )
+    correlaciones = (
+        pl.concat(habilidades)
+        .join(puntajes, on=["persona", *calibracion.LLAVES])
+        .group_by(calibracion.LLAVES)
+        .agg(correlacion_theta=pl.corr("theta", "puntaje"))
+    )
+    resultado = tiempos.join(umbrales, on=calibracion.LLAVES).join(
+        correlaciones, on=calibracion.LLAVES
+    )
+    with pl.Config(tbl_cols=-1, tbl_rows=-1, tbl_width_chars=200, float_precision=2):
+        print(resultado.with_columns(pl.col("eia").str.slice(0, 30)))
+    print(
+        f"{tiempos['alumnos'].sum()} alumnos, {tiempos.height} EIA, "
+        f"{args.procesos} procesos: {total:.1f} s"
+    )
+    if args.guardar:
+        ruta = os.path.join(RAIZ_REPO, RUTA_RESULTADOS)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump(
+                dict(total=total, eia=resultado.to_dicts()),
+                archivo,
+                indent=1,
+                ensure_ascii=False,
+            )
+        print(f"Resultados escritos en {ruta}")
+
+
+if __name__ == "__main__":
+    main()
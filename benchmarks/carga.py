@@ -0,0 +1,358 @@
+"""Prueba de carga con sesiones concurrentes contra un servidor local de Streamlit.
+
+Uso, desde la raíz del repositorio:
+    python -m benchmarks.carga [--sesiones 1 5 10 25] [--acciones 20]
+    python -m benchmarks.carga --raiz /tmp/ed24_x10     # datos sintéticos
+    python -m benchmarks.carga --url ws://localhost:8501/_stcore/stream
+
+Levanta `streamlit run app.py` en un puerto local y, para cada cantidad de
+sesiones, abre esa cantidad de conexiones al websocket de Streamlit, como lo
+haría el navegador. Cada sesión abre una página y repite clics realistas:
+cambios de grado, de EIA, del orden de las gráficas, casillas y arrastres
+del punto de corte en perfiles.py. Los controles dentro de un fragmento solo
+vuelven a ejecutar ese fragmento, igual que en el navegador.
+
+Para cada nivel de concurrencia se informa la latencia p50/p95/p99 de los
+reruns (desde que se envía el clic hasta que termina el script) y la memoria
+residente máxima del servidor. Antes de medir se abre cada página una vez
+para que las cachés compartidas estén llenas.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+
+import polars as pl
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.Slider_pb2 import Slider
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.asyncio.client import connect
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_RESULTADOS = "benchmarks/resultados/carga.json"
+PUERTO = 8599
+# Controles que cambia cada sesión según la página, como (tipo de elemento en
+# el proto, etiqueta). La página se identifica por su ruta en la url
+ESCENARIOS = {
+    "": [
+        ("selectbox", "Grado"),
+        ("radio", "Ordenar por:"),
+        ("checkbox", "Ver tabla de especificaciones."),
+    ],
+    "conteos_no_ponderados": [
+        ("selectbox", "EIA"),
+        ("button_group", "Sección"),
+    ],
+    "conteos_ponderados_polars": [
+        ("selectbox", "Servicio"),
+        ("selectbox", "EIA"),
+        ("button_group", "Sección"),
+    ],
+    "medias": [
+        ("selectbox", "Grado"),
+        ("multiselect", "EIA"),
+        ("radio", "Ordenar por:"),
+    ],
+    "irt": [
+        ("selectbox", "Grado"),
+        ("multiselect", "EIA"),
+        ("radio", "Ordenar por:"),
+    ],
+    "perfiles": [
+        ("selectbox", "Grado"),
+        ("multiselect", "EIA"),
+        ("slider", "Punto de corte"),
+        ("slider", "Punto de corte"),
+    ],
+}
+
+
+class Sesion:
+    """Una pestaña del navegador conectada al websocket de Streamlit."""
+
+    def __init__(self, url: str, pagina: str, semilla: int):
+        self.url = url
+        self.pagina = pagina
+        self.azar = random.Random(semilla)
+        self.conexion = None
+        # Elemento de cada posición de la página: (tipo, proto, fragmento)
+        self.elementos = {}
+        # Último valor enviado de cada widget, por id
+        self.estados = {}
+        self.latencias = []
+
+    async def abrir(self):
+        self.conexion = await connect(
+            self.url, subprotocols=["streamlit"], max_size=None
+        )
+        await self.rerun("carga")
+
+    async def cerrar(self):
+        await self.conexion.close()
+
+    async def rerun(self, accion: str, fragmento: str = ""):
+        """Envía un rerun con el estado de los widgets y espera a que termine."""
+        mensaje = BackMsg()
+        mensaje.rerun_script.page_name = self.pagina
+        mensaje.rerun_script.fragment_id = fragmento
+        mensaje.rerun_script.widget_states.widgets.extend(self.estados.values())
+        if fragmento:
+            # Solo se vuelven a dibujar los elementos del fragmento
+            self.elementos = {
+                i: j for i, j in self.elementos.items() if j[2] != fragmento
+            }
+        else:
+            self.elementos = {}
+        errores = 0
+        inicio = time.perf_counter()
+        await self.conexion.send(mensaje.SerializeToString())
+        while True:
+            recibido = ForwardMsg.FromString(await self.conexion.recv())
+            tipo = recibido.WhichOneof("type")
+            if tipo == "delta" and recibido.delta.HasField("new_element"):
+                elemento = recibido.delta.new_element
+                tipo_elemento = elemento.WhichOneof("type")
+                errores += tipo_elemento == "exception"
+                self.elementos[tuple(recibido.metadata.delta_path)] = (
+                    tipo_elemento,
+                    getattr(elemento, tipo_elemento),
+                    recibido.delta.fragment_id,
+                )
+            elif tipo == "script_finished":
+                terminado = recibido.script_finished
+                errores += terminado not in (
+                    ForwardMsg.FINISHED_SUCCESSFULLY,
+                    ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+                )
+                break
+        self.latencias.append(
+            dict(
+                pagina=self.pagina or "conteos",
+                accion=accion,
+                ms=(time.perf_counter() - inicio) * 1000,
+                errores=errores,
+            )
+        )
+
+    def buscar(self, tipo: str, etiqueta: str) -> list:
+        return [
+            (proto, fragmento)
+            for tipo_elemento, proto, fragmento in self.elementos.values()
+            if tipo_elemento == tipo and proto.label == etiqueta
+        ]
+
+    def nuevo_estado(self, tipo: str, proto) -> WidgetState | None:
+        """Valor que enviaría el navegador tras un clic del usuario en el widget."""
+        anterior = self.estados.get(proto.id)
+        estado = WidgetState(id=proto.id)
+        if tipo in ("selectbox", "radio"):
+            if len(proto.options) < 2:
+                return None
+            estado.string_value = self.azar.choice(list(proto.options))
+        elif tipo == "multiselect":
+            if not proto.options:
+                return None
+            cantidad = self.azar.randint(1, len(proto.options))
+            estado.string_array_value.data.extend(
+                self.azar.sample(list(proto.options), cantidad)
+            )
+        elif tipo == "button_group":
+            opciones = [i.content for i in proto.options]
+            estado.string_array_value.data.append(self.azar.choice(opciones))
+        elif tipo == "checkbox":
+            estado.bool_value = not (anterior.bool_value if anterior else False)
+        elif tipo == "slider" and proto.type == Slider.SELECT_SLIDER:
+            # Un arrastre corto desde la posición actual
+            opciones = list(proto.options)
+            posicion = int(proto.default[0])
+            if anterior and anterior.string_array_value.data[0] in opciones:
+                # Con key el id se conserva aunque cambien las opciones
+                posicion = opciones.index(anterior.string_array_value.data[0])
+            posicion += self.azar.choice([-3, -2, -1, 1, 2, 3])
+            posicion = min(max(posicion, 0), len(opciones) - 1)
+            estado.string_array_value.data.append(opciones[posicion])
+        else:
+            return None
+        return estado
+
+    async def clic(self):
+        """Cambia uno de los controles del escenario de la página."""
+        tipo, etiqueta = self.azar.choice(ESCENARIOS[self.pagina])
+        candidatos = self.buscar(tipo, etiqueta)
+        if not candidatos:
+            return
+        proto, fragmento = self.azar.choice(candidatos)
+        estado = self.nuevo_estado(tipo, proto)
+        if estado is None:
+            return
+        self.estados[proto.id] = estado
+        await self.rerun(f"{tipo} {etiqueta}", fragmento)
+
+
+async def usuario(sesion: Sesion, acciones: int, pausa: float):
+    """Abre la página y hace `acciones` clics con pausas entre ellos."""
+    await asyncio.sleep(sesion.azar.uniform(0, pausa))
+    await sesion.abrir()
+    try:
+        for _ in range(acciones):
+            await asyncio.sleep(sesion.azar.uniform(0, 2 * pausa))
+            await sesion.clic()
+    finally:
+        await sesion.cerrar()
+
+
+def memoria_proceso(pid: int | None) -> float | None:
+    """Megabytes de memoria residente del proceso, None fuera de Linux."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as archivo:
+            for linea in archivo:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def muestrear_memoria(pid: int | None, muestras: list):
+    while True:
+        muestras.append(memoria_proceso(pid))
+        await asyncio.sleep(0.2)
+
+
+async def nivel(
+    url: str, pid: int | None, sesiones: int, acciones: int, pausa: float
+) -> tuple[list, float | None]:
+    """Ejecuta `sesiones` usuarios a la vez, repartidos entre las páginas."""
+    paginas = list(ESCENARIOS)
+    grupo = [
+        Sesion(url, paginas[i % len(paginas)], semilla=sesiones * 1000 + i)
+        for i in range(sesiones)
+    ]
+    muestras = []
+    muestreo = asyncio.create_task(muestrear_memoria(pid, muestras))
+    try:
+        await asyncio.gather(*(usuario(i, acciones, pausa) for i in grupo))
+    finally:
+        muestreo.cancel()
+    muestras = [i for i in muestras if i is not None]
+    latencias = [dict(sesiones=sesiones, **j) for i in grupo for j in i.latencias]
+    return latencias, max(muestras, default=None)
+
+
+async def calentar(url: str):
+    """Abre cada página una vez, sin medir, para llenar las cachés."""
+    for pagina in ESCENARIOS:
+        sesion = Sesion(url, pagina, semilla=0)
+        await sesion.abrir()
+        await sesion.cerrar()
+
+
+def iniciar_servidor(raiz: str, puerto: int) -> subprocess.Popen:
+    """Levanta la app en `raiz` y espera a que responda."""
+    servidor = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "streamlit",
+            "run",
+            os.path.join(RAIZ_REPO, "app.py"),
+            "--server.headless=true",
+            f"--server.port={puerto}",
+            "--browser.gatherUsageStats=false",
+        ],
+        cwd=raiz,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(120):
+        try:
+            urllib.request.urlopen(f"http://localhost:{puerto}/_stcore/health")
+            return servidor
+        except OSError:
+            time.sleep(0.5)
+    servidor.terminate()
+    raise RuntimeError("El servidor de Streamlit no respondió")
+
+
+def percentiles(latencias: pl.DataFrame, *grupo: str) -> pl.DataFrame:
+    return (
+        latencias.group_by(*grupo, maintain_order=True)
+        .agg(
+            reruns=pl.len(),
+            p50=pl.col("ms").quantile(0.50),
+            p95=pl.col("ms").quantile(0.95),
+            p99=pl.col("ms").quantile(0.99),
+            max=pl.col("ms").max(),
+            errores=pl.col("errores").sum(),
+        )
+        .sort(*grupo, maintain_order=True)
+    )
+
+
+async def probar(args, url: str, pid: int | None) -> tuple[pl.DataFrame, list]:
+    await calentar(url)
+    latencias, memoria = [], []
+    for sesiones in args.sesiones:
+        resultado, mb = await nivel(url, pid, sesiones, args.acciones, args.pausa)
+        latencias.extend(resultado)
+        memoria.append(dict(sesiones=sesiones, mb_servidor=mb))
+        print(f"{sesiones} sesiones: {len(resultado)} reruns")
+    return pl.DataFrame(latencias), memoria
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sesiones", type=int, nargs="+", default=[1, 5, 10, 25])
+    parser.add_argument("--acciones", type=int, default=20, help="Clics por sesión")
+    parser.add_argument(
+        "--pausa", type=float, default=1.0, help="Segundos promedio entre clics"
+    )
+    parser.add_argument("--raiz", default=RAIZ_REPO, help="Directorio con data/")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--url", help="Websocket de un servidor ya iniciado")
+    parser.add_argument("--guardar", action="store_true")
+    args = parser.parse_args()
+
+    servidor = None
+    if args.url:
+        url, pid = args.url, None
+    else:
+        servidor = iniciar_servidor(args.raiz, args.puerto)
+        url, pid = f"ws://localhost:{args.puerto}/_stcore/stream", servidor.pid
+    try:
+        latencias, memoria = asyncio.run(probar(args, url, pid))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+    resumen = percentiles(latencias, "sesiones").join(
+        pl.DataFrame(memoria), on="sesiones", how="left"
+    )
+    with pl.Config(tbl_cols=-1, tbl_rows=-1, tbl_width_chars=200, float_precision=1):
+        print(resumen)
+        print(percentiles(latencias, "sesiones", "pagina", "accion"))
+    if args.guardar:
+        ruta = os.path.join(RAIZ_REPO, RUTA_RESULTADOS)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump(
+                dict(resumen=resumen.to_dicts(), latencias=latencias.to_dicts()),
+                archivo,
+                indent=1,
+                ensure_ascii=False,
+            )
+        print(f"Resultados escritos en {ruta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Compara el tiempo de construir las gráficas apiladas con filtros contra figuras.py.
+
+Uso, desde la raíz del repositorio:
+    python -m benchmarks.figuras [--repeticiones 20] [--eias 3]
+
+Las páginas de conteos construían cada figura filtrando la tabla una vez por
+criterio y otra por nivel de respuesta, recorriendo todo el EIA en cada vuelta.
+figuras.agregar_paneles divide la tabla una sola vez y agrega todas las trazas
+con un solo add_traces. Se mide con los EIA que tienen más criterios.
+"""
+
+import argparse
+import time
+
+import plotly.graph_objects as go
+import polars as pl
+from plotly.subplots import make_subplots
+
+import datos
+import figuras
+
+COLORES_RESP = dict(
+    zip(["N0", "N1", "N2", "N3"], ["#fcb1c3", "#fce397", "#bae673", "#a4dafc"])
+)
+
+
+def leer_conteo() -> pl.DataFrame:
+    items = pl.read_parquet(datos.RUTAS["st_items"]).select(
+        ["item_id", "eia", "criterio", "proceso"]
+    )
+    return pl.read_parquet(datos.RUTAS["st_conteo_nacional"]).join(
+        items, on="item_id"
+    )
+
+
+def figura_filtros(conteo: pl.DataFrame) -> list:
+    """Construcción anterior, con un filter por criterio y por respuesta."""
+    lista = []
+    for proceso in conteo["proceso"].unique(maintain_order=True):
+        conteo_proceso = conteo.filter(pl.col("proceso") == proceso)
+        criterios = conteo_proceso["criterio"].unique(maintain_order=True).to_list()
+        figura = make_subplots(rows=1, cols=len(criterios))
+        for id_criterio, criterio in enumerate(criterios):
+            conteo_criterio = conteo_proceso.filter(pl.col("criterio") == criterio)
+            for resp in conteo_criterio["resp"].unique(maintain_order=True):
+                conteo_resp = conteo_criterio.filter(pl.col("resp") == resp)
+                figura.add_trace(
+                    go.Bar(
+                        x=conteo_resp["grado"],
+                        y=conteo_resp["prop"],
+                        name=resp,
+                        text=conteo_resp["prop"].round(1).to_list(),
+                        marker=dict(color=COLORES_RESP[resp]),
+                    ),
+                    row=1,
+                    col=id_criterio + 1,
+                )
+        lista.append(figura)
+    return lista
+
+
+def figura_particiones(conteo: pl.DataFrame) -> list:
+    """Construcción con figuras.py, una sola partición por nivel de la figura."""
+    lista = []
+    for _, conteo_proceso in figuras.partir(conteo, "proceso").items():
+        criterios = conteo_proceso["criterio"].unique(maintain_order=True).to_list()
+        figura = make_subplots(rows=1, cols=len(criterios))
+        figuras.agregar_paneles(
+            figura,
+            conteo_proceso,
+            panel="criterio",
+            paneles=criterios,
+            x="grado",
+            y="prop",
+            color="resp",
+            colores=COLORES_RESP,
+        )
+        lista.append(figura)
+    return lista
+
+
+def medir(funcion, conteo: pl.DataFrame, repeticiones: int) -> float:
+    """Milisegundos promedio por construcción."""
+    funcion(conteo)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(conteo)
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--eias", type=int, default=3)
+    args = parser.parse_args()
+
+    conteo = leer_conteo()
+    mayores = (
+        conteo.group_by("eia")
+        .agg(criterios=pl.col("criterio").n_unique())
+        .sort("criterios", descending=True)
+        .head(args.eias)
+    )
+    filas = []
+    for eia, criterios in mayores.iter_rows():
+        conteo_eia = conteo.filter(pl.col("eia") == eia)
+        trazas_filtros = sum(len(i.data) for i in figura_filtros(conteo_eia))
+        trazas_particiones = sum(len(i.data) for i in figura_particiones(conteo_eia))
+        filas.append(
+            dict(
+                eia=eia,
+                criterios=criterios,
+                trazas=trazas_particiones,
+                mismas_trazas=trazas_filtros == trazas_particiones,
+                ms_filtros=medir(figura_filtros, conteo_eia, args.repeticiones),
+                ms_particiones=medir(figura_particiones, conteo_eia, args.repeticiones),
+            )
+        )
+    resultado = pl.DataFrame(filas).with_columns(
+        aceleracion=pl.col("ms_filtros") / pl.col("ms_particiones")
+    )
+    with pl.Config(tbl_cols=-1, tbl_width_chars=200, float_precision=2):
+        print(resultado)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Mide el costo de un control por EIA antes y después de usar fragmentos.
+
+Uso, desde la raíz del repositorio:
+    python -m benchmarks.fragmentos [--repeticiones 5]
+
+Sin fragmentos, cambiar un checkbox o el punto de corte de un EIA vuelve a
+ejecutar toda la página. Con @st.fragment solo se ejecuta la sección de ese
+EIA. Para cada página se mide el rerun completo con AppTest y, envolviendo
+st.fragment, el tiempo de cada sección durante ese mismo rerun, que es lo que
+cuesta ahora el rerun del fragmento.
+"""
+
+import argparse
+import functools
+import os
+import time
+
+import polars as pl
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+PAGINAS = ["conteos.py", "medias.py", "perfiles.py"]
+
+fragmento_original = st.fragment
+# Duración de cada sección ejecutada en el último rerun
+secciones = []
+
+
+def fragmento_medido(funcion=None, **kwargs):
+    """Igual que st.fragment, registrando la duración de cada ejecución."""
+    if funcion is None:
+        return functools.partial(fragmento_medido, **kwargs)
+
+    @functools.wraps(funcion)
+    def medida(*args, **kw):
+        inicio = time.perf_counter()
+        resultado = funcion(*args, **kw)
+        secciones.append(time.perf_counter() - inicio)
+        return resultado
+
+    return fragmento_original(medida, **kwargs)
+
+
+def medir(pagina: str, repeticiones: int) -> dict:
+    app = AppTest.from_file(os.path.abspath(pagina), default_timeout=120)
+    app.run()
+    completos, por_seccion = [], []
+    for _ in range(repeticiones):
+        secciones.clear()
+        inicio = time.perf_counter()
+        app.run()
+        completos.append(time.perf_counter() - inicio)
+        por_seccion.append(sum(secciones) / max(len(secciones), 1))
+    return dict(
+        pagina=pagina,
+        secciones=len(secciones),
+        ms_rerun_pagina=min(completos) * 1000,
+        ms_rerun_fragmento=min(por_seccion) * 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    st.fragment = fragmento_medido
+    try:
+        filas = [medir(i, args.repeticiones) for i in PAGINAS]
+    finally:
+        st.fragment = fragmento_original
+    resultado = pl.DataFrame(filas).with_columns(
+        aceleracion=pl.col("ms_rerun_pagina") / pl.col("ms_rerun_fragmento")
+    )
+    with pl.Config(tbl_cols=-1, tbl_width_chars=200, float_precision=2):
+        print(resultado)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Recorre cada página con todas las combinaciones de sus controles y mide reruns.
+
+Uso, desde la raíz del repositorio:
+    python -m benchmarks.paginas [--paginas conteos.py medias.py] [--maximo 20]
+    python -m benchmarks.paginas --guardar      # escribe la línea base
+    python -m benchmarks.paginas --comparar     # compara contra la línea base
+    python -m benchmarks.paginas --raiz /tmp/ed24_x10   # datos sintéticos
+    python -m benchmarks.paginas --completas   # figuras sin el modo compacto
+
+Cada página se ejecuta sin navegador con AppTest. Los controles de la barra
+lateral y de orden se recorren en el orden en que dependen entre sí (p. ej. los
+grados disponibles dependen del nivel), leyendo las opciones de la página ya
+ejecutada. Para cada combinación se mide:
+    - ms_frio: rerun con las cachés de Streamlit vacías
+    - ms_caliente: mejor de varios reruns con las cachés llenas
+    - mb_pico: memoria residente máxima del proceso durante el rerun frío
+    - kb_figuras: tamaño del json de todas las figuras de plotly
+Los multiselects conservan su valor por omisión (todas las opciones).
+
+La línea base depende de la máquina, por lo que no se versiona. Con --raiz las
+páginas leen data/ desde otro directorio, p. ej. el generado por
+benchmarks.sinteticos, para ver cómo escalan con más EIA.
+"""
+
+import argparse
+import json
+import os
+import resource
+import time
+
+import polars as pl
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import figuras
+from recorrido import CONTROLES, combinaciones
+
+RUTA_BASE = "benchmarks/resultados/base_paginas.json"
+COLUMNAS_CLAVE = ["pagina", "seleccion"]
+
+
+def memoria_pico() -> float:
+    """Megabytes de memoria residente máxima del proceso.
+    En Linux se lee VmHWM, que puede reiniciarse entre mediciones; en otros
+    sistemas es el máximo desde que inició el proceso.
+    """
+    try:
+        with open("/proc/self/status") as archivo:
+            for linea in archivo:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reiniciar_pico():
+    """Reinicia la memoria residente máxima, solo en Linux."""
+    try:
+        with open("/proc/self/clear_refs", "w") as archivo:
+            archivo.write("5")
+    except OSError:
+        pass
+
+
+def kb_figuras(app: AppTest) -> float:
+    return sum(len(i.proto.spec) for i in app.get("plotly_chart")) / 1024
+
+
+def medir(app: AppTest, calientes: int) -> dict:
+    """Mide un rerun frío y varios calientes en la selección actual."""
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    reiniciar_pico()
+    inicio = time.perf_counter()
+    app.run()
+    ms_frio = (time.perf_counter() - inicio) * 1000
+    mb_pico = memoria_pico()
+    tiempos = []
+    for _ in range(calientes):
+        inicio = time.perf_counter()
+        app.run()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return dict(
+        ms_frio=ms_frio,
+        ms_caliente=min(tiempos),
+        mb_pico=mb_pico,
+        kb_figuras=kb_figuras(app),
+        errores=len(app.exception),
+    )
+
+
+def recorrer_pagina(
+    pagina: str, ruta_pagina: str, maximo: int | None, calientes: int
+) -> list:
+    app = AppTest.from_file(ruta_pagina, default_timeout=300)
+    app.run()
+    filas = []
+    for seleccion in combinaciones(app, CONTROLES[pagina]):
+        seleccion = " | ".join(f"{i}={j}" for i, j in seleccion)
+        filas.append(dict(pagina=pagina, seleccion=seleccion, **medir(app, calientes)))
+        if maximo and len(filas) >= maximo:
+            break
+    return filas
+
+
+def comparar(resultado: pl.DataFrame, ruta: str, tolerancia: float) -> pl.DataFrame:
+    """Combinaciones cuyo rerun caliente o figuras crecieron más que `tolerancia`."""
+    base = pl.read_json(ruta)
+    unidos = resultado.join(base, on=COLUMNAS_CLAVE, how="inner", suffix="_base")
+    return unidos.filter(
+        (pl.col("ms_caliente") > pl.col("ms_caliente_base") * (1 + tolerancia))
+        | (pl.col("kb_figuras") > pl.col("kb_figuras_base") * (1 + tolerancia))
+        | (pl.col("errores") > pl.col("errores_base"))
+    ).select(
+        *COLUMNAS_CLAVE,
+        "ms_caliente_base",
+        "ms_caliente",
+        "kb_figuras_base",
+        "kb_figuras",
+        "errores",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paginas", nargs="+", default=list(CONTROLES))
+    parser.add_argument("--maximo", type=int, help="Combinaciones por página")
+    parser.add_argument("--calientes", type=int, default=3)
+    parser.add_argument("--ruta", default=RUTA_BASE)
+    parser.add_argument("--guardar", action="store_true")
+    parser.add_argument("--comparar", action="store_true")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    parser.add_argument("--raiz", help="Directorio con los datos en data/")
+    parser.add_argument(
+        "--completas", action="store_true", help="Figuras sin el modo compacto"
+    )
+    args = parser.parse_args()
+    figuras.COMPACTO = not args.completas
+
+    paginas = [os.path.abspath(i) for i in args.paginas]
+    ruta = os.path.abspath(args.ruta)
+    if args.raiz:
+        # Las páginas abren data/ con rutas relativas al directorio actual
+        os.chdir(args.raiz)
+
+    filas = []
+    for pagina, ruta_pagina in zip(args.paginas, paginas):
+        filas.extend(recorrer_pagina(pagina, ruta_pagina, args.maximo, args.calientes))
+    resultado = pl.DataFrame(filas)
+
+    resumen = resultado.group_by("pagina", maintain_order=True).agg(
+        combinaciones=pl.len(),
+        ms_frio=pl.col("ms_frio").median(),
+        ms_caliente=pl.col("ms_caliente").median(),
+        ms_caliente_max=pl.col("ms_caliente").max(),
+        mb_pico=pl.col("mb_pico").max(),
+        kb_figuras=pl.col("kb_figuras").median(),
+        errores=pl.col("errores").sum(),
+    )
+    with pl.Config(tbl_cols=-1, tbl_rows=-1, tbl_width_chars=200, float_precision=1):
+        print(resumen)
+        if args.comparar:
+            regresiones = comparar(resultado, ruta, args.tolerancia)
+            print(f"{regresiones.height} combinaciones con regresión:")
+            print(regresiones)
+    if args.guardar:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump(resultado.to_dicts(), archivo, indent=1, ensure_ascii=False)
+        print(f"Línea base escrita en {ruta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Genera datos sintéticos con el mismo esquema que data/, escalados por un factor.
+
+Uso, desde la raíz del repositorio:
+    python -m benchmarks.sinteticos --factor 10 --salida /tmp/ed24_x10
+    python -m benchmarks.sinteticos --factor 100 --salida /tmp/ed24_x100 --transformar
+    python -m benchmarks.paginas --raiz /tmp/ed24_x100 --maximo 5
+
+Cada EIA se replica `factor` veces como si fuera una aplicación de otro ciclo
+escolar: la réplica n recibe claves de item, de EIA y nombre de EIA propios
+(p. ej. KX2LE1C1A1O002, EIA-F2PRE30-01-O002, "... (ciclo 2)") y valores
+perturbados de forma determinista, de modo que las páginas muestran n veces
+más EIA por grado y los conteos tienen n veces más renglones.
+
+Los grados, niveles, servicios y respuestas no se multiplican: son
+categorías cerradas en esquema.py y en los selectores de las páginas, y un
+valor nuevo rompería la validación. La cantidad de personas se escala con
+--personas, que multiplica los conteos sin cambiar las proporciones.
+
+Los archivos se escriben en SALIDA/data/ con los mismos nombres; con
+--transformar se ejecuta además transform_conteos.py dentro de SALIDA para
+generar las tablas st_* y se informa su duración.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import polars as pl
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Columnas que identifican un item o un EIA, según el archivo
+COLS_ITEM = ["item"]
+COLS_EIA_CLAVE = ["eia_clave", "clave_eia"]
+COLS_EIA = ["eia"]
+# Archivos que se replican; el resto de data/ se copia sin cambios
+ARCHIVOS = [
+    "diccionario",
+    "diccionario_rubrica",
+    "ed24-items",
+    "item_conteo_grado",
+    "item_conteo_nacional",
+    "item_conteo_ponderado",
+    "item_conteo_servicio",
+    "item_conteo_sexo",
+    "item_irt",
+    "item_irt_eia",
+    "item_irt_uni",
+    "item_medias",
+    "personas",
+    "personas_dist",
+]
+# Columnas que se perturban, con la amplitud máxima del cambio. Las escalas de
+# personas y dificultades cambian igual en cada réplica y conservan el 0, del
+# que parten los puntos de corte de perfiles.py
+ESCALAS_REPLICA = {
+    "dificultad": 0.1,
+    "puntaje": 0.1,
+    "l_inf": 0.1,
+    "l_sup": 0.1,
+}
+DESPLAZAMIENTOS = {"irt_dificultad": 0.25}
+ESCALAS = {"media": 0.15}
+COLS_CONTEO = ["conteo"]
+
+
+def sufijo(replica: int) -> str:
+    return f"O{replica:03d}"
+
+
+def uniforme(semilla: int) -> pl.Expr:
+    """Número pseudoaleatorio en [-1, 1] por renglón, estable entre ejecuciones."""
+    return (
+        pl.struct(pl.all()).hash(seed=semilla) % 20001
+    ).cast(pl.Float64) / 10000 - 1
+
+
+def renombrar(data: pl.DataFrame, replica: int) -> pl.DataFrame:
+    """Claves de item y de EIA de la réplica, con el mismo tipo que el original."""
+    if replica == 1:
+        return data
+    cambios = []
+    for col in COLS_ITEM:
+        if col in data.columns:
+            cambios.append(pl.col(col) + sufijo(replica))
+    for col in COLS_EIA_CLAVE:
+        if col in data.columns:
+            cambios.append(pl.col(col) + "-" + sufijo(replica))
+    for col in COLS_EIA:
+        if col in data.columns:
+            cambios.append(pl.col(col) + f" (ciclo {replica})")
+    if "item_clave" in data.columns:
+        # item_clave es item-respuesta
+        cambios.append(
+            pl.concat_str(
+                pl.col("item") + sufijo(replica),
+                pl.col("item_clave").str.slice(pl.col("item").str.len_chars()),
+            ).alias("item_clave")
+        )
+    return data.with_columns(cambios)
+
+
+def perturbar(data: pl.DataFrame, replica: int, personas: float) -> pl.DataFrame:
+    """Cambia medidas y conteos de la réplica conservando tipos y proporciones.
+    Las escalas y desplazamientos son uno por réplica para no alterar el orden
+    de los cuantiles; los conteos cambian por renglón y las proporciones se
+    recalculan.
+    """
+    # Entre -1 y 1, el mismo para todas las tablas de la réplica
+    cambio_replica = ((replica * 7919) % 201 - 100) / 100
+    cambios = []
+    for col, amplitud in ESCALAS_REPLICA.items():
+        if col in data.columns and replica > 1:
+            cambios.append(pl.col(col) * (1 + amplitud * cambio_replica))
+    for col, amplitud in DESPLAZAMIENTOS.items():
+        if col in data.columns and replica > 1:
+            cambios.append(pl.col(col) + amplitud * cambio_replica)
+    for col, amplitud in ESCALAS.items():
+        if col in data.columns and replica > 1:
+            cambios.append(pl.col(col) * (1 + amplitud * uniforme(replica)))
+    for col in COLS_CONTEO:
+        if col in data.columns:
+            factor = personas
+            if replica > 1:
+                factor = personas * (1 + 0.2 * uniforme(replica))
+            cambios.append((pl.col(col) * factor).round().cast(data.schema[col]))
+    data = data.with_columns(cambios)
+    if {"resp", "conteo", "prop"} <= set(data.columns):
+        grupo = [i for i in data.columns if i not in ("resp", "conteo", "prop")]
+        data = data.with_columns(
+            prop=(pl.col("conteo") / pl.col("conteo").sum().over(grupo) * 100)
+            .fill_nan(0)
+            .cast(data.schema["prop"])
+        )
+    return data
+
+
+def escalar(data: pl.DataFrame, factor: int, personas: float) -> pl.DataFrame:
+    """Une `factor` réplicas de la tabla, la primera con las claves originales."""
+    replicas = [
+        perturbar(renombrar(data, replica), replica, personas)
+        for replica in range(1, factor + 1)
+    ]
+    return pl.concat(replicas)
+
+
+def generar(
+    origen: str, salida: str, factor: int, personas: float = 1.0
+) -> pl.DataFrame:
+    """Escribe los archivos escalados y devuelve los renglones de cada uno."""
+    destino = os.path.join(salida, "data")
+    os.makedirs(destino, exist_ok=True)
+    filas = []
+    for nombre in sorted(os.listdir(origen)):
+        ruta = os.path.join(origen, nombre)
+        base, extension = os.path.splitext(nombre)
+        if extension != ".parquet" or base.startswith("st_"):
+            # Las tablas st_* se generan con transform_conteos.py
+            continue
+        if base not in ARCHIVOS:
+            shutil.copy(ruta, os.path.join(destino, nombre))
+            continue
+        data = pl.read_parquet(ruta)
+        escalada = escalar(data, factor, personas)
+        if escalada.schema != data.schema:
+            raise TypeError(f"{nombre}: el esquema sintético no coincide")
+        escalada.write_parquet(os.path.join(destino, nombre))
+        filas.append(
+            dict(archivo=nombre, filas=data.height, filas_sint=escalada.height)
+        )
+    return pl.DataFrame(filas)
+
+
+def transformar(salida: str) -> float:
+    """Ejecuta transform_conteos.py sobre los datos sintéticos.
+    Returns:
+        segundos (float): Duración de la transformación
+    """
+    inicio = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(RAIZ_REPO, "transform_conteos.py")],
+        cwd=salida,
+        check=True,
+    )
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--factor", type=int, default=10, help="Réplicas de cada EIA"
+    )
+    parser.add_argument("--salida", required=True, help="Directorio de salida")
+    parser.add_argument("--origen", default=os.path.join(RAIZ_REPO, "data"))
+    parser.add_argument(
+        "--personas", type=float, default=1.0, help="Factor de los conteos"
+    )
+    parser.add_argument("--transformar", action="store_true")
+    args = parser.parse_args()
+
+    resultado = generar(args.origen, args.salida, args.factor, args.personas)
+    with pl.Config(tbl_rows=-1):
+        print(resultado)
+    if args.transformar:
+        print(f"transform_conteos.py: {transformar(args.salida):.1f} s")
+
+
+if __name__ == "__main__":
+    main()
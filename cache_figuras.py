@@ -0,0 +1,192 @@
+import collections
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import plotly.graph_objects as go
+import streamlit as st
+
+import datos
+import figuras
+import instrumentacion
+
+# Tamaño máximo del json de todas las figuras guardadas en el proceso
+BYTES_MAXIMO = 128 * 1024**2
+# Figuras precalculadas por `python main.py precalcular`, un json por figura
+RUTA_ALMACEN = "data/figuras"
+# Archivo con la huella de los datos de cada directorio del almacén
+ARCHIVO_HUELLA = "huella.json"
+# Directorio donde se escribe cada figura construida, solo al precalcular
+escritura = None
+
+
+class CacheFiguras:
+    """Figuras de plotly serializadas a json, con desalojo de la menos usada.
+    Se comparte entre las sesiones del proceso, por lo que guarda texto
+    inmutable y no objetos de plotly que una página podría modificar.
+    """
+
+    def __init__(self, bytes_maximo: int = BYTES_MAXIMO):
+        self.bytes_maximo = bytes_maximo
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self._figuras = collections.OrderedDict()
+        self._candado = threading.Lock()
+
+    def obtener(self, clave: tuple) -> str | None:
+        with self._candado:
+            spec = self._figuras.get(clave)
+            if spec is None:
+                self.fallos += 1
+                return None
+            self._figuras.move_to_end(clave)
+            self.aciertos += 1
+            return spec
+
+    def guardar(self, clave: tuple, spec: str):
+        if len(spec) > self.bytes_maximo:
+            return
+        with self._candado:
+            if clave in self._figuras:
+                self.bytes -= len(self._figuras.pop(clave))
+            self._figuras[clave] = spec
+            self.bytes += len(spec)
+            while self.bytes > self.bytes_maximo:
+                _, desalojada = self._figuras.popitem(last=False)
+                self.bytes -= len(desalojada)
+                self.desalojos += 1
+
+    def limpiar(self):
+        with self._candado:
+            self._figuras.clear()
+            self.bytes = 0
+
+    def resumen(self) -> dict:
+        with self._candado:
+            return dict(
+                figuras=len(self._figuras),
+                megabytes=self.bytes / 1024**2,
+                aciertos=self.aciertos,
+                fallos=self.fallos,
+                desalojos=self.desalojos,
+            )
+
+
+@st.cache_resource
+def compartida() -> CacheFiguras:
+    """Caché de figuras del proceso del servidor."""
+    return CacheFiguras()
+
+
+def _resumen(valor) -> str:
+    return hashlib.sha1(json.dumps(valor, ensure_ascii=False).encode()).hexdigest()
+
+
+def archivo(clave: tuple, ruta: str = RUTA_ALMACEN) -> str:
+    """Ruta del json de una figura en el almacén.
+    Las figuras de cada huella de los datos van en su propio directorio, p. ej.
+    data/figuras/conteos/9f3c/ab12.json, para borrar juntas las que ya no se usan.
+    """
+    pagina, huella = clave[0], clave[-1]
+    return os.path.join(ruta, pagina, _resumen(huella)[:16], f"{_resumen(clave)}.json")
+
+
+def leer_almacen(clave: tuple) -> str | None:
+    try:
+        with open(archivo(clave), encoding="utf-8") as lectura:
+            return lectura.read()
+    except OSError:
+        return None
+
+
+def escribir_almacen(clave: tuple, spec: str, ruta: str):
+    destino = archivo(clave, ruta)
+    directorio = os.path.dirname(destino)
+    if not os.path.isdir(directorio):
+        os.makedirs(directorio, exist_ok=True)
+        ruta_huella = os.path.join(directorio, ARCHIVO_HUELLA)
+        with open(ruta_huella, "w", encoding="utf-8") as escrito:
+            json.dump(clave[-1], escrito, ensure_ascii=False)
+    with open(destino, "w", encoding="utf-8") as escrito:
+        escrito.write(spec)
+
+
+def vigente(directorio: str) -> bool:
+    """Indica si la huella de un directorio del almacén es la de los datos actuales."""
+    ruta_huella = os.path.join(directorio, ARCHIVO_HUELLA)
+    try:
+        with open(ruta_huella, encoding="utf-8") as lectura:
+            huella = json.load(lectura)
+        return all(
+            nombre in datos.RUTAS and datos.huella(nombre)[0][1] == firma
+            for nombre, firma in huella
+        )
+    except (OSError, ValueError):
+        return False
+
+
+def limpiar_almacen(ruta: str = RUTA_ALMACEN) -> int:
+    """Borra del almacén las figuras de datos que ya no existen.
+    Returns:
+        borrados (int): Cantidad de directorios o archivos borrados
+    """
+    borrados = 0
+    for pagina in os.listdir(ruta) if os.path.isdir(ruta) else []:
+        for entrada in os.listdir(os.path.join(ruta, pagina)):
+            camino = os.path.join(ruta, pagina, entrada)
+            if os.path.isdir(camino) and vigente(camino):
+                continue
+            if os.path.isdir(camino):
+                shutil.rmtree(camino)
+            else:
+                os.remove(camino)
+            borrados += 1
+        if not os.listdir(os.path.join(ruta, pagina)):
+            os.rmdir(os.path.join(ruta, pagina))
+    return borrados
+
+
+def figura(
+    pagina: str, filtros: tuple, fuentes: list, construir, *args, **kwargs
+) -> go.Figure:
+    """Figura guardada para la página y filtros, o construida y guardada.
+    Se busca primero en memoria y luego en el almacén en disco que genera
+    main.py. La clave incluye la huella de los datos, de modo que al volver a
+    generar los archivos las figuras anteriores ya no se usan.
+    Parameters:
+        pagina (str): Nombre de la página
+        filtros (tuple): Valores de los controles que definen la figura
+        fuentes (list): Conjuntos de datos de datos.RUTAS que usa la figura
+        construir: Función que crea la figura con *args y **kwargs
+    Returns:
+        figura (go.Figure): Figura lista para st.plotly_chart
+    """
+    cache = compartida()
+    # Las figuras compactas y completas se guardan por separado
+    clave = (pagina, filtros, figuras.COMPACTO, datos.huella(*fuentes))
+    with instrumentacion.etapa("cache_figuras", str(filtros)[:60]) as actual:
+        spec = cache.obtener(clave)
+        if spec is None and escritura is None:
+            spec = leer_almacen(clave)
+            if spec is not None:
+                cache.guardar(clave, spec)
+        if actual is not None:
+            actual["cache"] = "fallo" if spec is None else "acierto"
+        if spec is None:
+            construida = construir(*args, **kwargs)
+            if figuras.COMPACTO:
+                figuras.podar_plantilla(construida)
+            spec = construida.to_json(validate=False)
+            cache.guardar(clave, spec)
+        # Al precalcular se escriben también las figuras que ya estaban en
+        # memoria, p. ej. las de las opciones por omisión de la página
+        if escritura is not None and not os.path.exists(archivo(clave, escritura)):
+            escribir_almacen(clave, spec, escritura)
+    # La figura se arma desde el json también al construirla, así el navegador
+    # recibe exactamente la misma especificación en cada rerun. El json ya fue
+    # validado al construir la figura, no se valida de nuevo
+    return go.Figure(json.loads(spec), _validate=False)
@@ -0,0 +1,325 @@
+"""Calibración de crédito parcial (PCM) a partir de las respuestas de los alumnos.
+
+Uso, desde la raíz del repositorio:
+    python calibracion.py --respuestas data/respuestas.parquet [--procesos 4]
+        [--salida data/calibracion]
+
+El archivo de respuestas tiene un renglón por alumno y criterio, con las
+columnas persona, nivel, grado, eia, item y resp (N0 a N3, nulo si el alumno no
+tiene respuesta). Cada EIA de cada grado se calibra por separado, repartidos
+entre procesos, por máxima verosimilitud marginal con el algoritmo EM: los
+umbrales N1 a N3 de cada item y la desviación estándar de la habilidad de la
+población, con media 0. La habilidad de cada alumno es su media a posteriori.
+
+En el modelo de crédito parcial la verosimilitud de un alumno solo depende de
+su puntaje total y de los items que respondió, así que las respuestas se
+resumen una vez en conteos por item, categoría y grupo de alumnos con el mismo
+puntaje y los mismos items respondidos. Cada iteración opera con arreglos de
+items x categorías x grupos x nodos de cuadratura, sin importar el número de
+alumnos.
+
+Se escriben en --salida los archivos con el esquema que leen las páginas:
+item_irt_eia, personas, personas_dist y personas_puntajes, en la escala de
+item_irt.parquet (500 + 100 * logit).
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import polars as pl
+
+import histogramas
+
+RESPUESTAS = ["N0", "N1", "N2", "N3"]
+CATEGORIAS = len(RESPUESTAS)
+# Escala de los puntajes, la misma de item_irt.parquet. Los puntajes menores a
+# 0 se reportan como 0, igual que en personas.parquet
+MEDIA_ESCALA = 500
+DE_ESCALA = 100
+# Nodos de cuadratura de la distribución de habilidad, en desviaciones estándar
+NODOS = np.linspace(-5, 5, 41)
+ITERACIONES = 500
+TOLERANCIA = 1e-4
+# Límite de los umbrales en logits, para categorías sin respuestas
+LIMITE_UMBRAL = 10.0
+CUANTILES = list(range(0, 101, 5))
+ANCHO_DIST = 50
+LLAVES = ["nivel", "grado", "eia"]
+
+
+def resumir(matriz: np.ndarray) -> dict:
+    """Estadísticos suficientes de una matriz de respuestas.
+    Parameters:
+        matriz (np.ndarray): Alumnos x items, categoría 0 a 3 o -1 sin respuesta
+    Returns:
+        resumen (dict): Items respondidos (grupos x items), puntaje y número de
+            alumnos de cada grupo, conteos por item, categoría y grupo, y el
+            grupo de cada alumno
+    """
+    respondidos = matriz >= 0
+    puntaje = np.where(respondidos, matriz, 0).sum(axis=1)
+    llaves = np.column_stack([np.packbits(respondidos, axis=1), puntaje])
+    llaves_grupo, grupo, alumnos = np.unique(
+        llaves, axis=0, return_inverse=True, return_counts=True
+    )
+    grupo = grupo.ravel()
+    num_items = matriz.shape[1]
+    num_grupos = len(alumnos)
+    # Un solo conteo para todas las celdas respondidas: (item, categoría, grupo)
+    fila, item = np.nonzero(respondidos)
+    posicion = (item * CATEGORIAS + matriz[fila, item]) * num_grupos + grupo[fila]
+    conteos = np.bincount(posicion, minlength=num_items * CATEGORIAS * num_grupos)
+    return dict(
+        respondidos=np.unpackbits(
+            llaves_grupo[:, :-1].astype(np.uint8), axis=1, count=num_items
+        ).astype(np.float64),
+        puntaje=llaves_grupo[:, -1].astype(np.float64),
+        alumnos=alumnos.astype(np.float64),
+        conteos=conteos.reshape(num_items, CATEGORIAS, num_grupos).astype(np.float64),
+        grupo=grupo,
+    )
+
+
+def log_probabilidades(umbrales: np.ndarray, theta: np.ndarray) -> np.ndarray:
+    """log P(X = k | theta) de cada item, categoría y nodo.
+    Parameters:
+        umbrales (np.ndarray): Items x umbrales, en logits
+        theta (np.ndarray): Nodos de habilidad
+    Returns:
+        log_p (np.ndarray): Items x categorías x nodos
+    """
+    pasos = theta[None, None, :] - umbrales[:, :, None]
+    numerador = np.concatenate(
+        [np.zeros((len(umbrales), 1, len(theta))), np.cumsum(pasos, axis=1)], axis=1
+    )
+    maximo = numerador.max(axis=1, keepdims=True)
+    normalizador = maximo + np.log(np.exp(numerador - maximo).sum(axis=1, keepdims=True))
+    return numerador - normalizador
+
+
+def posterior(
+    resumen: dict, log_p: np.ndarray, theta: np.ndarray, sigma: float
+) -> np.ndarray:
+    """Distribución a posteriori de la habilidad de cada grupo sobre los nodos.
+    Con el puntaje total y los items respondidos basta: log L = puntaje * theta
+    - suma de log Z de los items respondidos, más un término que no depende de
+    theta.
+    """
+    log_z = -log_p[:, 0, :]
+    log_post = (
+        resumen["puntaje"][:, None] * theta[None, :]
+        - resumen["respondidos"] @ log_z
+        - 0.5 * (theta / sigma) ** 2
+    )
+    log_post -= log_post.max(axis=1, keepdims=True)
+    post = np.exp(log_post)
+    return post / post.sum(axis=1, keepdims=True)
+
+
+def paso_newton(
+    umbrales: np.ndarray, log_p: np.ndarray, esperados: np.ndarray
+) -> np.ndarray:
+    """Un paso de Newton de los umbrales de todos los items a la vez.
+    Parameters:
+        umbrales (np.ndarray): Items x umbrales
+        log_p (np.ndarray): Items x categorías x nodos
+        esperados (np.ndarray): Conteos esperados, items x categorías x nodos
+    Returns:
+        umbrales (np.ndarray): Umbrales actualizados
+    """
+    probabilidad = np.exp(log_p)
+    # P(X >= j) y conteos con respuesta >= j, para j = 1 a 3
+    al_menos = np.cumsum(probabilidad[:, :0:-1], axis=1)[:, ::-1]
+    esperados_al_menos = np.cumsum(esperados[:, :0:-1], axis=1)[:, ::-1]
+    total = esperados.sum(axis=1)
+    gradiente = (total[:, None, :] * al_menos - esperados_al_menos).sum(axis=2)
+    # Hessiano: suma sobre nodos de total * (S_j * S_l - S_max(j, l))
+    indices = np.arange(CATEGORIAS - 1)
+    mayor = np.maximum(indices[:, None], indices[None, :])
+    hessiano = np.einsum("iq,ijq,ilq->ijl", total, al_menos, al_menos) - np.einsum(
+        "iq,ijlq->ijl", total, al_menos[:, mayor, :]
+    )
+    hessiano -= 1e-6 * np.eye(CATEGORIAS - 1)
+    paso = np.linalg.solve(hessiano, gradiente[:, :, None])[:, :, 0]
+    return np.clip(umbrales - np.clip(paso, -1, 1), -LIMITE_UMBRAL, LIMITE_UMBRAL)
+
+
+def estimar(matriz: np.ndarray) -> dict:
+    """Umbrales de los items y habilidades de los alumnos de un EIA.
+    Parameters:
+        matriz (np.ndarray): Alumnos x items, categoría 0 a 3 o -1 sin respuesta
+    Returns:
+        estimacion (dict): umbrales (items x 3, logits), theta de cada alumno,
+            sigma de la población e iteraciones
+    """
+    resumen = resumir(matriz)
+    umbrales = np.tile(np.linspace(-1, 1, CATEGORIAS - 1), (matriz.shape[1], 1))
+    sigma = 1.0
+    for iteracion in range(1, ITERACIONES + 1):
+        theta = sigma * NODOS
+        log_p = log_probabilidades(umbrales, theta)
+        post = posterior(resumen, log_p, theta, sigma)
+        esperados = np.einsum("ikg,gq->ikq", resumen["conteos"], post)
+        nuevos = paso_newton(umbrales, log_p, esperados)
+        # Media 0 fija, solo se estima la dispersión de la población
+        varianza = resumen["alumnos"] @ (post @ theta**2) / resumen["alumnos"].sum()
+        cambio = max(np.abs(nuevos - umbrales).max(), abs(np.sqrt(varianza) - sigma))
+        umbrales, sigma = nuevos, float(np.sqrt(varianza))
+        if cambio < TOLERANCIA:
+            break
+    theta = sigma * NODOS
+    post = posterior(resumen, log_probabilidades(umbrales, theta), theta, sigma)
+    return dict(
+        umbrales=umbrales,
+        theta=(post @ theta)[resumen["grupo"]],
+        sigma=sigma,
+        iteraciones=iteracion,
+    )
+
+
+def escala(logits) -> np.ndarray:
+    return MEDIA_ESCALA + DE_ESCALA * np.asarray(logits)
+
+
+def calibrar_eia(ruta: str, nivel: str, grado: int, eia: str) -> dict:
+    """Lee y calibra las respuestas de un EIA, para un proceso del pool.
+    Returns:
+        resultado (dict): items (esquema de item_irt_eia), puntajes por alumno
+            y segundos de cada etapa
+    """
+    inicio = time.perf_counter()
+    respuestas = (
+        pl.scan_parquet(ruta)
+        .filter(pl.col("nivel") == nivel, pl.col("grado") == grado, pl.col("eia") == eia)
+        .select(["persona", "item", "resp"])
+        .collect()
+        .pivot(on="item", index="persona", values="resp", aggregate_function="first")
+    )
+    items = respuestas.columns[1:]
+    matriz = (
+        respuestas.select(
+            pl.col(items)
+            .replace_strict(RESPUESTAS, range(CATEGORIAS), return_dtype=pl.Int8)
+            .fill_null(-1)
+        )
+        .to_numpy()
+        .astype(np.int8)
+    )
+    lectura = time.perf_counter() - inicio
+    estimacion = estimar(matriz)
+    umbrales = escala(estimacion["umbrales"])
+    return dict(
+        items=pl.DataFrame(
+            {
+                "item": np.repeat(items, CATEGORIAS - 1),
+                "grado": float(grado),
+                "resp": RESPUESTAS[1:] * len(items),
+                "dificultad": umbrales.ravel(),
+            }
+        ),
+        puntajes=pl.DataFrame(
+            {
+                "persona": respuestas["persona"],
+                "nivel": nivel,
+                "grado": float(grado),
+                "eia": eia,
+                "puntaje": escala(estimacion["theta"]).clip(min=0),
+            }
+        ),
+        alumnos=matriz.shape[0],
+        items_eia=len(items),
+        iteraciones=estimacion["iteraciones"],
+        lectura=lectura,
+        estimacion=time.perf_counter() - inicio - lectura,
+    )
+
+
+def cuantiles(puntajes: pl.DataFrame) -> pl.DataFrame:
+    """Tabla de cuantiles de personas.parquet: 0%, 5%... 100% por EIA."""
+    return (
+        puntajes.group_by(LLAVES, maintain_order=True)
+        .agg(
+            pl.col("puntaje").quantile(i / 100, interpolation="linear").alias(f"{i}%")
+            for i in CUANTILES
+        )
+        .unpivot(index=LLAVES, variable_name="cuantil", value_name="puntaje")
+        # El orden estable deja los cuantiles de cada EIA de menor a mayor
+        .sort(LLAVES, maintain_order=True)
+        .select(["cuantil", "puntaje", *LLAVES])
+    )
+
+
+def distribucion(puntajes: pl.DataFrame) -> pl.DataFrame:
+    """Conteos de personas_dist.parquet, en barras de ANCHO_DIST puntos."""
+    return histogramas.histograma(puntajes.lazy(), LLAVES, ANCHO_DIST).select(
+        "l_inf",
+        "l_sup",
+        pl.col("conteo").cast(pl.Int32),
+        "dificultad",
+        *LLAVES,
+    )
+
+
+def calibrar(ruta: str, salida: str, procesos: int | None = None) -> list:
+    """Calibra todos los EIA del archivo de respuestas y escribe los resultados.
+    Returns:
+        tiempos (list): Alumnos, items, iteraciones y segundos de cada EIA
+    """
+    grupos = (
+        pl.scan_parquet(ruta).select(LLAVES).unique().sort(LLAVES).collect().rows()
+    )
+    # Procesos nuevos y no copias de este: polars ya inició sus hilos al leer
+    # los grupos, y un fork puede quedar bloqueado
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(procesos, mp_context=contexto) as ejecutor:
+        futuros = [
+            (grupo, ejecutor.submit(calibrar_eia, ruta, *grupo)) for grupo in grupos
+        ]
+        resultados = [(grupo, futuro.result()) for grupo, futuro in futuros]
+
+    puntajes = pl.concat(i["puntajes"] for _, i in resultados)
+    os.makedirs(salida, exist_ok=True)
+    pl.concat(i["items"] for _, i in resultados).write_parquet(
+        os.path.join(salida, "item_irt_eia.parquet")
+    )
+    cuantiles(puntajes).write_parquet(os.path.join(salida, "personas.parquet"))
+    distribucion(puntajes).write_parquet(os.path.join(salida, "personas_dist.parquet"))
+    puntajes.write_parquet(os.path.join(salida, "personas_puntajes.parquet"))
+    return [
+        dict(
+            nivel=grupo[0],
+            grado=grupo[1],
+            eia=grupo[2],
+            alumnos=i["alumnos"],
+            items=i["items_eia"],
+            iteraciones=i["iteraciones"],
+            lectura=i["lectura"],
+            estimacion=i["estimacion"],
+        )
+        for grupo, i in resultados
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--respuestas", default="data/respuestas.parquet")
+    parser.add_argument("--salida", default="data/calibracion")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    tiempos = pl.DataFrame(calibrar(args.respuestas, args.salida, args.procesos))
+    with pl.Config(tbl_rows=-1, fmt_str_lengths=40):
+        print(tiempos)
+    print(
+        f"{tiempos['alumnos'].sum()} alumnos en {tiempos.height} EIA, "
+        f"{time.perf_counter() - inicio:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import streamlit as st
+
+import cache_figuras
+import datos
+
+st.set_page_config(
+    page_title="Carga de datos - Evaluación diagnóstica 2024",
+    page_icon=":worm:",
+    layout="wide",
+)
+
+#### Streamlit ####
+st.title("Carga de datos")
+st.markdown(
+    "Conjuntos de datos leídos por este proceso del servidor. "
+    "Cada archivo se lee una sola vez y se comparte entre todas las sesiones."
+)
+
+cargas = datos.resumen_cargas()
+col_1, col_2 = st.columns(2)
+with col_1:
+    st.metric("Segundos de lectura", value=round(cargas["segundos"].sum(), 3))
+with col_2:
+    st.metric("Megabytes en memoria", value=round(cargas["megabytes"].sum(), 2))
+st.dataframe(
+    cargas.rename(str.capitalize),
+    column_config={
+        "Segundos": st.column_config.NumberColumn(format="%.4f"),
+        "Megabytes": st.column_config.NumberColumn(format="%.3f"),
+    },
+)
+
+st.markdown("### Caché de figuras")
+st.markdown(
+    "Figuras ya construidas, guardadas como json por página y filtros. "
+    f"Se desalojan las menos usadas al pasar de "
+    f"{cache_figuras.BYTES_MAXIMO / 1024**2:.0f} MB."
+)
+resumen_figuras = cache_figuras.compartida().resumen()
+col_1, col_2, col_3, col_4 = st.columns(4)
+col_1.metric("Figuras", value=resumen_figuras["figuras"])
+col_2.metric("Megabytes", value=round(resumen_figuras["megabytes"], 2))
+col_3.metric("Aciertos", value=resumen_figuras["aciertos"])
+col_4.metric("Fallos", value=resumen_figuras["fallos"])
+st.caption(f"Desalojos: {resumen_figuras['desalojos']}")
@@ -0,0 +1,23 @@
+import streamlit as st
+
+
+def pestanas(opciones: list, key: str) -> str:
+    """Selector con apariencia de pestañas que devuelve la pestaña activa.
+    A diferencia de st.tabs, que ejecuta el contenido de todas las pestañas en
+    cada rerun, la página solo calcula las tablas y figuras de la opción
+    seleccionada.
+    Parameters:
+        opciones (list): Nombres de las pestañas
+        key (str): Clave del widget, conserva la selección entre reruns
+    Returns:
+        activa (str): Pestaña seleccionada, la primera si no hay selección
+    """
+    activa = st.segmented_control(
+        "Sección",
+        options=opciones,
+        default=opciones[0],
+        key=key,
+        label_visibility="collapsed",
+    )
+    # Al volver a pulsar la opción activa se deselecciona, se trata como la primera
+    return activa or opciones[0]
@@ -0,0 +1,142 @@
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable
+
+RUTA_MANIFIESTO = "data/intermedios/manifiesto.json"
+
+
+@dataclass
+class Etapa:
+    """Paso de construcción que lee `entradas` y escribe `salidas`.
+    Attributes:
+        nombre (str): Identificador de la etapa en el manifiesto
+        funcion (Callable): Función sin argumentos que escribe las salidas
+        entradas (list): Rutas de archivos que lee la etapa
+        salidas (list): Rutas de archivos o directorios que escribe la etapa
+        modulos (list): Otros módulos cuyo código usa la etapa, p. ej. el de
+            esquemas; editarlos invalida sus salidas
+    """
+
+    nombre: str
+    funcion: Callable[[], None]
+    entradas: list = field(default_factory=list)
+    salidas: list = field(default_factory=list)
+    modulos: list = field(default_factory=list)
+
+
+def huella_archivo(ruta: str) -> str:
+    """Hash sha256 del contenido de un archivo."""
+    with open(ruta, "rb") as archivo:
+        return hashlib.file_digest(archivo, "sha256").hexdigest()
+
+
+def huella_etapa(etapa: Etapa) -> str:
+    """Hash de las entradas de la etapa y del código del que depende.
+    Cambiar una entrada o la forma de calcular la etapa invalida sus salidas.
+    Se usa el código completo del módulo de la función, que incluye las
+    funciones auxiliares que llama, y el de los módulos de la etapa.
+    """
+    huella = hashlib.sha256()
+    for modulo in [inspect.getmodule(etapa.funcion), *etapa.modulos]:
+        huella.update(inspect.getsource(modulo).encode())
+    for ruta in sorted(etapa.entradas):
+        huella.update(ruta.encode())
+        huella.update(huella_archivo(ruta).encode())
+    return huella.hexdigest()
+
+
+def dependencias(etapas: list) -> dict:
+    """Etapas de las que depende cada etapa, según sus entradas y salidas."""
+    productoras = {salida: i.nombre for i in etapas for salida in i.salidas}
+    return {
+        i.nombre: {productoras[j] for j in i.entradas if j in productoras}
+        for i in etapas
+    }
+
+
+def leer_manifiesto(ruta: str) -> dict:
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def escribir_manifiesto(manifiesto: dict, ruta: str):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, indent=2, ensure_ascii=False)
+
+
+def ejecutar(
+    etapas: list,
+    ruta_manifiesto: str = RUTA_MANIFIESTO,
+    forzar: bool = False,
+    trabajadores: int | None = None,
+) -> list:
+    """Ejecuta las etapas cuyas entradas cambiaron desde la última construcción.
+    Las etapas independientes entre sí corren en paralelo. Una etapa se omite si
+    la huella de sus entradas coincide con la del manifiesto y sus salidas
+    existen.
+    Parameters:
+        etapas (list): Lista de Etapa
+        ruta_manifiesto (str): Archivo json con las huellas de la última corrida
+        forzar (bool): Ejecuta todas las etapas sin revisar huellas
+        trabajadores (int): Máximo de etapas simultáneas
+    Returns:
+        resultados (list): Un dict por etapa con nombre, ejecutada y segundos
+    """
+    por_nombre = {i.nombre: i for i in etapas}
+    pendientes = dependencias(etapas)
+    manifiesto = leer_manifiesto(ruta_manifiesto)
+    resultados = []
+
+    def correr(etapa: Etapa) -> dict:
+        inicio = time.perf_counter()
+        huella = huella_etapa(etapa)
+        anterior = manifiesto.get(etapa.nombre, {}).get("huella")
+        salidas_completas = all(os.path.exists(i) for i in etapa.salidas)
+        ejecutada = forzar or huella != anterior or not salidas_completas
+        if ejecutada:
+            for salida in etapa.salidas:
+                os.makedirs(os.path.dirname(salida) or ".", exist_ok=True)
+            etapa.funcion()
+        return dict(
+            nombre=etapa.nombre,
+            huella=huella,
+            ejecutada=ejecutada,
+            segundos=time.perf_counter() - inicio,
+        )
+
+    # El manifiesto se guarda aunque una etapa falle, para no repetir las demás
+    try:
+        with ThreadPoolExecutor(max_workers=trabajadores) as pool:
+            en_curso = {}
+            while pendientes or en_curso:
+                listas = [i for i, deps in pendientes.items() if not deps]
+                for nombre in listas:
+                    del pendientes[nombre]
+                    en_curso[pool.submit(correr, por_nombre[nombre])] = nombre
+                if not en_curso:
+                    raise ValueError(
+                        f"Dependencias circulares en: {sorted(pendientes)}"
+                    )
+                terminadas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in terminadas:
+                    nombre = en_curso.pop(futuro)
+                    resultado = futuro.result()
+                    resultados.append(resultado)
+                    manifiesto[nombre] = dict(
+                        huella=resultado["huella"],
+                        ejecutada=resultado["ejecutada"],
+                        segundos=resultado["segundos"],
+                    )
+                    for deps in pendientes.values():
+                        deps.discard(nombre)
+    finally:
+        escribir_manifiesto(manifiesto, ruta_manifiesto)
+    return resultados
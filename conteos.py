@@ -4,6 +4,11 @@ import polars as pl
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+import cache_figuras
+import datos
+import figuras
+import instrumentacion
+
 
 NIVELES_GRADO = {
     "Preescolar": [3],
@@ -15,6 +20,7 @@ COLORES_RESP = dict(
     zip(["N0", "N1", "N2", "N3"], ["#fcb1c3", "#fce397", "#bae673", "#a4dafc"])
 )
 
+COLS_TEXTO = ["contenido", "pda", "descriptor", "criterio"]
 COLS_TABLA = [
     "item",
     "proceso",
@@ -33,51 +39,30 @@ st.set_page_config(
 )
 
 
-@st.cache_data
-def read_conteo(ruta):
-    conteo = pl.read_parquet(ruta)
-    return conteo
-
-
-# Data conteos
-conteo = read_conteo("data/st_conteo.parquet")
-
-st.title("Conteos Evaluación Diagnóstica 2024")
-
-with st.sidebar:
-    sel_nivel = st.selectbox("Nivel", options=NIVELES_GRADO.keys(), index=2)
-    sel_grado = st.selectbox("Grado", options=NIVELES_GRADO[sel_nivel], index=0)
-
-conteo_filtro = conteo.filter(
-    pl.col("nivel") == sel_nivel, pl.col("grado") == sel_grado
-).sort(["eia", "proceso", "consigna", "inciso", "criterio_num"])
-
-eia_filtro = conteo_filtro["eia"].unique().sort()
-
-st.markdown("**Ordenar por:**")
-sel_orden = st.radio(
-    "Ordenar por:",
-    ["Reactivo", "Proceso", "Campo", "Nivel 0", "Nivel 3"],
-    horizontal=True,
-    label_visibility="collapsed",
-)
+@datos.compartido
+def read_conteo(nivel, grado, ola=None):
+    # El filtro se evalúa dentro del escaneo, solo se lee la partición o los
+    # row groups del grado
+    conteo = datos.escanear("st_conteo_hechos").filter(
+        pl.col("nivel") == nivel, pl.col("grado") == grado
+    )
+    # El dataset particionado puede tener varias olas; se muestra solo una
+    if ola is not None:
+        conteo = conteo.filter(pl.col("ola") == ola)
+    conteo = conteo.sort(["eia", "proceso", "consigna", "inciso", "criterio_num"])
+    return conteo.collect()
 
-for eia in eia_filtro:
-    st.markdown(f"### {eia}")
 
-    conteo_eia = conteo_filtro.filter(pl.col("eia") == eia)
+@instrumentacion.medido
+def agregar_textos(conteo: pl.DataFrame, columnas: list) -> pl.DataFrame:
+    """Une los textos de los items solo para los renglones que se muestran."""
+    textos = datos.leer("st_items").select(["item_id", *columnas])
+    return conteo.join(textos, how="left", on="item_id")
 
-    if sel_orden == "Reactivo":
-        conteo_eia = conteo_eia.sort(["consigna", "inciso", "item"])
-    elif sel_orden == "Proceso":
-        conteo_eia = conteo_eia.sort(["proceso", "item"])
-    elif sel_orden == "Campo":
-        conteo_eia = conteo_eia.sort(["campo", "item"])
-    elif sel_orden == "Nivel 0":
-        conteo_eia = conteo_eia.sort(["nivel_0", "item"])
-    elif sel_orden == "Nivel 3":
-        conteo_eia = conteo_eia.sort(["nivel_3", "item"])
 
+@instrumentacion.medido
+def crear_figura(conteo_eia: pl.DataFrame) -> go.Figure:
+    """Medias, dificultades y porcentajes de respuesta de un EIA."""
     # Generar plot multiple
     plot_medias = make_subplots(
         rows=3,
@@ -91,11 +76,11 @@ for eia in eia_filtro:
     plot_medias.add_trace(
         go.Scatter(
             x=conteo_eia["item"],
-            y=conteo_eia["media"],
+            y=figuras.compactar(conteo_eia["media"]),
             name="Media",
             mode="lines+markers+text",
-            text=conteo_eia["media"].round(2),
-            hovertext=conteo_eia["proceso"],
+            **figuras.etiquetas(conteo_eia, "item", "media", "media", 2),
+            **figuras.hover(conteo_eia, ["proceso"], None, 2),
             textposition="top center",
             marker=dict(color="#adb5bd"),
         ),
@@ -109,55 +94,123 @@ for eia in eia_filtro:
         col=1,
     )
     # Plot Dificultad irt
-    for resp in conteo_eia["resp"].unique():
-        conteo_irt = conteo_eia.filter(pl.col("resp") == resp).select(
-            pl.col(["item", "dificultad", "resp"])
-        )
-        plot_medias.append_trace(
-            go.Scatter(
-                x=conteo_irt["item"],
-                y=conteo_irt["dificultad"],
-                mode="markers+text",
-                name=resp,
-                text=conteo_irt["dificultad"].round(),
-                textposition="middle right",
-                marker=dict(color=COLORES_RESP[resp]),
-                showlegend=False,
-            ),
-            row=2,
-            col=1,
-        )
-        plot_medias.update_yaxes(
-            title_text="Dificultad",
-            row=2,
-            col=1,
-        )
+    plot_medias.add_traces(
+        figuras.trazas(
+            conteo_eia,
+            x="item",
+            y="dificultad",
+            color="resp",
+            colores=COLORES_RESP,
+            tipo=go.Scatter,
+            decimales=0,
+            mode="markers+text",
+            textposition="middle right",
+            showlegend=False,
+        ),
+        rows=2,
+        cols=1,
+    )
+    plot_medias.update_yaxes(
+        title_text="Dificultad",
+        row=2,
+        col=1,
+    )
     # Plot proporcion de niveles
-    for resp in conteo_eia["resp"].unique():
-        conteo_eia_resp = conteo_eia.filter(pl.col("resp") == resp)
-        plot_medias.append_trace(
-            go.Bar(
-                x=conteo_eia_resp["item"],
-                y=conteo_eia_resp["prop"],
-                name=resp,
-                text=conteo_eia_resp["prop"].round(),
-                insidetextanchor="middle",
-                marker=dict(color=COLORES_RESP[resp]),
-            ),
-            row=3,
-            col=1,
-        )
-        plot_medias.update_yaxes(
-            title_text="Porcentaje",
-            row=3,
-            col=1,
-        )
+    plot_medias.add_traces(
+        figuras.trazas(
+            conteo_eia,
+            x="item",
+            y="prop",
+            color="resp",
+            colores=COLORES_RESP,
+            decimales=0,
+            insidetextanchor="middle",
+        ),
+        rows=3,
+        cols=1,
+    )
+    plot_medias.update_yaxes(
+        title_text="Porcentaje",
+        row=3,
+        col=1,
+    )
     plot_medias.update_layout(
         barmode="stack",
         height=550,
         margin=dict(t=35, b=35),
     )
-    st.plotly_chart(plot_medias)
+    return plot_medias
+
+
+@st.fragment
+@instrumentacion.medido
+def seccion_eia(
+    nivel: str,
+    grado: int,
+    eia: str,
+    conteo_eia: pl.DataFrame,
+    sel_orden: str,
+    ola: str | None = None,
+):
+    """Gráfica y tabla de especificaciones de un EIA.
+    Es un fragmento: mostrar la tabla solo vuelve a ejecutar esta sección y no
+    las gráficas de los demás EIA. La figura se guarda en la caché de
+    figuras del proceso, por grado, EIA y orden.
+    """
+    st.markdown(f"### {eia}")
+
+    with instrumentacion.etapa("ordenar", eia):
+        if sel_orden == "Reactivo":
+            conteo_eia = conteo_eia.sort(["consigna", "inciso", "item"])
+        elif sel_orden == "Proceso":
+            conteo_eia = conteo_eia.sort(["proceso", "item"])
+        elif sel_orden == "Campo":
+            conteo_eia = conteo_eia.sort(["campo", "item"])
+        elif sel_orden == "Nivel 0":
+            conteo_eia = conteo_eia.sort(["nivel_0", "item"])
+        elif sel_orden == "Nivel 3":
+            conteo_eia = conteo_eia.sort(["nivel_3", "item"])
+
+    figura = cache_figuras.figura(
+        "conteos",
+        (nivel, grado, eia, sel_orden, ola),
+        ["st_conteo_hechos"],
+        crear_figura,
+        conteo_eia,
+    )
+    with instrumentacion.etapa("plotly_chart", eia):
+        st.plotly_chart(figura)
 
     if st.checkbox("Ver tabla de especificaciones.", value=False, key=f"tabla_{eia}"):
-        st.table(conteo_eia.select(pl.col(COLS_TABLA)).unique())
\ No newline at end of file
+        with instrumentacion.etapa("st.table", eia):
+            tabla = conteo_eia.select(["item_id", "item", "proceso", "campo"]).unique()
+            st.table(agregar_textos(tabla, COLS_TEXTO).select(pl.col(COLS_TABLA)))
+
+
+st.title("Conteos Evaluación Diagnóstica 2024")
+
+with st.sidebar:
+    sel_nivel = st.selectbox("Nivel", options=NIVELES_GRADO.keys(), index=2)
+    sel_grado = st.selectbox("Grado", options=NIVELES_GRADO[sel_nivel], index=0)
+    # Por omisión la ola más reciente; el control solo aparece si hay varias
+    olas = datos.olas("st_conteo_hechos")
+    sel_ola = olas[-1] if olas else None
+    if len(olas) > 1:
+        sel_ola = st.selectbox("Aplicación", options=olas, index=len(olas) - 1)
+
+# Data conteos
+conteo_filtro = read_conteo(sel_nivel, sel_grado, sel_ola)
+
+# Una tabla por EIA, en una sola pasada
+conteo_eias = figuras.partir(conteo_filtro, "eia")
+
+st.markdown("**Ordenar por:**")
+sel_orden = st.radio(
+    "Ordenar por:",
+    ["Reactivo", "Proceso", "Campo", "Nivel 0", "Nivel 3"],
+    horizontal=True,
+    label_visibility="collapsed",
+)
+
+for (eia,), conteo_eia in sorted(conteo_eias.items()):
+    seccion_eia(sel_nivel, sel_grado, eia, conteo_eia, sel_orden, sel_ola)
@@ -3,6 +3,10 @@ import streamlit as st
 import polars as pl
 import plotly.graph_objects as go
 
+import datos
+import figuras
+import instrumentacion
+
 COLORES = ["#fcb1c3", "#fce397", "#bae673", "#a4dafc"]
 COLORES_RESP = dict(zip(["N0", "N1", "N2", "N3"], COLORES))
 
@@ -14,22 +18,28 @@ st.set_page_config(
     layout="wide",
 )
 
-diccionario = pl.read_parquet("data/diccionario.parquet").drop(["fase", "nivel", "grado"])
-rubrica = pl.read_parquet("data/diccionario_rubrica.parquet")
-conteo = pl.read_parquet("data/item_conteo_grado.parquet")
-conteo = conteo.join(diccionario, how="inner", on="item").join(rubrica, how="inner", on=["item", "resp"])
 
-conteo = conteo.with_columns(
-    pl.col(["consigna", "grado"]).cast(pl.Int16).cast(pl.String)
-)
+@datos.compartido
+def crear_conteo() -> pl.DataFrame:
+    """Une conteos por grado con diccionario y rúbricas, una vez por proceso."""
+    items = datos.leer("st_items").drop(["item", "fase", "nivel"])
+    rubrica = datos.leer("st_rubrica")
+    conteo = datos.leer("st_conteo_grado")
+    conteo = conteo.join(items, how="inner", on="item_id").join(
+        rubrica, how="inner", on=["item_id", "resp"]
+    )
 
-nivel_0 = conteo.filter(pl.col("resp") == "N0").select(
-    ["item", "grado", "prop"]).rename({"prop": "nivel_0"})
-nivel_3 = conteo.filter(pl.col("resp") == "N3").select(
-    ["item", "grado", "prop"]).rename({"prop": "nivel_3"})
-conteo = conteo.join(nivel_0, on=["item", "grado"], how="left").join(
-    nivel_3, on=["item", "grado"], how="left"
-)
+    nivel_0 = conteo.filter(pl.col("resp") == "N0").select(
+        ["item", "grado", "prop"]).rename({"prop": "nivel_0"})
+    nivel_3 = conteo.filter(pl.col("resp") == "N3").select(
+        ["item", "grado", "prop"]).rename({"prop": "nivel_3"})
+    conteo = conteo.join(nivel_0, on=["item", "grado"], how="left").join(
+        nivel_3, on=["item", "grado"], how="left"
+    )
+    return conteo
+
+
+conteo = crear_conteo()
 
 #### Streamlit ####
 eias = conteo["eia"].unique(maintain_order=True)
@@ -45,61 +55,65 @@ criterios = conteo_filtro["criterio"].unique()
 sel_criterios = st.multiselect("Criterios", options=criterios, default=criterios)
 conteo_filtro = conteo_filtro.filter(pl.col("criterio").is_in(sel_criterios))
 
+conteo_criterios = figuras.partir(conteo_filtro, "criterio")
 for criterio in sel_criterios:
     st.divider()
     st.markdown(f"## {criterio}")
-    conteo_criterio = conteo_filtro.filter(pl.col("criterio") == criterio)
-    figura = go.Figure()
-    for resp in conteo_criterio["resp"].unique(maintain_order=True):
-        conteo_resp = conteo_criterio.filter(pl.col("resp") == resp)
-        figura.add_trace(
-            go.Bar(
-                y=conteo_resp["grado"],
-                x=conteo_resp["prop"],
-                name=resp,
-                text=conteo_resp["prop"].round(1),
+    conteo_criterio = conteo_criterios[(criterio,)]
+    with instrumentacion.etapa("figura", criterio):
+        figura = go.Figure(
+            figuras.trazas(
+                conteo_criterio,
+                x="prop",
+                y="grado",
+                color="resp",
+                colores=COLORES_RESP,
+                texto="prop",
                 insidetextanchor="middle",
-                marker=dict(color=COLORES_RESP[resp]),
                 orientation="h",
             )
         )
-    figura.update_layout(
-        barmode="stack",
-        height=225,
-        width=600,
-        margin=dict(t=30, b=30),
-        yaxis=dict(
-            title="Grado",
-            tickmode="array",
-            tickvals=conteo_criterio["grado"],
-            ticktext=conteo_criterio["grado"].unique(maintain_order=True),
-            autorange="reversed",
-        ),
-        xaxis=dict(title="Porcentaje"),
-        font=dict(family="Noto Sans, serif", size=16),
-    )
-    st.plotly_chart(figura)
+        figura.update_layout(
+            barmode="stack",
+            height=225,
+            width=600,
+            margin=dict(t=30, b=30),
+            yaxis=dict(
+                title="Grado",
+                tickmode="array",
+                type="category",
+                tickvals=conteo_criterio["grado"],
+                ticktext=conteo_criterio["grado"].unique(maintain_order=True),
+                autorange="reversed",
+            ),
+            xaxis=dict(title="Porcentaje"),
+            font=dict(family="Noto Sans, serif", size=16),
+        )
+    with instrumentacion.etapa("plotly_chart", criterio):
+        st.plotly_chart(figura)
 
     st.markdown("### Información del criterio")
-    st.table(
-        (
-            conteo_criterio[COLS_INFORMACION]
-            .rename(str.title)
-            .unique(maintain_order=True).to_pandas().set_index("Campo")
+    with instrumentacion.etapa("st.table", criterio):
+        st.table(
+            (
+                conteo_criterio[COLS_INFORMACION]
+                .rename(str.title)
+                .unique(maintain_order=True).to_pandas().set_index("Campo")
+            )
         )
-    )
-    conteo_criterio = (
-        conteo_criterio[["resp", "resp_nivel", "resp_rubrica"]]
-        .unique(maintain_order=True)
-        .rename(
-            {
-                "resp": "Respuesta",
-                "resp_nivel": "Nivel",
-                "resp_rubrica": "Rúbrica",
-            }
+    with instrumentacion.etapa("st.table", criterio):
+        conteo_criterio = (
+            conteo_criterio[["resp", "resp_nivel", "resp_rubrica"]]
+            .unique(maintain_order=True)
+            .rename(
+                {
+                    "resp": "Respuesta",
+                    "resp_nivel": "Nivel",
+                    "resp_rubrica": "Rúbrica",
+                }
+            )
+            .to_pandas()
+            .set_index("Respuesta")
         )
-        .to_pandas()
-        .set_index("Respuesta")
-    )
-    st.markdown("### Niveles de la rúbrica")
-    st.table(conteo_criterio)
\ No newline at end of file
+        st.markdown("### Niveles de la rúbrica")
+        st.table(conteo_criterio)
\ No newline at end of file
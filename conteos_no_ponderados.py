@@ -3,7 +3,12 @@ import streamlit as st
 import polars as pl
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from textwrap import wrap
+
+import cache_figuras
+import componentes
+import datos
+import figuras
+import instrumentacion
 
 NIVELES_GRADO = {
     "Preescolar": [3],
@@ -11,12 +16,6 @@ NIVELES_GRADO = {
     "Secundaria": [1, 2, 3],
 }
 COLORES = ["#fcb1c3", "#fce397", "#bae673", "#a4dafc"]
-COLORES_CAMPO = {
-    "LEN": "#c00000",
-    "SPC": "#0070c0",
-    "ENS": "#00b050",
-    "HYC": "#7030a0",
-}
 CLAVE_RESP = ["N0", "N1", "N2", "N3"]
 DESC_RESP = [
     "Sin evidencias de desarrollo del aprendizaje",
@@ -34,6 +33,8 @@ COLORES_SERVICIO = dict(
         ["#ffadad", "#fcf6bd", "#d0f4de", "#a9def9", "#e4c1f9"],
     )
 )
+# Datos de los que dependen las figuras guardadas en cache_figuras
+FUENTES = ["st_conteo_nacional", "st_items", "st_rubrica"]
 PROCESOS = [
     "Comprensión",
     "Utilización del conocimiento",
@@ -42,9 +43,19 @@ PROCESOS = [
 ]
 COLS_INFORMACION = ["campo", "contenido", "pda", "descriptor", "criterio_titulo"]
 COLS_GENERAL = ["campo", "pda", "descriptor", "consigna", "criterio_titulo", "proceso"]
-RUTA_DICT = "data/diccionario.parquet"
-RUTA_RUBR = "data/diccionario_rubrica.parquet"
-RUTA_CONT = "data/item_conteo_nacional.parquet"
+COLS_CLAVE = [
+    "item_id",
+    "eia_clave",
+    "eia",
+    "campo_clave",
+    "campo",
+    "consigna",
+    "inciso",
+    "criterio_clave",
+    "proceso",
+]
+COLS_TEXTO = ["contenido", "pda", "descriptor", "criterio"]
+COLS_TITULO = ["criterio_color", "criterio_18", "criterio_24"]
 
 
 st.set_page_config(
@@ -54,43 +65,59 @@ st.set_page_config(
 )
 
 
-@st.cache_data
-def crear_conteo(ruta_dict: str, ruta_rubr: str, ruta_cont: str) -> pl.DataFrame:
-    """Une los datos del diccionario de variables, rubricas y conteos.
-    Parameters:
-        ruta_dict (str): Ruta al achivo parquet con diccionario de variables
-        ruta_rubr (str): Ruta al achivo parquet con contenido de rúbricas
-        ruta_cont (str): Ruta al achivo parquet con conteos
+@datos.compartido
+def crear_conteo() -> pl.DataFrame:
+    """Une los conteos con las claves de los items, sin sus textos largos.
     Return:
         conteo (pl.DataFrame): Dataframe unido
     """
-    diccionario = pl.read_parquet(ruta_dict).drop(["fase", "nivel", "grado"])
-    rubrica = pl.read_parquet(ruta_rubr)
-    conteo_ponderado = pl.read_parquet(ruta_cont)
+    items = datos.leer("st_items").select(COLS_CLAVE)
+    rubrica = datos.leer("st_rubrica").select(["item_id", "resp"])
     conteo = (
-        conteo_ponderado.join(diccionario, on="item", how="inner")
-        .join(rubrica, on=["item", "resp"], how="inner")
+        datos.leer("st_conteo_nacional")
+        .join(items, on="item_id", how="inner")
+        .join(rubrica, on=["item_id", "resp"], how="semi")
         .unique()
     )
     conteo = conteo.with_columns(
-        pl.col("resp").replace(CLAVE_DICT).cast(pl.Enum(DESC_RESP)),
-        pl.col("consigna").cast(pl.Int16).cast(pl.String),
+        resp_clave=pl.col("resp"),
+        resp=pl.col("resp").replace_strict(
+            CLAVE_DICT, return_dtype=pl.Enum(DESC_RESP)
+        ),
     ).sort(["eia_clave", "grado", "proceso", "resp"])
-    # Agrega HTML de color para los nombres de campo de cada criterio
+    return conteo
+
+
+@datos.compartido
+def leer_eia(eia: str) -> pl.DataFrame:
+    """Conteo de un EIA con los textos de sus items.
+    Parameters:
+        eia (str): Nombre del EIA
+    Return:
+        conteo (pl.DataFrame): Conteo del EIA con textos y criterios con color
+    """
+    textos = datos.leer("st_items").select(["item_id", *COLS_TEXTO, *COLS_TITULO])
+    conteo = (
+        crear_conteo()
+        .filter(pl.col("eia") == eia)
+        .join(textos, on="item_id", how="left", maintain_order="left")
+    )
+    # El criterio se muestra con su campo formativo en color, títulos
+    # precalculados en transform_conteos.py
     conteo = conteo.with_columns(
-        pl.Series(
-            name="campo_color",
-            values=[
-                f'<span style="color:{COLORES_CAMPO[i]};">{i}</span><br>'
-                for i in conteo["campo_clave"]
-            ],
-        ),
-        criterio_titulo=conteo["criterio"],
+        criterio_titulo=pl.col("criterio"),
+        criterio=pl.col("criterio_color"),
     )
-    conteo = conteo.with_columns(criterio=conteo["campo_color"] + conteo["criterio"])
     return conteo
 
 
+@instrumentacion.medido
+def agregar_rubrica(tabla: pl.DataFrame) -> pl.DataFrame:
+    """Une el texto de las rúbricas a los renglones de una tabla."""
+    rubrica = datos.leer("st_rubrica").rename({"resp": "resp_clave"})
+    return tabla.join(rubrica, on=["item_id", "resp_clave"], how="left")
+
+
 def calc_ancho_plot(n_grados: int, n_criterios: int) -> int:
     """Devuelve el ancho de un subplot con varios criterios.
     Parameters:
@@ -107,36 +134,92 @@ def calc_ancho_plot(n_grados: int, n_criterios: int) -> int:
     return ancho_plot
 
 
-def criterios_html(lista_criterios: list, n_grados: int) -> list:
-    """Devuelve una lista de criterios con campo formativo con colores html, truncada a tres renglones.
+def criterios_html(conteo: pl.DataFrame, n_grados: int) -> list:
+    """Títulos de los criterios con su campo formativo en color, en tres renglones.
     Parameters:
-        lista_criterios (list): Lista con criterios en la forma \<span style='color': ... ;></span>\<br> ...
+        conteo (pl.DataFrame): Conteos con las columnas de títulos de st_items
         n_grados (int): Cantidad de grados en los que se aplicó el EIA
     Returns:
-        html_texto (list): Lista con criterios con colores html, truncada a tres renglones
+        html_texto (list): Títulos en el orden de aparición de los criterios
     """
-    html_criterios = [i.split("<br>")[0] for i in lista_criterios]
-    texto_criterios = [i.split("<br>")[1] for i in lista_criterios]
-    # Texto del criterio truncado a tres renglones
     ancho_lab = 24 if n_grados > 1 else 18
-    texto_criterios = [
-        "<br>".join(wrap(i, width=ancho_lab, max_lines=3, placeholder="..."))
-        for i in texto_criterios
-    ]
-    # HTML + Texto para mostrar con color
-    html_texto = [
-        f"{html}<br>{texto}" for html, texto in zip(html_criterios, texto_criterios)
-    ]
-    return html_texto
+    titulos = conteo.unique("criterio", maintain_order=True)
+    return titulos[f"criterio_{ancho_lab}"].to_list()
+
+
+@instrumentacion.medido
+def crear_figura(conteo_proceso: pl.DataFrame, num_grados: int) -> go.Figure:
+    """Porcentaje de cada respuesta por grado, un panel por criterio.
+    Parameters:
+        conteo_proceso (pl.DataFrame): Conteos de un proceso, ordenados por criterio
+        num_grados (int): Cantidad de grados en los que se aplicó el EIA
+    Returns:
+        figura (go.Figure): Figura con un panel por criterio
+    """
+    criterios = conteo_proceso["criterio"].unique(maintain_order=True).to_list()
+    num_criterios = len(criterios)
+    nom_criterios = criterios_html(conteo_proceso, num_grados)
+    # Generación de gráfico
+    ancho_plot = calc_ancho_plot(num_grados, num_criterios)
+    figura = make_subplots(
+        rows=1,
+        cols=num_criterios,
+        subplot_titles=nom_criterios,
+        x_title="Grado",
+        y_title="Porcentaje",
+        shared_xaxes=True,
+        shared_yaxes=True,
+    )
+    figuras.agregar_paneles(
+        figura,
+        conteo_proceso,
+        panel="criterio",
+        paneles=criterios,
+        x="grado",
+        y="prop",
+        color="resp",
+        colores=COLORES_RESP,
+        hover_columnas=["campo", "consigna", "inciso"],
+        hover_formato="{}<br>Consigna {}<br>Inciso {}",
+        showlegend=False,
+        insidetextanchor="middle",
+    )
+    figura.update_xaxes(
+        title="",
+        type="category",
+    )
+    figura.update_yaxes(
+        title="",
+    )
+    figura.update_annotations(
+        font_size=12,
+        font_family="Noto Sans Condensed, sans",
+    )
+    figura.update_layout(
+        barmode="stack",
+        height=400,
+        width=ancho_plot,
+        margin=dict(t=70, b=25, r=15),
+        font=dict(family="Noto Sans Condensed", size=12),
+        legend_font_size=11,
+        legend_font_family="Noto Sans Condensed",
+        legend=dict(
+            yref="container",
+            y=1.1,
+            orientation="h",
+        ),
+    )
+    return figura
 
 
-conteo = crear_conteo(RUTA_DICT, RUTA_RUBR, RUTA_CONT)
+conteo = crear_conteo()
 
 #### Streamlit ####
 st.markdown("**Ejercicio Integrador del Aprendizaje**")
 eias = conteo.sort(["eia_clave"])["eia"].unique(maintain_order=True).to_list()
 sel_eia = st.selectbox("EIA", options=eias, index=0, label_visibility="collapsed")
-conteo_filtro = conteo.filter(pl.col("eia") == sel_eia)
+conteo_filtro = leer_eia(sel_eia)
+conteo_procesos = figuras.partir(conteo_filtro, "proceso")
 
 fase = conteo_filtro["fase"].unique(maintain_order=True).to_list()
 nivel = conteo_filtro["nivel"].unique(maintain_order=True).to_list()[0].lower()
@@ -153,160 +236,108 @@ else:
 
 st.markdown(f"**Fase {fase[0]}. Nivel {nivel}. Grado{grados_plural} {grados_texto}.**")
 
-tab_graficas, tab_tablas, tab_espec = st.tabs(
-    [
-        "Gráficas",
-        "Tablas de datos",
-        "Estructura del EIA",
-    ]
+# Solo se calcula el contenido de la pestaña seleccionada
+pestana = componentes.pestanas(
+    ["Gráficas", "Tablas de datos", "Estructura del EIA"], key="pestana"
 )
 
-with tab_graficas:
+if pestana == "Gráficas":
     # Numero de grados para definir el ancho de los graficos
     num_grados = len(conteo_filtro["grado"].unique(maintain_order=True).to_list())
     for proceso in PROCESOS:
-        conteo_proceso = conteo_filtro.filter(pl.col("proceso") == proceso).sort(
-            ["criterio_clave"]
-        )
-        if conteo_proceso.is_empty():
+        if (proceso,) not in conteo_procesos:
             continue
+        conteo_proceso = conteo_procesos[(proceso,)].sort(["criterio_clave"])
         st.markdown(f"## {proceso}")
         # Criterios a graficar
-        criterios = conteo_proceso["criterio"].unique(maintain_order=True).to_list()
-        num_criterios = len(criterios)
-        nom_criterios = criterios_html(criterios, num_grados)
-        # Generación de gráfico
-        ancho_plot = calc_ancho_plot(num_grados, num_criterios)
-        figura = make_subplots(
-            rows=1,
-            cols=num_criterios,
-            subplot_titles=nom_criterios,
-            x_title="Grado",
-            y_title="Porcentaje",
-            shared_xaxes=True,
-            shared_yaxes=True,
-        )
-        for id_criterio in range(num_criterios):
-            criterio = criterios[id_criterio]
-            conteo_criterio = conteo_proceso.filter(pl.col("criterio") == criterio)
-            resps = conteo_criterio["resp"].unique(maintain_order=True).to_list()
-            for resp in resps:
-                conteo_resp = conteo_criterio.filter(pl.col("resp") == resp)
-                figura.add_trace(
-                    go.Bar(
-                        x=conteo_resp["grado"],
-                        y=conteo_resp["prop"],
-                        name=resp,
-                        showlegend=False,
-                        text=conteo_resp["prop"].round(1).to_list(),
-                        hovertext=conteo_resp["campo"]
-                        + "<br>Consigna "
-                        + conteo_resp["consigna"]
-                        + "<br>Inciso "
-                        + conteo_resp["inciso"],
-                        insidetextanchor="middle",
-                        marker=dict(
-                            color=COLORES_RESP[resp],
-                        ),
-                    ),
-                    row=1,
-                    col=id_criterio + 1,
-                )
-        figura.update_xaxes(
-            title="",
-            type="category",
-        )
-        figura.update_yaxes(
-            title="",
+        figura = cache_figuras.figura(
+            "conteos_no_ponderados",
+            (sel_eia, proceso),
+            FUENTES,
+            crear_figura,
+            conteo_proceso,
+            num_grados,
         )
-        figura.update_annotations(
-            font_size=12,
-            font_family="Noto Sans Condensed, sans",
-        )
-        figura.update_layout(
-            barmode="stack",
-            height=400,
-            width=ancho_plot,
-            margin=dict(t=70, b=25, r=15),
-            font=dict(family="Noto Sans Condensed", size=12),
-            legend_font_size=11,
-            legend_font_family="Noto Sans Condensed",
-            legend=dict(
-                yref="container",
-                y=1.1,
-                orientation="h",
-            ),
-        )
-        st.plotly_chart(figura, use_container_width=False)
+        with instrumentacion.etapa("plotly_chart", proceso):
+            st.plotly_chart(figura, use_container_width=False)
 
-with tab_tablas:
+elif pestana == "Tablas de datos":
     for proceso in PROCESOS:
-        tabla_prop = conteo_filtro.filter(pl.col("proceso") == proceso)
-        if tabla_prop.is_empty():
+        if (proceso,) not in conteo_procesos:
             continue
+        tabla_prop = conteo_procesos[(proceso,)]
         st.markdown(f"## {proceso}")
-        tabla_prop = (
-            tabla_prop.with_columns(pl.col("prop").round(1).cast(pl.Decimal(scale=1)))
-            .pivot(
-                "resp",
-                index=["criterio_clave", "criterio_titulo", "grado"],
-                values="prop",
-                aggregate_function="first",
+        with instrumentacion.etapa("pivot", proceso):
+            tabla_prop = (
+                tabla_prop.with_columns(
+                    pl.col("prop").round(1).cast(pl.Decimal(scale=1))
+                )
+                .pivot(
+                    "resp",
+                    index=["criterio_clave", "criterio_titulo", "grado"],
+                    values="prop",
+                    aggregate_function="first",
+                )
+                .sort(["criterio_clave", "grado"])
+                .rename({"criterio_titulo": "criterio"})
+                .drop("criterio_clave")
+                .rename(str.capitalize)
             )
-            .sort(["criterio_clave", "grado"])
-            .rename({"criterio_titulo": "criterio"})
-            .drop("criterio_clave")
-            .rename(str.capitalize)
-        )
         # to_pandas para ocultar columna index
-        st.table(tabla_prop.to_pandas().set_index("Criterio"))
+        with instrumentacion.etapa("st.table", proceso):
+            st.table(tabla_prop.to_pandas().set_index("Criterio"))
 
-with tab_espec:
-    st.table(
-        conteo_filtro.sort(["consigna", "criterio_clave"])
-        .select(pl.col(COLS_GENERAL))
-        .unique(maintain_order=True)
-        .rename({"criterio_titulo": "criterio", "proceso": "habilidad"})
-        .rename(str.capitalize)
-        .to_pandas()
-        .set_index(["Campo"])
-    )
+elif pestana == "Estructura del EIA":
+    with instrumentacion.etapa("st.table", "estructura"):
+        st.table(
+            conteo_filtro.sort(["consigna", "criterio_clave"])
+            .select(pl.col(COLS_GENERAL))
+            .unique(maintain_order=True)
+            .rename({"criterio_titulo": "criterio", "proceso": "habilidad"})
+            .rename(str.capitalize)
+            .to_pandas()
+            .set_index(["Campo"])
+        )
     st.markdown("## Estructura por habilidad")
     for proceso in PROCESOS:
-        tabla_proceso = conteo_filtro.filter(pl.col("proceso") == proceso)
-        if tabla_proceso.is_empty():
+        if (proceso,) not in conteo_procesos:
             continue
+        tabla_proceso = conteo_procesos[(proceso,)]
         st.markdown(f"### {proceso}")
         st.markdown("**Contenidos**")
-        st.table(
-            (
-                tabla_proceso.select(pl.col(COLS_INFORMACION))
-                .unique()
-                .sort(["campo", "criterio_titulo"])
-                .rename({"criterio_titulo": "criterio"})
-                .rename(str.capitalize)
+        with instrumentacion.etapa("st.table", proceso):
+            st.table(
+                (
+                    tabla_proceso.select(pl.col(COLS_INFORMACION))
+                    .unique()
+                    .sort(["campo", "criterio_titulo"])
+                    .rename({"criterio_titulo": "criterio"})
+                    .rename(str.capitalize)
+                )
             )
-        )
         st.markdown("**Niveles de la rúbrica**")
         criterios_titulo = (
             tabla_proceso["criterio_titulo"].unique(maintain_order=True).to_list()
         )
         sel_criterios = st.selectbox("Criterio", options=criterios_titulo, index=0)
-        tabla_criterio = (
-            tabla_proceso.filter(
-                pl.col("criterio_titulo") == sel_criterios,
-                pl.col("resp") != "Sin evidencias de desarrollo del aprendizaje",
-            )
-            .select(pl.col(["consigna", "inciso", "resp", "resp_rubrica"]))
-            .unique()
-            .sort("resp")
-            .rename(
-                {
-                    "consigna": "Consigna",
-                    "inciso": "Inciso",
-                    "resp": "Nivel",
-                    "resp_rubrica": "Rúbrica",
-                }
+        with instrumentacion.etapa("rubrica", proceso):
+            tabla_criterio = (
+                tabla_proceso.filter(
+                    pl.col("criterio_titulo") == sel_criterios,
+                    pl.col("resp") != "Sin evidencias de desarrollo del aprendizaje",
+                )
+                .select(pl.col(["item_id", "consigna", "inciso", "resp", "resp_clave"]))
+                .pipe(agregar_rubrica)
+                .select(pl.col(["consigna", "inciso", "resp", "resp_rubrica"]))
+                .unique()
+                .sort("resp")
+                .rename(
+                    {
+                        "consigna": "Consigna",
+                        "inciso": "Inciso",
+                        "resp": "Nivel",
+                        "resp_rubrica": "Rúbrica",
+                    }
+                )
             )
-        )
-        st.table(tabla_criterio)
+            st.table(tabla_criterio)
@@ -1,10 +1,12 @@
 import pyarrow
 import streamlit as st
 import polars as pl
-import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from textwrap import wrap
 
+import datos
+import figuras
+
 NIVELES_GRADO = {
     "Preescolar": [3],
     "Primaria": [1, 2, 3, 4, 5, 6],
@@ -21,29 +23,21 @@ st.set_page_config(
     #layout="wide",
 )
 
-diccionario = pl.read_parquet("data/diccionario.parquet").drop(["fase", "nivel", "grado"])
-rubrica = pl.read_parquet("data/diccionario_rubrica.parquet")
 
-conteo = pl.read_parquet("data/item_conteo_grado.parquet")
-conteo = conteo.join(diccionario, how="inner", on="item").join(
-    rubrica, how="inner", on=["item", "resp"]
-).with_columns(
-    pl.col(["consigna", "grado"]).cast(pl.Int16).cast(pl.String)
-)
+@datos.compartido
+def crear_conteo() -> pl.DataFrame:
+    """Une conteos por grado con diccionario y rúbricas, una vez por proceso."""
+    items = datos.leer("st_items").drop(["item", "fase", "nivel"])
+    rubrica = datos.leer("st_rubrica")
+    conteo = (
+        datos.leer("st_conteo_grado")
+        .join(items, how="inner", on="item_id")
+        .join(rubrica, how="inner", on=["item_id", "resp"])
+    )
+    return conteo
 
-nivel_0 = (
-    conteo.filter(pl.col("resp") == "N0")
-    .select(["item", "grado", "prop"])
-    .rename({"prop": "nivel_0"})
-)
-nivel_3 = (
-    conteo.filter(pl.col("resp") == "N3")
-    .select(["item", "grado", "prop"])
-    .rename({"prop": "nivel_3"})
-)
-conteo_grado = conteo.join(nivel_0, on=["item", "grado"], how="left").join(
-    nivel_3, on=["item", "grado"], how="left"
-)
+
+conteo = crear_conteo()
 
 #### Streamlit ####
 
@@ -56,8 +50,9 @@ sel_proceso = st.multiselect("Habilidad", options=procesos, default=procesos)
 conteo_filtro = conteo_filtro.filter(pl.col("proceso").is_in(sel_proceso))
 
 st.title(f"{sel_eia}")
+conteo_procesos = figuras.partir(conteo_filtro, "proceso")
 for proceso in sel_proceso:
-    conteo_proceso = conteo_filtro.filter(pl.col("proceso") == proceso)
+    conteo_proceso = conteo_procesos[(proceso,)]
     st.markdown(f"## {proceso}")
 
     criterios = conteo_proceso["criterio"].unique()
@@ -74,32 +69,22 @@ for proceso in sel_proceso:
         shared_xaxes=True,
         shared_yaxes=True,
     )
-    for id_criterio in range(num_criterios):
-        criterio = criterios[id_criterio]
-        conteo_criterio = conteo_proceso.filter(pl.col("criterio") == criterio)
-
-        for resp in conteo_criterio["resp"].unique(maintain_order=True):
-            conteo_resp = conteo_criterio.filter(pl.col("resp") == resp)
-            figura.add_trace(
-                go.Bar(
-                    x=conteo_resp["grado"],
-                    y=conteo_resp["prop"],
-                    name=resp,
-                    legendgroup="group",
-                    text=conteo_resp["prop"].round(1),
-                    hovertext=conteo_resp["campo"],
-                    insidetextanchor="middle",
-                    marker=dict(
-                        color=COLORES_RESP[resp],
-                    ),
-                ),
-                row=1,
-                col=id_criterio + 1,
-            )
-            if id_criterio != num_criterios - 1:
-                figura.update_traces(
-                    showlegend=False,
-                )
+    figuras.agregar_paneles(
+        figura,
+        conteo_proceso,
+        panel="criterio",
+        paneles=criterios,
+        x="grado",
+        y="prop",
+        color="resp",
+        colores=COLORES_RESP,
+        hover_columnas=["campo"],
+        legendgroup="group",
+        insidetextanchor="middle",
+    )
+    # La leyenda solo se muestra para el último criterio
+    figura.update_traces(showlegend=False)
+    figura.update_traces(showlegend=True, col=num_criterios)
     figura.update_xaxes(
         title="",
         type="category",
@@ -126,7 +111,7 @@ for proceso in sel_proceso:
             "Columnas para mostrar:",
             options=COLS_INFORMACION,
             default=COLS_INFORMACION,
-            key=f"multiselect_{id_criterio}{proceso}"
+            key=f"multiselect_{proceso}"
         )
         st.table(
             (
@@ -138,7 +123,7 @@ for proceso in sel_proceso:
             )
         )
 
-    if st.checkbox("Mostrar niveles de la rúbrica.", key=f"check_rubrica_{id_criterio}{proceso}"):
+    if st.checkbox("Mostrar niveles de la rúbrica.", key=f"check_rubrica_{proceso}"):
         st.markdown("### Niveles de la rúbrica")
         sel_criterios = st.selectbox("Criterio", options=criterios, index=0)
         conteo_criterio = (
@@ -0,0 +1,153 @@
+import numpy as np
+import polars as pl
+
+import instrumentacion
+
+
+class IndiceCortes:
+    """Cuantil de la población debajo de un punto de corte, por grupo.
+    Guarda los puntajes ordenados de cada grupo (p. ej. nivel, grado y EIA),
+    de modo que cada consulta es una búsqueda binaria en lugar de filtrar la
+    tabla de personas cada vez que se mueve el punto de corte. Si la tabla no
+    trae la columna cuantil, p. ej. con un renglón por persona, se usa el
+    porcentaje de personas con puntaje menor o igual al corte.
+    """
+
+    def __init__(self, personas: pl.DataFrame, llaves: list):
+        self.llaves = llaves
+        self._grupos = {}
+        # El orden estable conserva el orden de la tabla entre puntajes iguales
+        ordenadas = personas.sort("puntaje", maintain_order=True)
+        for llave, grupo in ordenadas.partition_by(
+            llaves, as_dict=True, maintain_order=True
+        ).items():
+            if "cuantil" in grupo.columns:
+                etiquetas = grupo["cuantil"]
+                porcentajes = etiquetas.str.strip_chars_end("%").cast(pl.Float64)
+            else:
+                posicion = pl.int_range(1, grupo.height + 1, eager=True)
+                porcentajes = (posicion * 100 / grupo.height).round(1)
+                etiquetas = porcentajes.cast(pl.String) + "%"
+            self._grupos[llave] = (grupo["puntaje"], etiquetas, porcentajes)
+
+    def cuantil(self, llave: tuple, corte: float) -> str | None:
+        """Último cuantil con puntaje menor o igual al corte, None si no hay."""
+        if llave not in self._grupos:
+            return None
+        puntajes, etiquetas, _ = self._grupos[llave]
+        posicion = puntajes.search_sorted(corte, side="right")
+        return etiquetas[posicion - 1] if posicion else None
+
+    def _posiciones(self, llave: tuple, cortes, minimo: float | None) -> pl.Series:
+        """Número de puntajes del grupo menores o iguales a cada corte."""
+        puntajes = self._grupos[llave][0]
+        if minimo is None:
+            minimo = puntajes.min()
+        return puntajes.search_sorted(cortes.clip(lower_bound=minimo), side="right")
+
+    @instrumentacion.medido
+    def tabla(self, llave: tuple, cortes, minimo: float | None = None) -> dict:
+        """Cuantil de cada opción del control de punto de corte, en una pasada.
+        Parameters:
+            llave (tuple): Valores de las llaves del grupo
+            cortes: Opciones del punto de corte
+            minimo (float): Los cortes menores se buscan como este valor, por
+                omisión el puntaje mínimo del grupo
+        Returns:
+            cuantiles (dict): Corte -> cuantil, None si no hay personas debajo
+        """
+        cortes = pl.Series(cortes, dtype=pl.Float64)
+        if llave not in self._grupos:
+            return dict.fromkeys(cortes.to_list())
+        etiquetas = self._grupos[llave][1]
+        posiciones = self._posiciones(llave, cortes, minimo)
+        valores = [etiquetas[i - 1] if i else None for i in posiciones]
+        return dict(zip(cortes.to_list(), valores))
+
+    @instrumentacion.medido
+    def porcentajes(self, llave: tuple, cortes, minimo: float | None = None) -> pl.Series:
+        """Porcentaje de personas con puntaje menor o igual a cada corte.
+        Parameters:
+            llave (tuple): Valores de las llaves del grupo
+            cortes: Puntos de corte
+            minimo (float): Como en `tabla`
+        Returns:
+            porcentajes (pl.Series): Un valor por corte, 0 si no hay personas debajo
+        """
+        cortes = pl.Series(cortes, dtype=pl.Float64)
+        if llave not in self._grupos:
+            return pl.Series("porcentaje", [0.0] * cortes.len())
+        porcentajes = pl.concat([pl.Series([0.0]), self._grupos[llave][2]])
+        return porcentajes.gather(self._posiciones(llave, cortes, minimo)).alias(
+            "porcentaje"
+        )
+
+
+def bandas(acumulados: list) -> list:
+    """Porcentaje de personas en cada banda.
+    Parameters:
+        acumulados (list): Porcentaje acumulado en cada corte, de menor a mayor
+    Returns:
+        bandas (list): Un porcentaje por banda, uno más que el número de cortes
+    """
+    limites = [0.0, *acumulados, 100.0]
+    return [j - i for i, j in zip(limites, limites[1:])]
+
+
+@instrumentacion.medido
+def buscar_cortes(
+    porcentajes: pl.Series, objetivo: list, mejores: int = 5
+) -> pl.DataFrame:
+    """Combinaciones de cortes con las bandas más cercanas a una distribución objetivo.
+    Los candidatos son los puntos de corte ordenados de menor a mayor, como los
+    marcadores del método bookmark. En lugar de enumerar todas las
+    combinaciones, que crecen como n^k, se usa programación dinámica: para cada
+    número de cortes y posición del último se guardan las `mejores` distancias
+    parciales, con un costo de k * n^2 * mejores.
+    Parameters:
+        porcentajes (pl.Series): Porcentaje acumulado en cada candidato
+        objetivo (list): Porcentaje objetivo de cada banda, uno más que el
+            número de cortes
+        mejores (int): Número de combinaciones que se devuelven
+    Returns:
+        sugeridas (pl.DataFrame): Posición de cada corte en corte_1, corte_2...,
+            porcentaje de cada banda en banda_1, banda_2... y la suma de
+            diferencias absolutas con el objetivo en distancia, de menor a mayor
+    """
+    acumulado = porcentajes.cast(pl.Float64).to_numpy()
+    num = len(acumulado)
+    num_cortes = len(objetivo) - 1
+    # costos[i, m]: m-ésima menor distancia de las bandas hasta un corte en i
+    costos = np.full((num, mejores), np.inf)
+    costos[:, 0] = np.abs(acumulado - objetivo[0])
+    # Por cada corte agregado, el renglón plano (i * mejores + m) de su anterior
+    anteriores = []
+    for banda in objetivo[1:num_cortes]:
+        paso = np.abs(acumulado[None, :] - acumulado[:, None] - banda)
+        paso[np.tril_indices(num)] = np.inf
+        total = (costos[:, :, None] + paso[:, None, :]).reshape(num * mejores, num)
+        orden = np.argsort(total, axis=0, kind="stable")[:mejores]
+        costos = np.take_along_axis(total, orden, axis=0).T
+        anteriores.append(orden.T)
+    final = (costos + np.abs(100 - acumulado - objetivo[-1])[:, None]).ravel()
+    elegidas = np.argsort(final, kind="stable")[:mejores]
+    filas = []
+    for plano in elegidas[np.isfinite(final[elegidas])]:
+        posiciones = []
+        for anterior in reversed(anteriores):
+            posicion, rango = divmod(plano, mejores)
+            posiciones.append(posicion)
+            plano = anterior[posicion, rango]
+        posiciones.append(plano // mejores)
+        posiciones.reverse()
+        filas.append(
+            [
+                *posiciones,
+                *bandas([acumulado[i] for i in posiciones]),
+                final[elegidas[len(filas)]],
+            ]
+        )
+    esquema = {f"corte_{i}": pl.UInt32 for i in range(1, num_cortes + 1)}
+    esquema |= {f"banda_{i}": pl.Float64 for i in range(1, num_cortes + 2)}
+    esquema["distancia"] = pl.Float64
+    return pl.DataFrame(filas, schema=esquema, orient="row")
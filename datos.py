@@ -0,0 +1,208 @@
+import functools
+import hashlib
+import os
+import threading
+import time
+
+import pandas as pd
+import polars as pl
+import streamlit as st
+
+import esquema
+import instrumentacion
+
+RUTAS = {
+    "diccionario": "data/diccionario.parquet",
+    "diccionario_rubrica": "data/diccionario_rubrica.parquet",
+    "ed24_items": "data/ed24-items.parquet",
+    "item_conteo_grado": "data/item_conteo_grado.parquet",
+    "item_conteo_nacional": "data/item_conteo_nacional.parquet",
+    "item_conteo_ponderado": "data/item_conteo_ponderado.parquet",
+    "item_irt": "data/item_irt.parquet",
+    "item_irt_eia": "data/item_irt_eia.parquet",
+    "item_medias": "data/item_medias.parquet",
+    "personas": "data/personas.parquet",
+    "personas_dist": "data/personas_dist.parquet",
+    # Opcional: un renglón por persona con nivel, grado, eia y puntaje
+    "personas_puntajes": "data/personas_puntajes.parquet",
+    "personas_uni": "data/personas_uni.parquet",
+    "st_conteo": "data/st_conteo.parquet",
+    "st_conteo_grado": "data/st_conteo_grado.parquet",
+    "st_conteo_hechos": "data/st_conteo_hechos.parquet",
+    "st_conteo_nacional": "data/st_conteo_nacional.parquet",
+    "st_conteo_ponderado": "data/st_conteo_ponderado.parquet",
+    "st_items": "data/st_items.parquet",
+    "st_rubrica": "data/st_rubrica.parquet",
+}
+# Bytes del final de cada parquet que se usan para su huella
+BYTES_PIE = 64 * 1024
+# Huella de cada conjunto de datos, calculada una vez por proceso como su carga
+_firmas = {}
+_candado_firmas = threading.Lock()
+# Datasets particionados nivel=/grado=/eia_clave= que escribe
+# transform_conteos.py --particionado, con sus columnas de partición
+PARTICIONES = {
+    "st_conteo_hechos": (
+        "data/st_conteo_hechos",
+        ["nivel", "grado", "eia_clave"],
+    ),
+}
+
+
+@st.cache_resource
+def _registro_cargas() -> dict:
+    """Registro de cargas compartido por todas las sesiones del proceso."""
+    return {}
+
+
+def _registrar(nombre: str, formato: str, inicio: float, memoria: int, filas: int):
+    _registro_cargas()[(nombre, formato)] = dict(
+        datos=nombre,
+        formato=formato,
+        filas=filas,
+        segundos=time.perf_counter() - inicio,
+        megabytes=memoria / 1024**2,
+    )
+
+
+def compartido(funcion=None, *, show_spinner: bool = True):
+    """Cachea el dataframe que devuelve `funcion` una sola vez por proceso.
+    A diferencia de st.cache_data, el resultado no se serializa ni se copia en
+    cada rerun: todas las sesiones comparten los mismos buffers de Arrow. Cada
+    llamada recibe un clon superficial (sin copia de datos), de modo que las
+    operaciones en el lugar de una página no alteran el dataframe cacheado.
+    """
+    if funcion is None:
+        return functools.partial(compartido, show_spinner=show_spinner)
+    # Cada llamada queda registrada como acierto o fallo de la caché
+    cache = st.cache_resource(show_spinner=show_spinner)
+    cacheada = instrumentacion.cacheada(cache)(funcion)
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs) -> pl.DataFrame:
+        return cacheada(*args, **kwargs).clone()
+
+    envoltura.clear = cacheada.clear
+    return envoltura
+
+
+@compartido(show_spinner=False)
+def leer(nombre: str) -> pl.DataFrame:
+    """Lee un conjunto de datos una sola vez por proceso del servidor.
+    Las tablas construidas por transform_conteos.py se validan contra su
+    esquema canónico, por lo que las páginas no necesitan convertir tipos.
+    Parameters:
+        nombre (str): Clave del conjunto de datos en RUTAS
+    Returns:
+        data (pl.DataFrame): Datos leídos
+    """
+    inicio = time.perf_counter()
+    data = pl.read_parquet(RUTAS[nombre])
+    if nombre in esquema.TABLAS:
+        esquema.validar(data, nombre)
+    _registrar(nombre, "polars", inicio, data.estimated_size(), data.height)
+    return data
+
+
+def escanear(nombre: str) -> pl.LazyFrame:
+    """Plan de lectura perezosa de un conjunto de datos.
+    Los filtros y selecciones aplicados al plan se evalúan dentro del escaneo,
+    usando las estadísticas de los row groups para no decodificar los que no
+    coinciden. Si existe la versión particionada del dataset se usa esa, y los
+    filtros por columnas de partición descartan directorios completos.
+    """
+    if nombre in PARTICIONES and os.path.isdir(PARTICIONES[nombre][0]):
+        ruta, columnas = PARTICIONES[nombre]
+        # Las columnas de partición se leen de las rutas con su tipo canónico,
+        # así los filtros sobre ellas siguen descartando directorios
+        return pl.scan_parquet(
+            os.path.join(ruta, "**", "*.parquet"),
+            hive_partitioning=True,
+            hive_schema=esquema.esquema(nombre, columnas),
+        )
+    return pl.scan_parquet(RUTAS[nombre])
+
+
+@instrumentacion.cacheada(st.cache_resource(show_spinner=False))
+def olas(nombre: str) -> list:
+    """Olas (aplicaciones) de un dataset particionado, de la más antigua a la
+    más reciente. Vacía si el dataset no está particionado o no tiene olas.
+    """
+    plan = escanear(nombre)
+    if "ola" not in plan.collect_schema().names():
+        return []
+    return plan.select(pl.col("ola").unique().sort()).collect()["ola"].to_list()
+
+
+def _archivos(ruta: str) -> list:
+    """El archivo, o los archivos parquet de un directorio particionado."""
+    if not os.path.isdir(ruta):
+        return [ruta]
+    return sorted(
+        os.path.join(directorio, i)
+        for directorio, _, archivos in os.walk(ruta)
+        for i in archivos
+        if i.endswith(".parquet")
+    )
+
+
+def _firma(archivos: list) -> str:
+    """Resumen del contenido: tamaño y pie de cada parquet, que guarda las
+    estadísticas de todos sus row groups.
+    """
+    resumen = hashlib.sha1()
+    for archivo in archivos:
+        tamano = os.path.getsize(archivo)
+        with open(archivo, "rb") as lectura:
+            lectura.seek(max(tamano - BYTES_PIE, 0))
+            resumen.update(f"{tamano}:".encode())
+            resumen.update(lectura.read())
+    return resumen.hexdigest()[:16]
+
+
+def huella(*nombres: str) -> tuple:
+    """Identifica el contenido en disco de los conjuntos de datos.
+    Cambia cuando transform_conteos.py vuelve a escribir un archivo o un
+    directorio particionado, pero no al copiarlos a otro servidor, por lo que
+    sirve como parte de la clave de una caché en memoria o en disco. Se calcula
+    una sola vez por proceso, igual que los datos que cargan las páginas, así
+    que consultarla no lee el disco y siempre corresponde a los datos en memoria.
+    """
+    valores = []
+    with _candado_firmas:
+        for nombre in nombres:
+            if nombre not in _firmas:
+                ruta = RUTAS[nombre]
+                if nombre in PARTICIONES and os.path.isdir(PARTICIONES[nombre][0]):
+                    ruta = PARTICIONES[nombre][0]
+                _firmas[nombre] = _firma(_archivos(ruta))
+            valores.append((nombre, _firmas[nombre]))
+    return tuple(valores)
+
+
+@instrumentacion.cacheada(st.cache_resource(show_spinner=False))
+def leer_pandas(nombre: str) -> pd.DataFrame:
+    """Igual que leer, para las páginas que usan pandas.
+    El dataframe devuelto es compartido por todas las sesiones, no debe modificarse.
+    """
+    inicio = time.perf_counter()
+    data = pd.read_parquet(RUTAS[nombre])
+    memoria = data.memory_usage(deep=True).sum()
+    _registrar(nombre, "pandas", inicio, memoria, len(data))
+    return data
+
+
+def resumen_cargas() -> pl.DataFrame:
+    """Tiempo de carga y memoria de cada conjunto de datos leído en el proceso."""
+    cargas = list(_registro_cargas().values())
+    if not cargas:
+        return pl.DataFrame(
+            schema=dict(
+                datos=pl.String,
+                formato=pl.String,
+                filas=pl.Int64,
+                segundos=pl.Float64,
+                megabytes=pl.Float64,
+            )
+        )
+    return pl.DataFrame(cargas).sort(["datos", "formato"])
@@ -0,0 +1,115 @@
+import polars as pl
+
+NIVELES = ["Preescolar", "Primaria", "Secundaria"]
+RESPUESTAS = ["N0", "N1", "N2", "N3"]
+PROCESOS = [
+    "No definido",
+    "Comprensión",
+    "Utilización del conocimiento",
+    "Propuesta de solución",
+    "Juicio crítico",
+]
+CAMPOS = [
+    "Lenguajes",
+    "Saberes y pensamiento científico",
+    "De lo humano y lo comunitario",
+    "Ética, naturaleza y sociedades",
+]
+CAMPOS_CLAVE = ["LEN", "SPC", "HYC", "ENS"]
+SERVICIOS = ["Nacional", "General", "Privada", "Técnica", "Telesecundaria"]
+
+# Tipo de cada columna en todas las tablas que escribe transform_conteos.py
+TIPOS = dict(
+    item_id=pl.UInt32,
+    item=pl.String,
+    fase=pl.Int8,
+    nivel=pl.Enum(NIVELES),
+    grado=pl.Int8,
+    servicio=pl.Enum(SERVICIOS),
+    nacional=pl.Categorical(),
+    resp=pl.Enum(RESPUESTAS),
+    conteo=pl.Int32,
+    prop=pl.Float64,
+    eia_clave=pl.Categorical(),
+    eia=pl.Categorical(),
+    campo_clave=pl.Enum(CAMPOS_CLAVE),
+    campo=pl.Enum(CAMPOS),
+    contenido=pl.String,
+    pda_grado=pl.String,
+    pda=pl.String,
+    descriptor=pl.String,
+    consigna=pl.Int8,
+    inciso=pl.String,
+    criterio_num=pl.Int8,
+    criterio_clave=pl.String,
+    criterio=pl.String,
+    criterio_color=pl.String,
+    criterio_18=pl.String,
+    criterio_24=pl.String,
+    peso_max=pl.Float64,
+    ponderador=pl.Float64,
+    proceso=pl.Enum(PROCESOS),
+    n0=pl.String,
+    n1=pl.String,
+    n2=pl.String,
+    n3=pl.String,
+    resp_rubrica=pl.String,
+    resp_nivel=pl.String,
+    nivel_0=pl.Float64,
+    nivel_3=pl.Float64,
+    media=pl.Float64,
+    des_std=pl.Float64,
+    dificultad=pl.Float64,
+    # Aplicación de los conteos en el dataset particionado de hechos
+    ola=pl.String,
+)
+# Tablas escritas con el esquema canónico, datos.leer las valida al cargarlas
+TABLAS = {
+    "st_conteo",
+    "st_conteo_hechos",
+    "st_items",
+    "st_rubrica",
+    "st_conteo_grado",
+    "st_conteo_nacional",
+    "st_conteo_ponderado",
+}
+# Excepciones a TIPOS por tabla
+TIPOS_TABLA = {
+    # Los conteos ponderados son estimaciones, no enteros
+    "st_conteo_ponderado": dict(conteo=pl.Float64),
+}
+
+
+def esquema(nombre: str, columnas: list) -> pl.Schema:
+    """Esquema canónico de una tabla con las columnas dadas."""
+    tipos = TIPOS | TIPOS_TABLA.get(nombre, {})
+    return pl.Schema({i: tipos[i] for i in columnas})
+
+
+def aplicar(data: pl.DataFrame, nombre: str) -> pl.DataFrame:
+    """Convierte una tabla a su esquema canónico, al construirla.
+    Los enteros guardados como texto pasan por Float64, p. ej. fase "2" o "2.0".
+    """
+    conversiones = []
+    for columna, tipo in esquema(nombre, data.columns).items():
+        expr = pl.col(columna)
+        if tipo.is_integer() and data.schema[columna] == pl.String:
+            expr = expr.cast(pl.Float64)
+        conversiones.append(expr.cast(tipo))
+    return data.with_columns(conversiones)
+
+
+def validar(data: pl.DataFrame, nombre: str) -> pl.DataFrame:
+    """Revisa que una tabla leída tenga su esquema canónico.
+    Raises:
+        TypeError: Si alguna columna no tiene el tipo esperado
+    """
+    esperado = esquema(nombre, data.columns)
+    diferentes = [
+        f"{i}: {data.schema[i]} en lugar de {tipo}"
+        for i, tipo in esperado.items()
+        if data.schema[i] != tipo
+    ]
+    if diferentes:
+        raise TypeError(f"Esquema de {nombre} distinto al canónico: {diferentes}")
+    return data
@@ -0,0 +1,195 @@
+"""Exporta las páginas del tablero a html estático, sin servidor de Python.
+Se usa desde main.py, en procesos separados.
+"""
+
+import html
+import os
+import re
+import unicodedata
+
+import pandas as pd
+import plotly.offline
+from streamlit.testing.v1 import AppTest
+
+from recorrido import combinaciones, filtros, widget
+
+# Páginas exportadas con su título; cada html es una combinación de sus filtros
+PAGINAS = {
+    "conteos.py": "Conteos",
+    "mapa_items.py": "Mapa de items",
+    "conteos_no_ponderados.py": "Conteos no ponderados",
+    "conteos_ponderados_polars.py": "Conteos ponderados",
+    "medias.py": "Medias",
+    "irt.py": "IRT",
+}
+# Casillas que muestran las tablas de cada EIA, se marcan al exportar
+CASILLAS_TABLA = ["Ver tabla de especificaciones.", "Mostrar información"]
+# Archivos compartidos por todos los html, en la raíz de la salida
+PLOTLY_JS = "plotly.min.js"
+ESTILOS = "estilos.css"
+CSS = """body { font-family: sans-serif; margin: 2em auto; max-width: 1200px; }
+nav a { margin-right: 1em; }
+table { border-collapse: collapse; font-size: 0.85em; margin: 1em 0; }
+th, td { border: 1px solid #ddd; padding: 0.3em 0.5em; vertical-align: top; }
+th { background: #f4f4f8; }
+"""
+
+
+def nombre_archivo(seleccion: tuple) -> str:
+    """Nombre del html de una combinación, p. ej. secundaria-1.html"""
+    texto = "-".join(str(valor) for _, valor in seleccion)
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", texto.lower()).strip("-") + ".html"
+
+
+def markdown_html(texto: str, permitir_html: bool = False) -> str:
+    """Convierte el markdown sencillo de las páginas: títulos y negritas.
+    El texto se escapa, salvo el de los elementos escritos con
+    unsafe_allow_html=True, p. ej. los títulos de criterio con color.
+    """
+    nivel = len(texto) - len(texto.lstrip("#"))
+    contenido = texto.lstrip("#").strip()
+    if not permitir_html:
+        contenido = html.escape(contenido)
+    contenido = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", contenido)
+    if nivel:
+        return f"<h{nivel}>{contenido}</h{nivel}>"
+    return f"<p>{contenido}</p>"
+
+
+def tabla_html(tabla: pd.DataFrame) -> str:
+    indice = not isinstance(tabla.index, pd.RangeIndex)
+    return tabla.to_html(index=indice, border=0, na_rep="")
+
+
+def figura_html(spec: str, numero: int) -> str:
+    """Div y script de una figura de plotly a partir de su json."""
+    # Un "</script>" dentro del json cerraría la etiqueta
+    spec = spec.replace("</", "<\\/")
+    return (
+        f'<div id="figura-{numero}"></div>\n'
+        f"<script>(function () {{ var f = {spec}; "
+        f'Plotly.newPlot("figura-{numero}", f.data, f.layout, '
+        f"{{displaylogo: false, responsive: true}}); }})();</script>"
+    )
+
+
+def contenido_html(bloque, figuras: list) -> list:
+    """Html de los elementos de un bloque de AppTest, sin los controles.
+    Parameters:
+        bloque: Bloque de AppTest, p. ej. app.main
+        figuras (list): Figuras ya escritas en el html, para numerarlas
+    Returns:
+        partes (list): Fragmentos de html en orden de aparición
+    """
+    partes = []
+    for elemento in bloque.children.values():
+        if elemento.type == "title":
+            partes.append(f"<h1>{html.escape(elemento.value)}</h1>")
+        elif elemento.type == "markdown":
+            partes.append(markdown_html(elemento.value, elemento.proto.allow_html))
+        elif elemento.type in ("table", "dataframe"):
+            partes.append(tabla_html(elemento.value))
+        elif elemento.type == "plotly_chart":
+            figuras.append(elemento.proto.spec)
+            partes.append(figura_html(elemento.proto.spec, len(figuras)))
+        elif hasattr(elemento, "children"):
+            partes.extend(contenido_html(elemento, figuras))
+    return partes
+
+
+def documento(titulo: str, cuerpo: list, raiz: str = "..") -> str:
+    return "\n".join(
+        [
+            "<!DOCTYPE html>",
+            '<html lang="es">',
+            '<head><meta charset="utf-8">',
+            f"<title>{html.escape(titulo)}</title>",
+            f'<link rel="stylesheet" href="{raiz}/{ESTILOS}">',
+            f'<script src="{raiz}/{PLOTLY_JS}"></script>',
+            "</head>",
+            "<body>",
+            f'<nav><a href="{raiz}/index.html">Inicio</a></nav>',
+            *cuerpo,
+            "</body>",
+            "</html>",
+        ]
+    )
+
+
+def pagina_html(app: AppTest) -> list:
+    """Contenido de la página en la combinación actual.
+    Las tablas ocultas tras una casilla se muestran, y en las páginas con
+    pestañas se agrega el contenido de cada una.
+    """
+    casillas = [i for i in app.checkbox if i.label in CASILLAS_TABLA]
+    if casillas:
+        for casilla in casillas:
+            casilla.check()
+        app.run()
+    pestanas = widget(app, "button_group", "Sección")
+    if pestanas is None:
+        return contenido_html(app.main, [])
+    cuerpo, figuras = [], []
+    opciones = list(pestanas.options)
+    for opcion in opciones:
+        widget(app, "button_group", "Sección").set_value(opcion)
+        app.run()
+        cuerpo.append(f"<section><h2>{html.escape(str(opcion))}</h2>")
+        cuerpo.extend(contenido_html(app.main, figuras))
+        cuerpo.append("</section>")
+    widget(app, "button_group", "Sección").set_value(opciones[0])
+    app.run()
+    return cuerpo
+
+
+def exportar(pagina: str, opcion, salida: str) -> list:
+    """Escribe un html por combinación de la página con su primer control en `opcion`.
+    Parameters:
+        pagina (str): Archivo de la página
+        opcion: Valor del primer control
+        salida (str): Directorio del sitio
+    Returns:
+        exportados (list): Pares (combinación, ruta relativa) de cada html
+    """
+    titulo, controles = PAGINAS[pagina], filtros(pagina)
+    directorio = os.path.splitext(pagina)[0]
+    os.makedirs(os.path.join(salida, directorio), exist_ok=True)
+    app = AppTest.from_file(pagina, default_timeout=300)
+    app.run()
+    tipo, etiqueta = controles[0]
+    widget(app, tipo, etiqueta).set_value(opcion)
+    app.run()
+    exportados = []
+    for seleccion in combinaciones(app, controles[1:], ((etiqueta, opcion),)):
+        if app.exception:
+            raise RuntimeError(f"{pagina} {seleccion}: {app.exception[0].message}")
+        ruta = os.path.join(directorio, nombre_archivo(seleccion))
+        texto = ", ".join(str(valor) for _, valor in seleccion)
+        with open(os.path.join(salida, ruta), "w", encoding="utf-8") as archivo:
+            archivo.write(documento(f"{titulo} - {texto}", pagina_html(app)))
+        exportados.append((texto, ruta))
+    return exportados
+
+
+def escribir_indice(salida: str, exportados: dict):
+    """Escribe index.html con un enlace a cada combinación exportada."""
+    cuerpo = ["<h1>Evaluación Diagnóstica 2024</h1>"]
+    for pagina, lista in exportados.items():
+        cuerpo.append(f"<h2>{html.escape(PAGINAS[pagina])}</h2>")
+        cuerpo.append("<ul>")
+        cuerpo.extend(
+            f'<li><a href="{html.escape(ruta)}">{html.escape(texto)}</a></li>'
+            for texto, ruta in lista
+        )
+        cuerpo.append("</ul>")
+    with open(os.path.join(salida, "index.html"), "w", encoding="utf-8") as archivo:
+        archivo.write(documento("Evaluación Diagnóstica 2024", cuerpo, raiz="."))
+
+
+def escribir_recursos(salida: str):
+    """Escribe plotly.js y los estilos una sola vez para todo el sitio."""
+    with open(os.path.join(salida, PLOTLY_JS), "w", encoding="utf-8") as archivo:
+        archivo.write(plotly.offline.get_plotlyjs())
+    with open(os.path.join(salida, ESTILOS), "w", encoding="utf-8") as archivo:
+        archivo.write(CSS)
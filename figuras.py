@@ -0,0 +1,174 @@
+import plotly.graph_objects as go
+import polars as pl
+
+import instrumentacion
+
+# Modo compacto de las figuras: valores redondeados en float32, etiquetas con
+# texttemplate y un hovertemplate por traza en lugar de textos por punto
+COMPACTO = True
+# Decimales con que se envían los valores decimales en el modo compacto
+DECIMALES_ENVIO = 2
+
+
+@instrumentacion.medido
+def partir(data: pl.DataFrame, columnas) -> dict:
+    """Divide la tabla en una sola pasada, un dataframe por combinación de valores.
+    Sustituye a llamar data.filter dentro de un ciclo, que recorre toda la tabla
+    en cada vuelta.
+    Parameters:
+        data (pl.DataFrame): Tabla a dividir
+        columnas (str | list): Columnas que definen los grupos
+    Returns:
+        partes (dict): Tupla de valores -> dataframe, en orden de aparición
+    """
+    return data.partition_by(columnas, as_dict=True, maintain_order=True)
+
+
+def compactar(serie: pl.Series) -> pl.Series:
+    """Valores decimales redondeados en float32, en el modo compacto.
+    Plotly envía las series numéricas como arreglos binarios, con float32
+    cada valor ocupa 4 bytes en lugar de 8.
+    """
+    if COMPACTO and serie.dtype.is_float():
+        return serie.round(DECIMALES_ENVIO).cast(pl.Float32)
+    return serie
+
+
+def etiquetas(data: pl.DataFrame, x: str, y: str, texto: str, decimales: int) -> dict:
+    """Texto de cada marca: un texttemplate si muestra el valor de x o y.
+    El template se envía una vez por traza en lugar de un texto por marca.
+    """
+    if COMPACTO and data.height > 1 and texto in (x, y):
+        eje = "x" if texto == x else "y"
+        return dict(texttemplate=f"%{{{eje}:.{decimales}f}}")
+    return dict(text=data[texto].round(decimales).to_list())
+
+
+def hover(
+    data: pl.DataFrame, columnas: list | None, formato: str | None, decimales: int
+) -> dict:
+    """Texto al pasar el cursor, con un solo hovertemplate por traza.
+    Las columnas con el mismo valor en toda la traza se escriben en el template;
+    las demás se envían en customdata y el template las cita como
+    %{customdata[0]}, %{customdata[1]}...
+    Parameters:
+        data (pl.DataFrame): Datos de la traza
+        columnas (list): Columnas que se muestran, None para no agregar texto
+        formato (str): Texto con un {} por columna, por omisión una por renglón
+        decimales (int): Decimales del valor de y
+    Returns:
+        hover (dict): hovertemplate y, si hace falta, customdata
+    """
+    if columnas is None:
+        return {}
+    formato = formato or "<br>".join(["{}"] * len(columnas))
+    partes, variables = [], []
+    for columna in columnas:
+        valores = data[columna].unique()
+        if len(valores) == 1:
+            partes.append(str(valores[0]))
+        else:
+            partes.append(f"%{{customdata[{len(variables)}]}}")
+            variables.append(columna)
+    resultado = dict(
+        hovertemplate=f"(%{{x}}, %{{y:.{decimales}f}})<br>" + formato.format(*partes)
+    )
+    if variables:
+        resultado["customdata"] = data.select(variables).rows()
+    return resultado
+
+
+@instrumentacion.medido
+def podar_plantilla(figura: go.Figure) -> go.Figure:
+    """Quita de la plantilla los estilos de tipos de traza que no usa la figura.
+    Streamlit agrega a cada figura su plantilla con estilos para heatmaps,
+    contornos, tablas, etc., que ocupan más que los datos de una figura chica.
+    """
+    tipos = {traza.type for traza in figura.data}
+    plantilla = figura.layout.template
+    plantilla.data = {
+        tipo: estilos
+        for tipo, estilos in plantilla.data.to_plotly_json().items()
+        if tipo in tipos
+    }
+    return figura
+
+
+@instrumentacion.medido
+def trazas(
+    data: pl.DataFrame,
+    x: str,
+    y: str,
+    color: str,
+    colores: dict,
+    tipo=go.Bar,
+    texto: str | None = None,
+    decimales: int = 1,
+    hover_columnas: list | None = None,
+    hover_formato: str | None = None,
+    **opciones,
+) -> list:
+    """Una traza por cada valor de la columna `color`.
+    Parameters:
+        data (pl.DataFrame): Datos de la gráfica
+        x (str): Columna del eje x
+        y (str): Columna del eje y
+        color (str): Columna que separa las trazas, p. ej. resp
+        colores (dict): Color de cada valor de `color`
+        tipo: Clase de traza de plotly, go.Bar o go.Scatter
+        texto (str): Columna con el texto de cada marca, por omisión `y`
+        decimales (int): Decimales del texto
+        hover_columnas (list): Columnas con el texto al pasar el cursor
+        hover_formato (str): Texto con un {} por columna de hover_columnas
+        **opciones: Argumentos adicionales para cada traza
+    Returns:
+        lista (list): Trazas en orden de aparición de `color`
+    """
+    texto = texto or y
+    lista = []
+    for (valor,), parte in partir(data, color).items():
+        lista.append(
+            tipo(
+                x=compactar(parte[x]),
+                y=compactar(parte[y]),
+                name=valor,
+                marker=dict(color=colores[valor]),
+                **etiquetas(parte, x, y, texto, decimales),
+                **hover(parte, hover_columnas, hover_formato, decimales),
+                **opciones,
+            )
+        )
+    return lista
+
+
+@instrumentacion.medido
+def agregar_paneles(
+    figura: go.Figure,
+    data: pl.DataFrame,
+    panel: str,
+    paneles: list,
+    fila: int = 1,
+    **kwargs,
+) -> go.Figure:
+    """Agrega las trazas de cada panel en su columna de una figura con subplots.
+    Parameters:
+        figura (go.Figure): Figura creada con make_subplots
+        data (pl.DataFrame): Datos de todos los paneles
+        panel (str): Columna que define el panel, p. ej. criterio
+        paneles (list): Valores de `panel` en el orden de las columnas
+        fila (int): Fila de la figura
+        **kwargs: Argumentos para trazas
+    Returns:
+        figura (go.Figure): La misma figura con las trazas agregadas
+    """
+    columnas = {valor: i + 1 for i, valor in enumerate(paneles)}
+    lista, cols = [], []
+    for (valor,), parte in partir(data, panel).items():
+        if valor not in columnas:
+            continue
+        nuevas = trazas(parte, **kwargs)
+        lista.extend(nuevas)
+        cols.extend([columnas[valor]] * len(nuevas))
+    # Un solo add_traces valida y agrega todas las trazas a la vez
+    figura.add_traces(lista, rows=[fila] * len(lista), cols=cols)
+    return figura
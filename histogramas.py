@@ -0,0 +1,95 @@
+import os
+
+import polars as pl
+
+import datos
+import instrumentacion
+
+# Anchos de barra disponibles según la fuente de los puntajes. Los conteos de
+# personas_dist vienen en barras de 50 puntos, solo se pueden agrupar en
+# múltiplos de ese ancho
+ANCHOS_PERSONAS = [10, 25, 50, 100]
+ANCHOS_DIST = [50, 100, 150, 200]
+ANCHO_INICIAL = 50
+
+
+def hay_puntajes() -> bool:
+    """Si existe el archivo con un renglón por persona."""
+    return os.path.exists(datos.RUTAS["personas_puntajes"])
+
+
+def anchos() -> list:
+    return ANCHOS_PERSONAS if hay_puntajes() else ANCHOS_DIST
+
+
+@instrumentacion.medido
+def histograma(
+    puntajes: pl.LazyFrame,
+    llaves: list,
+    ancho: float,
+    columna: str = "puntaje",
+    conteo: str | None = None,
+) -> pl.DataFrame:
+    """Conteo de personas en barras de ancho fijo, en una sola agregación.
+    Parameters:
+        puntajes (pl.LazyFrame): Puntajes de las personas
+        llaves (list): Columnas con un histograma por combinación
+        ancho (float): Ancho de las barras
+        columna (str): Columna con el puntaje
+        conteo (str): Columna con el número de personas de cada renglón, si
+            los puntajes ya vienen agrupados. Por omisión, uno por renglón
+    Returns:
+        histograma (pl.DataFrame): Columnas l_inf, l_sup, conteo y dificultad
+            (el centro de la barra), como data/personas_dist.parquet
+    """
+    personas = pl.col(conteo).sum() if conteo else pl.len()
+    return (
+        puntajes.with_columns(l_inf=(pl.col(columna) / ancho).floor() * ancho)
+        .group_by([*llaves, "l_inf"])
+        .agg(conteo=personas.cast(pl.Int64))
+        .with_columns(
+            l_sup=pl.col("l_inf") + ancho,
+            dificultad=pl.col("l_inf") + ancho / 2,
+        )
+        .select([*llaves, "l_inf", "l_sup", "conteo", "dificultad"])
+        .sort([*llaves, "l_inf"])
+        .collect()
+    )
+
+
+@datos.compartido(show_spinner=False)
+def leer_histograma(
+    nivel: str,
+    grado: int,
+    eia: str | None,
+    ancho: float,
+    limites: tuple | None = None,
+) -> pl.DataFrame:
+    """Histograma de habilidad de un grado, o de uno de sus EIA.
+    Se calcula de los puntajes por persona si existe su archivo y, si no, se
+    agrupan los conteos de personas_dist.
+    Parameters:
+        nivel (str): Nivel educativo
+        grado (int): Grado
+        eia (str): EIA, None para todos los del grado
+        ancho (float): Ancho de las barras
+        limites (tuple): Solo barras con su centro dentro de (mínimo, máximo)
+    Returns:
+        histograma (pl.DataFrame): Un histograma por EIA, columna eia
+    """
+    filtros = [pl.col("nivel") == nivel, pl.col("grado") == grado]
+    if eia is not None:
+        filtros.append(pl.col("eia") == eia)
+    if hay_puntajes():
+        puntajes = datos.escanear("personas_puntajes").filter(filtros)
+        resultado = histograma(puntajes, ["eia"], ancho)
+    else:
+        puntajes = datos.escanear("personas_dist").filter(filtros)
+        resultado = histograma(
+            puntajes, ["eia"], ancho, columna="dificultad", conteo="conteo"
+        )
+    if limites is not None:
+        resultado = resultado.filter(
+            pl.col("dificultad").is_between(*limites, closed="none")
+        )
+    return resultado
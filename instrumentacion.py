@@ -0,0 +1,222 @@
+import contextlib
+import datetime
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+import polars as pl
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+RUTA_LOG = "logs/instrumentacion.jsonl"
+CLAVE_ACTIVA = "instrumentacion_activa"
+
+# Registro del rerun en curso, uno por hilo de ejecución del script
+_local = threading.local()
+_log = logging.getLogger(__name__)
+
+
+def _registro() -> dict | None:
+    return getattr(_local, "registro", None)
+
+
+def _contar_bytes(ctx) -> bool:
+    """Suma al registro los bytes de cada mensaje que se envía al navegador.
+    Envuelve el envío del contexto de la sesión una sola vez; el conteo se hace
+    en el hilo del rerun, por lo que solo cuenta mientras hay un registro activo.
+    El envío es un atributo privado de Streamlit; si una versión no lo tiene,
+    los tiempos se siguen registrando, sin bytes.
+    Returns:
+        contando (bool): Si los bytes de la sesión se están contando
+    """
+    if ctx is None:
+        return False
+    enviar = getattr(ctx, "_enqueue", None)
+    if not callable(enviar):
+        _log.warning(
+            "ScriptRunContext._enqueue no existe en esta versión de Streamlit; "
+            "la instrumentación no cuenta bytes"
+        )
+        return False
+    if getattr(enviar, "instrumentado", False):
+        return True
+
+    @functools.wraps(enviar)
+    def contar(mensaje):
+        registro = _registro()
+        if registro is not None:
+            tamano = mensaje.ByteSize()
+            registro["bytes"] += tamano
+            for etapa in registro["pila"]:
+                etapa["bytes"] += tamano
+        enviar(mensaje)
+
+    contar.instrumentado = True
+    ctx._enqueue = contar
+    return True
+
+
+def activa() -> bool:
+    """Indica si el usuario activó el panel de instrumentación en esta sesión."""
+    return st.session_state.get(CLAVE_ACTIVA, False)
+
+
+def iniciar(pagina: str):
+    """Comienza el registro de un rerun completo.
+    Parameters:
+        pagina (str): Nombre de la página que se va a ejecutar
+    """
+    _local.registro = dict(
+        pagina=pagina,
+        inicio=time.perf_counter(),
+        bytes=0,
+        bytes_medidos=False,
+        etapas=[],
+        pila=[],
+    )
+    if activa():
+        _local.registro["bytes_medidos"] = _contar_bytes(get_script_run_ctx())
+
+
+@contextlib.contextmanager
+def etapa(nombre: str, detalle: str = ""):
+    """Mide los milisegundos y bytes enviados de un bloque del rerun.
+    Fuera de un rerun iniciado no registra nada.
+    Parameters:
+        nombre (str): Nombre de la etapa, p. ej. make_subplots
+        detalle (str): Texto adicional, p. ej. el EIA o el archivo
+    """
+    registro = _registro()
+    if registro is None:
+        yield None
+        return
+    actual = dict(
+        etapa=nombre,
+        detalle=detalle,
+        nivel=len(registro["pila"]),
+        ms=0.0,
+        bytes=0,
+        cache=None,
+    )
+    registro["etapas"].append(actual)
+    registro["pila"].append(actual)
+    inicio = time.perf_counter()
+    try:
+        yield actual
+    finally:
+        actual["ms"] = (time.perf_counter() - inicio) * 1000
+        registro["pila"].pop()
+
+
+def medido(funcion):
+    """Decorador que registra cada llamada a `funcion` como una etapa."""
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        with etapa(funcion.__name__):
+            return funcion(*args, **kwargs)
+
+    return envoltura
+
+
+def cacheada(cache):
+    """Aplica el decorador de caché `cache` registrando aciertos y fallos.
+    Uso:
+        @instrumentacion.cacheada(st.cache_resource(show_spinner=False))
+        def leer(nombre): ...
+    """
+
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def calcular(*args, **kwargs):
+            # Solo se ejecuta cuando el valor no estaba en caché
+            registro = _registro()
+            if registro is not None and registro["pila"]:
+                registro["pila"][-1]["cache"] = "fallo"
+            return funcion(*args, **kwargs)
+
+        interna = cache(calcular)
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            detalle = ", ".join(str(i) for i in args)[:60]
+            with etapa(funcion.__name__, detalle) as actual:
+                if actual is not None:
+                    actual["cache"] = "acierto"
+                return interna(*args, **kwargs)
+
+        envoltura.clear = interna.clear
+        return envoltura
+
+    return decorador
+
+
+def terminar() -> dict | None:
+    """Cierra el registro del rerun, lo escribe en el log y muestra el panel.
+    El log y el panel solo se generan si el usuario activó la instrumentación.
+    Returns:
+        resumen (dict): Registro del rerun, None si no se inició
+    """
+    registro = _registro()
+    _local.registro = None
+    if registro is None:
+        return None
+    resumen = dict(
+        fecha=datetime.datetime.now().isoformat(timespec="seconds"),
+        pagina=registro["pagina"],
+        ms=(time.perf_counter() - registro["inicio"]) * 1000,
+        bytes=registro["bytes"],
+        bytes_medidos=registro["bytes_medidos"],
+        bytes_figuras=sum(
+            i["bytes"] for i in registro["etapas"] if i["etapa"] == "plotly_chart"
+        ),
+        aciertos_cache=sum(i["cache"] == "acierto" for i in registro["etapas"]),
+        fallos_cache=sum(i["cache"] == "fallo" for i in registro["etapas"]),
+        etapas=registro["etapas"],
+    )
+    with st.sidebar:
+        st.divider()
+        st.toggle("Instrumentación", key=CLAVE_ACTIVA)
+        if activa():
+            escribir_log(resumen)
+            panel(resumen)
+    return resumen
+
+
+def escribir_log(resumen: dict, ruta: str = RUTA_LOG):
+    """Agrega el registro de un rerun como un renglón json."""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "a", encoding="utf-8") as archivo:
+        archivo.write(json.dumps(resumen, ensure_ascii=False) + "\n")
+
+
+def panel(resumen: dict):
+    """Tiempos por etapa del último rerun, en la barra lateral."""
+    st.markdown(f"**Último rerun: {resumen['pagina']}**")
+    col_1, col_2 = st.columns(2)
+    col_1.metric("Milisegundos", value=round(resumen["ms"]))
+    if resumen["bytes_medidos"]:
+        col_2.metric("Kilobytes", value=round(resumen["bytes"] / 1024))
+    else:
+        col_2.metric("Kilobytes", value="-")
+    st.caption(
+        f"Figuras: {resumen['bytes_figuras'] / 1024:.0f} KB. "
+        f"Caché: {resumen['aciertos_cache']} aciertos, "
+        f"{resumen['fallos_cache']} fallos"
+    )
+    if resumen["etapas"]:
+        # Las etapas anidadas se indentan según su nivel
+        etapas = pl.DataFrame(resumen["etapas"]).select(
+            etapa=pl.Series(
+                ["· " * i["nivel"] + i["etapa"] for i in resumen["etapas"]]
+            ),
+            detalle="detalle",
+            cache="cache",
+            ms=pl.col("ms").round(1),
+            kb=(pl.col("bytes") / 1024).round(1),
+        )
+        st.dataframe(etapas, hide_index=True)
+    st.caption(f"Log: {RUTA_LOG}")
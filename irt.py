@@ -1,8 +1,15 @@
 import pyarrow
+import numpy as np
 import streamlit as st
 import polars as pl
 import plotly.graph_objects as go
 
+import cache_figuras
+import calibracion
+import datos
+import figuras
+import instrumentacion
+
 NIVELES_GRADO = {
     "Preescolar": [3],
     "Primaria": [1, 2, 3, 4, 5, 6],
@@ -18,6 +25,11 @@ PROCESOS = [
     "No definido",
 ]
 COLORES_PROCESO = dict(zip(PROCESOS, COLORES))
+COLORES_RESP = dict(
+    zip(calibracion.RESPUESTAS, ["#fcb1c3", "#ef476f", "#f5b700", "#008bf8"])
+)
+# Habilidad en logits donde se evalúan las curvas de los items
+THETA = np.linspace(-5, 5, 101)
 
 st.set_page_config(
     page_title="IRT - Evaluación diagnóstica 2024",
@@ -25,12 +37,174 @@ st.set_page_config(
     layout="wide",
 )
 
-diccionario = pl.read_parquet("data/diccionario.parquet").drop(["grado"])
 
-irt = pl.read_parquet("data/item_irt.parquet")
-irt = irt.sort("dificultad")
-procesos = irt["proceso"].unique(maintain_order=True)
-campos = irt["campo"].unique(maintain_order=True)
+@datos.compartido
+def leer_irt(nivel: str, grado: int) -> pl.DataFrame:
+    """Dificultades irt de un nivel y grado, el filtro se aplica en el escaneo."""
+    irt = (
+        datos.escanear("item_irt")
+        .filter(pl.col("nivel") == nivel, pl.col("grado") == grado)
+        .sort("dificultad")
+        .collect()
+    )
+    return irt
+
+
+@datos.compartido
+def leer_categorias() -> pl.DataFrame:
+    """Procesos y campos para los filtros, leyendo solo las columnas necesarias."""
+    categorias = (
+        datos.escanear("item_irt")
+        .sort("dificultad")
+        .select(["proceso", "campo"])
+        .collect()
+    )
+    return categorias
+
+
+@datos.compartido
+def leer_curvas(nivel: str, grado: int, eia: str) -> pl.DataFrame:
+    """Curvas de respuesta y de información de los items de un EIA.
+    Se evalúan todos los items, categorías y valores de THETA en una sola
+    operación sobre un arreglo items x categorías x habilidad, con los umbrales
+    en logits del modelo de crédito parcial.
+    Parameters:
+        nivel (str): Nivel educativo
+        grado (int): Grado
+        eia (str): EIA
+    Un item sin los últimos umbrales tiene menos categorías: las que faltan
+    tienen probabilidad 0. Los items sin umbrales o con un umbral intermedio
+    faltante no tienen curvas.
+    Returns:
+        curvas (pl.DataFrame): Un renglón por item y habilidad (en la escala de
+            dificultad), con la probabilidad de N0 a N3 y la información
+    """
+    umbrales = (
+        leer_irt(nivel, grado)
+        .filter(pl.col("eia") == eia)
+        .pivot(
+            on="resp_nivel",
+            index="item",
+            values="irt_dificultad",
+            aggregate_function="first",
+            sort_columns=True,
+        )
+    )
+    matriz = umbrales.drop("item").to_numpy().astype(np.float64)
+    faltantes = np.isnan(matriz)
+    # Después del primer umbral faltante ya no debe haber umbrales
+    seguidos = (np.diff(faltantes.astype(np.int8), axis=1) >= 0).all(axis=1)
+    completos = ~faltantes[:, 0] & seguidos
+    umbrales = umbrales.filter(completos)
+    probabilidad = np.exp(
+        calibracion.log_probabilidades(
+            np.where(faltantes, np.inf, matriz)[completos], THETA
+        )
+    )
+    # La información de un item de crédito parcial es la varianza de su respuesta
+    categorias = np.arange(calibracion.CATEGORIAS)[None, :, None]
+    media = (categorias * probabilidad).sum(axis=1)
+    informacion = (categorias**2 * probabilidad).sum(axis=1) - media**2
+    curvas = pl.DataFrame(
+        {
+            "item": np.repeat(umbrales["item"].to_numpy(), len(THETA)),
+            "habilidad": np.tile(calibracion.escala(THETA), umbrales.height),
+            **{
+                resp: probabilidad[:, numero, :].ravel()
+                for numero, resp in enumerate(calibracion.RESPUESTAS)
+            },
+            "informacion": informacion.ravel(),
+        }
+    )
+    return curvas
+
+
+@instrumentacion.medido
+def crear_figura_informacion(curvas: pl.DataFrame) -> go.Figure:
+    """Información de cada item y del EIA completo sobre la habilidad."""
+    # Las curvas de todos los items se separan en una sola pasada
+    lista = [
+        go.Scatter(
+            x=figuras.compactar(curvas_item["habilidad"]),
+            y=figuras.compactar(curvas_item["informacion"]),
+            mode="lines",
+            name=item,
+            line=dict(color="#9999bb", width=1),
+            showlegend=False,
+        )
+        for (item,), curvas_item in figuras.partir(curvas, "item").items()
+    ]
+    prueba = curvas.group_by("habilidad", maintain_order=True).agg(
+        pl.col("informacion").sum()
+    )
+    lista.append(
+        go.Scatter(
+            x=figuras.compactar(prueba["habilidad"]),
+            y=figuras.compactar(prueba["informacion"]),
+            mode="lines",
+            name="EIA",
+            line=dict(color=COLORES[0], width=3),
+        )
+    )
+    figura = go.Figure(lista)
+    figura.update_xaxes(title_text="Habilidad")
+    figura.update_yaxes(title_text="Información")
+    figura.update_layout(height=400, margin=dict(t=40, b=15), title="Información")
+    return figura
+
+
+@instrumentacion.medido
+def crear_figura_categorias(curvas_item: pl.DataFrame, item: str) -> go.Figure:
+    """Probabilidad de cada nivel de respuesta de un item sobre la habilidad."""
+    figura = go.Figure(
+        [
+            go.Scatter(
+                x=curvas_item["habilidad"],
+                y=curvas_item[resp],
+                mode="lines",
+                name=resp,
+                line=dict(color=COLORES_RESP[resp], width=2),
+            )
+            for resp in calibracion.RESPUESTAS
+        ]
+    )
+    figura.update_xaxes(title_text="Habilidad")
+    figura.update_yaxes(title_text="Probabilidad", range=(0, 1))
+    figura.update_layout(height=400, margin=dict(t=40, b=15), title=item)
+    return figura
+
+
+@instrumentacion.medido
+def crear_figura(irt_filtro_eia: pl.DataFrame, limites_y: tuple | None) -> go.Figure:
+    """Dificultades de los items de un EIA, con un color por proceso."""
+    figura = go.Figure(
+        go.Scatter(
+            x=irt_filtro_eia["item_clave"],
+            y=irt_filtro_eia["dificultad"],
+            mode="lines",
+            line=dict(color="#9999bb", width=1),
+            showlegend=False,
+        )
+    )
+    for proceso in irt_filtro_eia["proceso"].unique(maintain_order=True):
+        medias_proceso = irt_filtro_eia.filter(pl.col("proceso") == proceso)
+        figura.add_trace(
+            go.Scatter(
+                x=medias_proceso["item_clave"],
+                y=medias_proceso["dificultad"],
+                mode="markers",
+                name=proceso,
+                marker=dict(color=COLORES_PROCESO[proceso], size=10),
+                hovertext=medias_proceso["campo"],
+            )
+        )
+    figura.update_yaxes(range=limites_y)
+    return figura
+
+
+categorias = leer_categorias()
+procesos = categorias["proceso"].unique(maintain_order=True)
+campos = categorias["campo"].unique(maintain_order=True)
 
 #### Streamlit ####
 st.title("IRT Evaluación Diagnóstica 2024")
@@ -39,10 +213,7 @@ with st.sidebar:
     sel_nivel = st.selectbox("Nivel", options=NIVELES_GRADO.keys(), index=2)
     sel_grado = st.selectbox("Grado", options=NIVELES_GRADO[sel_nivel])
 
-irt_filtro = irt.filter(
-    pl.col("nivel") == sel_nivel,
-    pl.col("grado") == sel_grado,
-)
+irt_filtro = leer_irt(sel_nivel, sel_grado)
 #.sort(["proceso", "consigna", "inciso", "criterio_num"])
 
 eia_filtro = irt_filtro["eia"].unique(maintain_order=True)
@@ -60,57 +231,88 @@ medias_filtro = irt_filtro.filter(
 
 orden = st.radio("Ordenar por:", ["Proceso", "Dificultad", "Reactivo"], horizontal=True)
 if st.checkbox("Limites 0-800"):
-    limites_y = [0, 800]
+    limites_y = (0, 800)
 else:
     limites_y = None
 
+# Las figuras dependen de los procesos y campos seleccionados
+filtros = (sel_nivel, sel_grado, tuple(sel_proceso), tuple(sel_campo))
+
 for eia in medias_filtro["eia"].unique():
     st.markdown(f"### {eia}")
     irt_filtro_eia = medias_filtro.filter(pl.col("eia") == eia)
 
-    if orden == "Proceso":
-        irt_filtro_eia = irt_filtro_eia.sort(["proceso", "dificultad"])
-    elif orden == "Dificultad":
-        irt_filtro_eia = irt_filtro_eia.sort("dificultad")
-    elif orden == "Reactivo":
-        irt_filtro_eia = irt_filtro_eia.sort(
-            ["consigna", "inciso", "item_clave"]
-        )
+    with instrumentacion.etapa("ordenar", eia):
+        if orden == "Proceso":
+            irt_filtro_eia = irt_filtro_eia.sort(["proceso", "dificultad"])
+        elif orden == "Dificultad":
+            irt_filtro_eia = irt_filtro_eia.sort("dificultad")
+        elif orden == "Reactivo":
+            irt_filtro_eia = irt_filtro_eia.sort(
+                ["consigna", "inciso", "item_clave"]
+            )
 
-    figura = go.Figure(
-        go.Scatter(
-            x=irt_filtro_eia["item_clave"],
-            y=irt_filtro_eia["dificultad"],
-            mode="lines",
-            line=dict(color="#9999bb", width=1),
-            showlegend=False,
-        )
+    figura = cache_figuras.figura(
+        "irt",
+        (*filtros, eia, orden, limites_y),
+        ["item_irt"],
+        crear_figura,
+        irt_filtro_eia,
+        limites_y,
     )
-    for proceso in irt_filtro_eia["proceso"].unique(maintain_order=True):
-        medias_proceso = irt_filtro_eia.filter(pl.col("proceso") == proceso)
-        figura.add_trace(
-            go.Scatter(
-                x=medias_proceso["item_clave"],
-                y=medias_proceso["dificultad"],
-                mode="markers",
-                name=proceso,
-                marker=dict(color=COLORES_PROCESO[proceso], size=10),
-                hovertext=medias_proceso["campo"],
-            )
-        )
-    figura.update_yaxes(range=limites_y)
-    st.plotly_chart(figura)
+    with instrumentacion.etapa("plotly_chart", eia):
+        st.plotly_chart(figura)
     campos_eia = irt_filtro_eia["campo"].unique(maintain_order=True)
-    st.dataframe(
-        irt_filtro_eia[
-            [
-                "item_clave",
-                "proceso",
-                "dificultad",
-                "campo",
-                "pda",
-                "descriptor",
-                "criterio",
+    with instrumentacion.etapa("st.dataframe", eia):
+        st.dataframe(
+            irt_filtro_eia[
+                [
+                    "item_clave",
+                    "proceso",
+                    "dificultad",
+                    "campo",
+                    "pda",
+                    "descriptor",
+                    "criterio",
+                ]
             ]
-        ]
-    )
+        )
+    # Curvas de todos los items del EIA, sin los filtros de proceso y campo
+    if st.checkbox("Mostrar curvas de información.", key=f"curvas_{eia}"):
+        curvas = leer_curvas(sel_nivel, sel_grado, eia)
+        excluidos = sorted(
+            set(leer_irt(sel_nivel, sel_grado).filter(pl.col("eia") == eia)["item"])
+            - set(curvas["item"])
+        )
+        if excluidos:
+            st.warning(
+                "Items sin curvas por umbrales faltantes, no se suman a la "
+                f"información del EIA: {', '.join(excluidos)}"
+            )
+        col_1, col_2 = st.columns(2)
+        with col_1:
+            figura_informacion = cache_figuras.figura(
+                "irt_curvas",
+                (sel_nivel, sel_grado, eia),
+                ["item_irt"],
+                crear_figura_informacion,
+                curvas,
+            )
+            with instrumentacion.etapa("plotly_chart", eia):
+                st.plotly_chart(figura_informacion, key=f"informacion_{eia}")
+        with col_2:
+            sel_item = st.selectbox(
+                "Item",
+                options=curvas["item"].unique(maintain_order=True),
+                key=f"item_curvas_{eia}",
+            )
+            figura_categorias = cache_figuras.figura(
+                "irt_curvas",
+                (sel_nivel, sel_grado, eia, sel_item),
+                ["item_irt"],
+                crear_figura_categorias,
+                curvas.filter(pl.col("item") == sel_item),
+                sel_item,
+            )
+            with instrumentacion.etapa("plotly_chart", eia):
+                st.plotly_chart(figura_categorias, key=f"categorias_{eia}")
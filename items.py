@@ -2,6 +2,8 @@ import streamlit as st
 import polars as pl
 import plotly.express as px
 
+import datos
+
 
 NIVELES_GRADO = {
     "Preescolar": [3],
@@ -18,7 +20,7 @@ st.set_page_config(
 )
 
 
-@st.cache_data
+@datos.compartido
 def importar_items(ruta: str) -> pl.DataFrame:
     """Lee los datos de items desde parquet a un dataframe de polars."""
     data_items = pl.read_parquet(ruta)
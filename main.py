@@ -1,5 +1,136 @@
+"""Tareas del tablero que recorren las páginas sin navegador.
+
+Uso, desde la raíz del repositorio y después de transform_conteos.py:
+    python main.py precalcular [--procesos 4] [--paginas conteos.py irt.py]
+    python main.py exportar [--procesos 4] [--salida sitio]
+
+Cada página se ejecuta con AppTest, recorriendo las combinaciones de sus
+controles, repartidas entre procesos por la primera opción de cada página
+(p. ej. el nivel). Los multiselects conservan su valor por omisión.
+
+precalcular escribe las figuras construidas en cache_figuras.RUTA_ALMACEN con
+la huella de los datos en su clave, de modo que al iniciar el servidor las
+páginas las leen del disco en lugar de construirlas.
+
+exportar escribe un html estático por combinación, con sus figuras y tablas,
+que comparten un solo plotly.js en la raíz del sitio.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cache_figuras
+import exportacion
+import precalculo
+import recorrido
+
+
+def precalcular(args):
+    inicio = time.perf_counter()
+    # Las páginas leen las figuras de cache_figuras.RUTA_ALMACEN
+    almacen = cache_figuras.RUTA_ALMACEN
+    # Se escribe en un directorio nuevo y se reemplaza el almacén al terminar,
+    # así el servidor nunca lee un almacén a medio escribir
+    os.makedirs(os.path.dirname(os.path.abspath(almacen)), exist_ok=True)
+    destino = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(almacen)))
+    with ProcessPoolExecutor(args.procesos) as ejecutor:
+        opciones = ejecutor.map(recorrido.primeras_opciones, args.paginas)
+        tareas = [
+            (pagina, opcion)
+            for pagina, primeras in zip(args.paginas, opciones)
+            for opcion in primeras
+        ]
+        futuros = {
+            ejecutor.submit(precalculo.precalcular, pagina, opcion, destino): (
+                pagina,
+                opcion,
+            )
+            for pagina, opcion in tareas
+        }
+        total = 0
+        for futuro, (pagina, opcion) in futuros.items():
+            total += futuro.result()
+            print(f"{pagina} {opcion}: listo")
+
+    # Las páginas no precalculadas conservan sus figuras anteriores, salvo las
+    # de huellas de datos que ya no son las actuales
+    for pagina in os.listdir(almacen) if os.path.isdir(almacen) else []:
+        if not os.path.exists(os.path.join(destino, pagina)):
+            shutil.copytree(
+                os.path.join(almacen, pagina), os.path.join(destino, pagina)
+            )
+    borrados = cache_figuras.limpiar_almacen(destino)
+    anterior = f"{destino}.anterior"
+    if os.path.isdir(almacen):
+        os.rename(almacen, anterior)
+    os.rename(destino, almacen)
+    shutil.rmtree(anterior, ignore_errors=True)
+
+    archivos = sum(
+        i != cache_figuras.ARCHIVO_HUELLA
+        for _, _, nombres in os.walk(almacen)
+        for i in nombres
+    )
+    print(
+        f"{total} combinaciones, {archivos} figuras en {almacen} "
+        f"en {time.perf_counter() - inicio:.1f} s, {borrados} huellas viejas borradas"
+    )
+
+
+def exportar(args):
+    inicio = time.perf_counter()
+    os.makedirs(args.salida, exist_ok=True)
+    exportacion.escribir_recursos(args.salida)
+    with ProcessPoolExecutor(args.procesos) as ejecutor:
+        opciones = ejecutor.map(recorrido.primeras_opciones, args.paginas)
+        futuros = [
+            (pagina, ejecutor.submit(exportacion.exportar, pagina, opcion, args.salida))
+            for pagina, primeras in zip(args.paginas, opciones)
+            for opcion in primeras
+        ]
+        exportados = {pagina: [] for pagina in args.paginas}
+        for pagina, futuro in futuros:
+            exportados[pagina].extend(futuro.result())
+    exportacion.escribir_indice(args.salida, exportados)
+
+    megabytes = sum(
+        os.path.getsize(os.path.join(directorio, i))
+        for directorio, _, archivos in os.walk(args.salida)
+        for i in archivos
+    )
+    megabytes /= 1024**2
+    total = sum(len(i) for i in exportados.values())
+    print(
+        f"{total} páginas en {args.salida}, {megabytes:.1f} MB "
+        f"en {time.perf_counter() - inicio:.1f} s"
+    )
+
+
 def main():
-    print("Hello from ed24-dashboard!")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    tareas = parser.add_subparsers(dest="tarea", required=True)
+
+    parser_precalcular = tareas.add_parser("precalcular", help="Almacén de figuras")
+    parser_precalcular.add_argument(
+        "--paginas", nargs="+", default=precalculo.PAGINAS
+    )
+    parser_precalcular.add_argument("--procesos", type=int, default=os.cpu_count())
+    parser_precalcular.set_defaults(funcion=precalcular)
+
+    parser_exportar = tareas.add_parser("exportar", help="Sitio html estático")
+    parser_exportar.add_argument(
+        "--paginas", nargs="+", default=list(exportacion.PAGINAS)
+    )
+    parser_exportar.add_argument("--procesos", type=int, default=os.cpu_count())
+    parser_exportar.add_argument("--salida", default="sitio")
+    parser_exportar.set_defaults(funcion=exportar)
+
+    args = parser.parse_args()
+    args.funcion(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+import streamlit as st
+import polars as pl
+import plotly.graph_objects as go
+
+import cache_figuras
+import datos
+import figuras
+import instrumentacion
+
+NIVELES = ["Preescolar", "Primaria", "Secundaria"]
+RESPUESTAS = ["N0", "N1", "N2", "N3"]
+COLS_MAPA = [
+    "grado",
+    "eia_clave",
+    "eia",
+    "item",
+    "proceso",
+    "consigna",
+    "inciso",
+    "resp",
+    "prop",
+]
+# Alto de cada renglón del mapa, en pixeles
+ALTO_RENGLON = 16
+
+st.set_page_config(
+    page_title="Mapa de items - Evaluación diagnóstica 2024",
+    page_icon=":worm:",
+    layout="wide",
+)
+
+
+@datos.compartido
+def leer_mapa(nivel: str) -> pl.DataFrame:
+    """Porcentaje de cada respuesta por item y grado, una columna por respuesta.
+    Parameters:
+        nivel (str): Nivel educativo
+    Returns:
+        mapa (pl.DataFrame): Un renglón por item y grado, columnas N0 a N3
+    """
+    mapa = (
+        datos.escanear("st_conteo")
+        .filter(pl.col("nivel") == nivel)
+        .select(COLS_MAPA)
+        .collect()
+        .pivot(
+            on="resp",
+            index=[i for i in COLS_MAPA if i not in ("resp", "prop")],
+            values="prop",
+        )
+        .with_columns(
+            pl.col(RESPUESTAS).fill_null(0),
+            etiqueta=pl.format("{}° {}", "grado", "item"),
+        )
+    )
+    return mapa
+
+
+@instrumentacion.medido
+def crear_figura(mapa: pl.DataFrame) -> go.Figure:
+    """Una sola traza heatmap con todos los items del nivel."""
+    porcentajes = mapa.select(figuras.compactar(mapa[i]) for i in RESPUESTAS)
+    figura = go.Figure(
+        go.Heatmap(
+            z=porcentajes.to_numpy(),
+            x=RESPUESTAS,
+            y=mapa["etiqueta"],
+            zmin=0,
+            zmax=100,
+            colorscale="Blues",
+            texttemplate="%{z:.0f}",
+            hovertemplate="%{y}<br>%{x}: %{z:.1f}%<extra></extra>",
+            colorbar=dict(title="Porcentaje"),
+        )
+    )
+    figura.update_yaxes(autorange="reversed", type="category", tickfont_size=10)
+    figura.update_xaxes(side="top")
+    figura.update_layout(
+        height=ALTO_RENGLON * mapa.height + 80,
+        width=500,
+        margin=dict(t=40, b=10),
+    )
+    return figura
+
+
+#### Streamlit ####
+st.title("Mapa de items Evaluación Diagnóstica 2024")
+st.markdown(
+    "Porcentaje de cada nivel de respuesta para todos los items y grados del "
+    "nivel educativo."
+)
+
+with st.sidebar:
+    sel_nivel = st.selectbox("Nivel", options=NIVELES, index=2)
+
+sel_orden = st.radio(
+    "Ordenar por:",
+    ["Reactivo", "Proceso", "Nivel 0", "Nivel 3"],
+    horizontal=True,
+)
+
+mapa = leer_mapa(sel_nivel)
+with instrumentacion.etapa("ordenar", sel_orden):
+    if sel_orden == "Reactivo":
+        mapa = mapa.sort(["grado", "eia_clave", "consigna", "inciso", "item"])
+    elif sel_orden == "Proceso":
+        mapa = mapa.sort(["grado", "proceso", "item"])
+    elif sel_orden == "Nivel 0":
+        mapa = mapa.sort("N0", descending=True)
+    elif sel_orden == "Nivel 3":
+        mapa = mapa.sort("N3", descending=True)
+
+st.caption(f"{mapa.height} items en {mapa['grado'].n_unique()} grados.")
+figura = cache_figuras.figura(
+    "mapa_items",
+    (sel_nivel, sel_orden),
+    ["st_conteo"],
+    crear_figura,
+    mapa,
+)
+with instrumentacion.etapa("plotly_chart", sel_nivel):
+    st.plotly_chart(figura, width="content")
@@ -2,6 +2,11 @@ import streamlit as st
 import polars as pl
 import plotly.graph_objects as go
 
+import cache_figuras
+import datos
+import figuras
+import instrumentacion
+
 NIVELES_GRADO = {
     "Preescolar": [3],
     "Primaria": [1, 2, 3, 4, 5, 6],
@@ -27,65 +32,46 @@ st.set_page_config(
 )
 
 
-@st.cache_data
-def leer_medias(ruta_diccionario: str, ruta_medias: str) -> pl.DataFrame:
-    """Lee el diccionario y medias de los ítems."""
-    diccionario = pl.read_parquet(ruta_diccionario).drop("grado")
+def escanear_medias(ruta_diccionario: str, ruta_medias: str) -> pl.LazyFrame:
+    """Plan de lectura del diccionario y medias de los ítems."""
+    diccionario = pl.scan_parquet(ruta_diccionario).drop("grado")
     medias = (
-        pl.read_parquet(ruta_medias)
+        pl.scan_parquet(ruta_medias)
         .join(diccionario, how="inner", on="item")
         .sort("media")
     )
     return medias
 
 
-medias = leer_medias(RUTA_DICCIONARIO, RUTA_MEDIAS)
-
-procesos = medias["proceso"].unique(maintain_order=True)
-campos = medias["campo"].unique(maintain_order=True)
-
-#### Streamlit ####
-st.title("Medias Evaluación Diagnóstica 2024")
-
-with st.sidebar:
-    sel_cnt_nivel = st.selectbox("Nivel", options=NIVELES_GRADO.keys(), index=2)
-    sel_cnt_grado = st.selectbox("Grado", options=NIVELES_GRADO[sel_cnt_nivel])
-
-medias_filtro = medias.filter(
-    pl.col("nivel") == sel_cnt_nivel,
-    pl.col("grado") == sel_cnt_grado,
-).sort(["proceso", "consigna", "inciso", "criterio_num"])
-
-eia_filtro = medias_filtro["eia"].unique(maintain_order=True)
-
-with st.sidebar:
-    sel_cnt_eia = st.multiselect("EIA", options=eia_filtro, default=eia_filtro)
-    sel_cnt_proceso = st.multiselect("Proceso", options=procesos, default=procesos)
-    sel_cnt_campo = st.multiselect("Campo formativo", options=campos, default=campos)
-
-medias_filtro = medias_filtro.filter(
-    pl.col("eia").is_in(sel_cnt_eia),
-    pl.col("proceso").is_in(sel_cnt_proceso),
-    pl.col("campo").is_in(sel_cnt_campo),
-)
+@datos.compartido
+def leer_medias(
+    ruta_diccionario: str, ruta_medias: str, nivel: str, grado: int
+) -> pl.DataFrame:
+    """Lee las medias de un nivel y grado, el filtro se aplica en el escaneo."""
+    medias = (
+        escanear_medias(ruta_diccionario, ruta_medias)
+        .filter(pl.col("nivel") == nivel, pl.col("grado") == grado)
+        .collect()
+    )
+    return medias
 
-orden = st.radio("Ordenar por:", ["Proceso", "Media", "Reactivo"], horizontal=True)
-if st.checkbox("Limites 0-3"):
-    limites_y = [0, 3]
-else:
-    limites_y = None
 
-for eia in medias_filtro["eia"].unique():
-    st.markdown(f"### {eia}")
-    medias_filtro_eia = medias_filtro.filter(pl.col("eia") == eia)
+@datos.compartido
+def leer_categorias(ruta_diccionario: str, ruta_medias: str) -> pl.DataFrame:
+    """Procesos y campos para los filtros, leyendo solo las columnas necesarias."""
+    categorias = (
+        escanear_medias(ruta_diccionario, ruta_medias)
+        .select(["proceso", "campo"])
+        .collect()
+    )
+    return categorias
 
-    if orden == "Proceso":
-        medias_filtro_eia = medias_filtro_eia.sort(["proceso", "media"])
-    elif orden == "Media":
-        medias_filtro_eia = medias_filtro_eia.sort("media", descending=False)
-    elif orden == "Reactivo":
-        medias_filtro_eia = medias_filtro_eia.sort(["consigna", "inciso", "item"])
 
+@instrumentacion.medido
+def crear_figura(
+    medias_filtro_eia: pl.DataFrame, limites_y: tuple | None
+) -> go.Figure:
+    """Medias de los items de un EIA, con un color por proceso."""
     figura = go.Figure(
         go.Scatter(
             x=medias_filtro_eia["item"],
@@ -95,7 +81,7 @@ for eia in medias_filtro["eia"].unique():
             showlegend=False,
         )
     )
-    for proceso in medias_filtro_eia["proceso"].unique():
+    for proceso in medias_filtro_eia["proceso"].unique(maintain_order=True):
         medias_proceso = medias_filtro_eia.filter(
             medias_filtro_eia["proceso"] == proceso
         )
@@ -113,10 +99,95 @@ for eia in medias_filtro["eia"].unique():
     figura.update_layout(
         margin=dict(t=20),
     )
-    st.plotly_chart(figura)
+    return figura
+
+
+@st.fragment
+@instrumentacion.medido
+def seccion_eia(
+    eia: str,
+    medias_filtro_eia: pl.DataFrame,
+    orden: str,
+    limites_y: tuple | None,
+    filtros: tuple,
+):
+    """Figura y tabla de un EIA.
+    Es un fragmento: sus controles solo vuelven a ejecutar esta sección y no
+    las gráficas de los demás EIA. La figura se guarda en la caché de figuras
+    con los filtros de la barra lateral.
+    """
+    st.markdown(f"### {eia}")
+
+    with instrumentacion.etapa("ordenar", eia):
+        if orden == "Proceso":
+            medias_filtro_eia = medias_filtro_eia.sort(["proceso", "media"])
+        elif orden == "Media":
+            medias_filtro_eia = medias_filtro_eia.sort("media", descending=False)
+        elif orden == "Reactivo":
+            medias_filtro_eia = medias_filtro_eia.sort(["consigna", "inciso", "item"])
+
+    figura = cache_figuras.figura(
+        "medias",
+        (*filtros, eia, orden, limites_y),
+        ["diccionario", "item_medias"],
+        crear_figura,
+        medias_filtro_eia,
+        limites_y,
+    )
+    with instrumentacion.etapa("plotly_chart", eia):
+        st.plotly_chart(figura)
     if st.checkbox("Mostrar información", key=f"check_tabla_{eia}"):
-        st.dataframe(
-            medias_filtro_eia.select(
-                ["item", "proceso", "media", "campo", "pda", "descriptor", "criterio"]
-            ).rename(str.capitalize)
-        )
+        with instrumentacion.etapa("st.dataframe", eia):
+            st.dataframe(
+                medias_filtro_eia.select(
+                    [
+                        "item",
+                        "proceso",
+                        "media",
+                        "campo",
+                        "pda",
+                        "descriptor",
+                        "criterio",
+                    ]
+                ).rename(str.capitalize)
+            )
+
+
+categorias = leer_categorias(RUTA_DICCIONARIO, RUTA_MEDIAS)
+procesos = categorias["proceso"].unique(maintain_order=True)
+campos = categorias["campo"].unique(maintain_order=True)
+
+#### Streamlit ####
+st.title("Medias Evaluación Diagnóstica 2024")
+
+with st.sidebar:
+    sel_cnt_nivel = st.selectbox("Nivel", options=NIVELES_GRADO.keys(), index=2)
+    sel_cnt_grado = st.selectbox("Grado", options=NIVELES_GRADO[sel_cnt_nivel])
+
+medias_filtro = leer_medias(
+    RUTA_DICCIONARIO, RUTA_MEDIAS, sel_cnt_nivel, sel_cnt_grado
+).sort(["proceso", "consigna", "inciso", "criterio_num"])
+
+eia_filtro = medias_filtro["eia"].unique(maintain_order=True)
+
+with st.sidebar:
+    sel_cnt_eia = st.multiselect("EIA", options=eia_filtro, default=eia_filtro)
+    sel_cnt_proceso = st.multiselect("Proceso", options=procesos, default=procesos)
+    sel_cnt_campo = st.multiselect("Campo formativo", options=campos, default=campos)
+
+medias_filtro = medias_filtro.filter(
+    pl.col("eia").is_in(sel_cnt_eia),
+    pl.col("proceso").is_in(sel_cnt_proceso),
+    pl.col("campo").is_in(sel_cnt_campo),
+)
+
+orden = st.radio("Ordenar por:", ["Proceso", "Media", "Reactivo"], horizontal=True)
+if st.checkbox("Limites 0-3"):
+    limites_y = (0, 3)
+else:
+    limites_y = None
+
+# Las figuras dependen de los procesos y campos seleccionados
+filtros = (sel_cnt_nivel, sel_cnt_grado, tuple(sel_cnt_proceso), tuple(sel_cnt_campo))
+for (eia,), medias_filtro_eia in figuras.partir(medias_filtro, "eia").items():
+    seccion_eia(eia, medias_filtro_eia, orden, limites_y, filtros)
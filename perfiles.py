@@ -4,6 +4,11 @@ import polars as pl
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+import cortes
+import datos
+import histogramas
+import instrumentacion
+
 NIVELES_GRADO = {
     "Preescolar": [3],
     "Primaria": [1, 2, 3, 4, 5, 6],
@@ -25,27 +30,259 @@ COLUMNAS_TABLA = [
 COLOR_LINEA = "#9b5de5"
 COLOR_BARRA = "#bfd3c1"
 
-# Diccionario de variables
-diccionario = pd.read_parquet("data/diccionario.parquet")
-diccionario = diccionario.drop(
-    [
-        "fase",
-        "grado",
-        "eia_clave",
-        "pda_grado",
-        "criterio_clave",
-        "peso_max",
-        "ponderador",
-    ],
-    axis=1,
-)
-### rubrica = pd.read_parquet("data/diccionario_rubrica.parquet")
-# Data irt
-irt = pd.read_parquet("data/item_irt_eia.parquet")
-irt = irt.merge(diccionario, how="inner", on=["item"])
+
+@instrumentacion.cacheada(st.cache_resource)
+def leer_irt() -> pd.DataFrame:
+    """Une dificultades irt con el diccionario de variables, una vez por proceso."""
+    # Diccionario de variables
+    diccionario = datos.leer_pandas("diccionario")
+    diccionario = diccionario.drop(
+        [
+            "fase",
+            "grado",
+            "eia_clave",
+            "pda_grado",
+            "criterio_clave",
+            "peso_max",
+            "ponderador",
+        ],
+        axis=1,
+    )
+    # Data irt
+    irt = datos.leer_pandas("item_irt_eia")
+    irt = irt.merge(diccionario, how="inner", on=["item"])
+    return irt
+
+
+@instrumentacion.cacheada(st.cache_resource)
+def leer_cortes() -> cortes.IndiceCortes:
+    """Puntajes ordenados de personas por nivel, grado y EIA, una vez por proceso.
+    Con el archivo de puntajes por persona los porcentajes son exactos, si no
+    se usan los cuantiles de personas.
+    """
+    fuente = "personas_puntajes" if histogramas.hay_puntajes() else "personas"
+    return cortes.IndiceCortes(datos.leer(fuente), ["nivel", "grado", "eia"])
+
+
+def crear_figura(
+    eia: str, irt_eia: pd.DataFrame, personas_dist_eia: pl.DataFrame, lineas: list
+) -> go.Figure:
+    """Subplot mapa de Wright: items a la izquierda, personas a la derecha.
+    Parameters:
+        eia (str): Nombre del EIA, para la instrumentación
+        irt_eia (pd.DataFrame): Dificultades de los items del EIA
+        personas_dist_eia (pl.DataFrame): Histograma de habilidades del EIA
+        lineas (list): Puntos de corte, una línea horizontal por cada uno
+    Returns:
+        fig (go.Figure): Figura de plotly
+    """
+    with instrumentacion.etapa("make_subplots", eia):
+        fig = make_subplots(
+            rows=1,
+            cols=2,
+            column_widths=[0.75, 0.25],
+            subplot_titles=["Items", "Personas"],
+            shared_yaxes=True,
+            horizontal_spacing=0,
+        )
+        # Un trace de Scatter por cada nivel de respuesta
+        for resp in irt_eia["resp"].unique():
+            irt_resp = irt_eia.loc[irt_eia["resp"] == resp]
+            fig.add_trace(
+                go.Scatter(
+                    x=irt_resp["item"],
+                    y=irt_resp["dificultad"],
+                    name=resp,
+                    mode="markers+text",
+                    text=irt_resp["dificultad"].round().astype(str),
+                    textposition="top center",
+                    hovertext=(
+                        irt_resp["criterio"].astype(str)
+                        + "<br>"
+                        + irt_resp["proceso"].astype("str")
+                        + "<br>"
+                        + irt_resp["campo"].astype("str")
+                    ),
+                    marker=dict(color=COLORES_RESP[resp]),
+                ),
+                row=1,
+                col=1,
+            )
+        fig.update_xaxes(title_text="Criterios", row=1, col=1)
+        fig.update_yaxes(title_text="Dificultad")
+        # Trace de personas, en modo vertical
+        fig.add_trace(
+            go.Bar(
+                x=personas_dist_eia["conteo"],
+                y=personas_dist_eia["dificultad"],
+                marker=dict(color=COLOR_BARRA),
+                orientation="h",
+                showlegend=False,
+            ),
+            row=1,
+            col=2,
+        )
+        fig.update_xaxes(title_text="Conteo", row=1, col=2)
+        fig.update_yaxes(title_text="Habilidad", side="right", row=1, col=2)
+        # Lineas horizontales en scatter y bar, una por punto de corte
+        for corte in lineas:
+            fig.add_hline(y=corte, line_width=1.5, line_color=COLOR_LINEA, row=1, col=2)
+            fig.add_hline(
+                y=corte,
+                line_width=1.5,
+                line_color=COLOR_LINEA,
+                row=1,
+                col=1,
+            )
+        # Layout general del subplot
+        fig.update_layout(
+            barmode="group",
+            bargap=0.0,
+            height=500,
+            margin=dict(t=25, b=15),
+        )
+    return fig
+
+
+@st.fragment
+@instrumentacion.medido
+def seccion_eia(
+    eia: str,
+    irt_eia: pd.DataFrame,
+    personas_eia: pd.DataFrame,
+    personas_dist_eia: pl.DataFrame,
+    dificultades,
+    cuantiles: dict,
+):
+    """Mapa de Wright de un EIA con su punto de corte y tablas.
+    Es un fragmento: mover el punto de corte solo vuelve a ejecutar esta
+    sección y no las gráficas de los demás EIA. Las opciones del punto de
+    corte y su cuantil de personas llegan ya calculadas.
+    """
+    st.markdown(f"## {eia}")
+    # Controles de punto corte
+    col_1, col_2 = st.columns([0.7, 0.3])
+    with col_1:
+        sel_dif = st.select_slider(
+            "Punto de corte", options=dificultades, key=f"slider_{eia}"
+        )
+    # Indicador de población debajo del punto de corte
+    with col_2:
+        st.metric("Personas debajo del corte.", value=cuantiles[sel_dif])
+    if sel_dif < 0:
+        sel_dif = 0
+    fig = crear_figura(eia, irt_eia, personas_dist_eia, [sel_dif])
+    with instrumentacion.etapa("plotly_chart", eia):
+        st.plotly_chart(fig, key=f"subplot_{eia}")
+    # Criterios arriba y debajo del corte
+    if st.checkbox(
+        "Mostrar tabla de criterios.", value=False, key=f"check_tabla_{eia}"
+    ):
+        irt_cuantil = irt_eia.sort_values("dificultad")
+        irt_cuantil.loc[:, "posicion"] = [
+            "Arriba" if i >= sel_dif else "Abajo" for i in irt_cuantil["dificultad"]
+        ]
+        st.markdown("### Posición de los criterios respecto al punto de corte.")
+        posiciones = st.multiselect(
+            "Mostrar sólo criterios que están:",
+            options=["Arriba", "Abajo"],
+            default=["Arriba", "Abajo"],
+            key=f"posicion_{eia}",
+        )
+        irt_cuantil = irt_cuantil[COLUMNAS_TABLA]
+        with instrumentacion.etapa("st.dataframe", eia):
+            st.dataframe(irt_cuantil.loc[irt_cuantil["posicion"].isin(posiciones)])
+    # Tabla de cuantiles de personas
+    if st.checkbox(
+        "Mostrar cuantiles de personas.", value=False, key=f"check_tabla_persona_{eia}"
+    ):
+        persona_tabla = personas_eia
+        persona_tabla.loc[:, "puntaje"] = persona_tabla.loc[:, "puntaje"].round(2)
+        persona_tabla = (
+            persona_tabla[["cuantil", "puntaje"]].reset_index(drop=True).transpose()
+        )
+        st.markdown("### Cuantiles de habilidades de las personas.")
+        with instrumentacion.etapa("st.table", eia):
+            st.table(persona_tabla)
+
+
+
+@st.fragment
+@instrumentacion.medido
+def seccion_bandas(
+    eia: str,
+    irt_eia: pd.DataFrame,
+    personas_dist_eia: pl.DataFrame,
+    candidatos: tuple,
+    porcentajes: pl.Series,
+    num_cortes: int,
+):
+    """Mapa de Wright de un EIA con varios puntos de corte y sus bandas.
+    El porcentaje acumulado en cada candidato llega ya calculado, de modo que
+    mover un corte solo resta los porcentajes de los cortes elegidos.
+    """
+    st.markdown(f"## {eia}")
+    if len(candidatos) < num_cortes:
+        st.info(f"El EIA tiene menos de {num_cortes} dificultades distintas.")
+        return
+    # Controles de los puntos de corte, repartidos entre los marcadores
+    sel_cortes = []
+    for numero, columna in enumerate(st.columns(num_cortes), start=1):
+        with columna:
+            sel_cortes.append(
+                st.select_slider(
+                    f"Corte {numero}",
+                    options=candidatos,
+                    value=candidatos[numero * len(candidatos) // (num_cortes + 1)],
+                    key=f"corte_{numero}_{eia}",
+                )
+            )
+    sel_cortes = sorted(sel_cortes)
+    # Indicadores de población en cada banda
+    if len(set(sel_cortes)) < num_cortes:
+        st.warning("Los puntos de corte deben ser distintos.")
+    else:
+        acumulados = [porcentajes[candidatos.index(i)] for i in sel_cortes]
+        bandas = cortes.bandas(acumulados)
+        for numero, columna in enumerate(st.columns(num_cortes + 1), start=1):
+            columna.metric(f"Banda {numero}", value=f"{bandas[numero - 1]:.0f}%")
+    fig = crear_figura(
+        eia, irt_eia, personas_dist_eia, [max(i, 0) for i in sel_cortes]
+    )
+    with instrumentacion.etapa("plotly_chart", eia):
+        st.plotly_chart(fig, key=f"subplot_bandas_{eia}")
+    # Combinaciones de cortes más cercanas a una distribución objetivo
+    if st.checkbox(
+        "Buscar cortes por distribución objetivo.",
+        value=False,
+        key=f"check_objetivo_{eia}",
+    ):
+        objetivo = []
+        for numero, columna in enumerate(st.columns(num_cortes + 1), start=1):
+            with columna:
+                objetivo.append(
+                    st.number_input(
+                        f"Banda {numero} (%)",
+                        min_value=0.0,
+                        max_value=100.0,
+                        value=round(100 / (num_cortes + 1), 1),
+                        key=f"objetivo_{numero}_{eia}",
+                    )
+                )
+        sugeridas = cortes.buscar_cortes(porcentajes, objetivo).with_columns(
+            pl.col(f"corte_{numero}").replace_strict(
+                range(len(candidatos)), candidatos
+            )
+            for numero in range(1, num_cortes + 1)
+        )
+        with instrumentacion.etapa("st.dataframe", eia):
+            st.dataframe(sugeridas.with_columns(pl.col(pl.Float64).round(1)))
+
+
+irt = leer_irt()
+indice_cortes = leer_cortes()
 # Data personas
-personas = pd.read_parquet("data/personas.parquet")
-personas_dist = pd.read_parquet("data/personas_dist.parquet")
+personas = datos.leer_pandas("personas")
 # Elementos unicos
 procesos = irt["proceso"].unique()
 campos = irt["campo"].unique()
@@ -67,137 +304,44 @@ irt_filtro = irt.loc[
 personas_filtro = personas.loc[
     (personas["nivel"] == sel_nivel) & (personas["grado"] == sel_grado)
 ]
-personas_dist_filtro = personas_dist.loc[
-    (personas_dist["nivel"] == sel_nivel) & (personas_dist["grado"] == sel_grado)
-]
 eia_filtro = irt_filtro["eia"].unique()
 # Filtro de eia, proceso y campo
 with st.sidebar:
     sel_eia = st.multiselect("EIA", options=eia_filtro, default=eia_filtro)
     sel_proceso = st.multiselect("Proceso", options=procesos, default=procesos)
     sel_campo = st.multiselect("Campo formativo", options=campos, default=campos)
+    sel_ancho = st.select_slider(
+        "Ancho de barras de personas",
+        options=histogramas.anchos(),
+        value=histogramas.ANCHO_INICIAL,
+    )
+    sel_modo = st.radio("Modo", ["Un punto de corte", "Varios puntos de corte"])
+    if sel_modo == "Varios puntos de corte":
+        sel_num_cortes = st.selectbox("Número de puntos de corte", options=[3, 4])
 irt_filtro = irt_filtro.loc[
     (irt_filtro["eia"].isin(sel_eia))
     & (irt_filtro["proceso"].isin(sel_proceso))
     & (irt_filtro["campo"].isin(sel_campo))
 ]
 personas_filtro = personas_filtro[(personas_filtro["eia"].isin(sel_eia))]
-personas_dist_filtro = personas_dist_filtro[(personas_dist_filtro["eia"].isin(sel_eia))]
 # Genera elementos por cada eia seleccionado
 for eia in irt_filtro["eia"].unique():
-    st.markdown(f"## {eia}")
     irt_eia = irt_filtro.loc[irt_filtro["eia"] == eia]
     personas_eia = personas_filtro[personas_filtro["eia"] == eia]
-    personas_dist_eia = personas_dist_filtro[personas_dist_filtro["eia"] == eia]
-    dificultades = (
-        irt_eia.sort_values("dificultad").loc[:, "dificultad"].values.round(2)
-    )
-    # Controles de punto corte
-    col_1, col_2 = st.columns([0.7, 0.3])
-    with col_1:
-        sel_dif = st.select_slider(
-            "Punto de corte", options=dificultades, key=f"slider_{eia}"
+    personas_dist_eia = histogramas.leer_histograma(sel_nivel, sel_grado, eia, sel_ancho)
+    # Opciones del punto de corte y su cuantil, fuera del fragmento para no
+    # recalcularlas cada vez que se mueve el punto de corte
+    dificultades = irt_eia["dificultad"].sort_values().values.round(2)
+    llave = (sel_nivel, sel_grado, eia)
+    if sel_modo == "Un punto de corte":
+        cuantiles = indice_cortes.tabla(llave, dificultades, minimo=0)
+        seccion_eia(
+            eia, irt_eia, personas_eia, personas_dist_eia, dificultades, cuantiles
         )
-        if sel_dif < 0:
-            sel_dif = 0
-    # Indicador de población debajo del punto de corte
-    with col_2:
-        personas_cuantil = personas_eia.loc[
-            personas_eia["puntaje"] <= float(sel_dif), ["cuantil", "puntaje"]
-        ].reset_index(drop=True)
-        personas_cuantil.loc[:, "puntaje"] = personas_cuantil.loc[:, "puntaje"].round(3)
-        personas_cuantil_corte = personas_cuantil.iloc[-1]["cuantil"]
-        st.metric("Personas debajo del corte.", value=personas_cuantil_corte)
-    # Subplot mapa de Wright
-    fig = make_subplots(
-        rows=1,
-        cols=2,
-        column_widths=[0.75, 0.25],
-        subplot_titles=["Items", "Personas"],
-        shared_yaxes=True,
-        horizontal_spacing=0,
-    )
-    # Un trace de Scatter por cada nivel de respuesta
-    for resp in irt_eia["resp"].unique():
-        irt_resp = irt_eia.loc[irt_eia["resp"] == resp]
-        fig.add_trace(
-            go.Scatter(
-                x=irt_resp["item"],
-                y=irt_resp["dificultad"],
-                name=resp,
-                mode="markers+text",
-                text=irt_resp["dificultad"].round().astype(str),
-                textposition="top center",
-                hovertext=(
-                    irt_resp["criterio"].astype(str)
-                    + "<br>"
-                    + irt_resp["proceso"].astype("str")
-                    + "<br>"
-                    + irt_resp["campo"].astype("str")
-                ),
-                marker=dict(color=COLORES_RESP[resp]),
-            ),
-            row=1,
-            col=1,
+    else:
+        # Marcadores del método bookmark: las dificultades distintas en orden
+        candidatos = tuple(pd.unique(dificultades).tolist())
+        porcentajes = indice_cortes.porcentajes(llave, candidatos, minimo=0)
+        seccion_bandas(
+            eia, irt_eia, personas_dist_eia, candidatos, porcentajes, sel_num_cortes
         )
-    fig.update_xaxes(title_text="Criterios", row=1, col=1)
-    fig.update_yaxes(title_text="Dificultad")
-    # Trace de personas, en modo vertical
-    fig.add_trace(
-        go.Bar(
-            x=personas_dist_eia["conteo"],
-            y=personas_dist_eia["dificultad"],
-            marker=dict(color=COLOR_BARRA),
-            orientation="h",
-            showlegend=False,
-        ),
-        row=1,
-        col=2,
-    )
-    fig.update_xaxes(title_text="Conteo", row=1, col=2)
-    fig.update_yaxes(title_text="Habilidad", side="right", row=1, col=2)
-    # Lineas horizontales en scatter y bar
-    fig.add_hline(y=sel_dif, line_width=1.5, line_color=COLOR_LINEA, row=1, col=2)
-    fig.add_hline(
-        y=sel_dif,
-        line_width=1.5,
-        line_color=COLOR_LINEA,
-        row=1,
-        col=1,
-    )
-    # Layout general del subplot
-    fig.update_layout(
-        barmode="group",
-        bargap=0.0,
-        height=500,
-        margin=dict(t=25, b=15),
-    )
-    st.plotly_chart(fig, key=f"subplot_{eia}")
-    # Criterios arriba y debajo del corte
-    if st.checkbox(
-        "Mostrar tabla de criterios.", value=False, key=f"check_tabla_{eia}"
-    ):
-        irt_cuantil = irt_eia.sort_values("dificultad")
-        irt_cuantil.loc[:, "posicion"] = [
-            "Arriba" if i >= sel_dif else "Abajo" for i in irt_cuantil["dificultad"]
-        ]
-        st.markdown("### Posición de los criterios respecto al punto de corte.")
-        posiciones = st.multiselect(
-            "Mostrar sólo criterios que están:",
-            options=["Arriba", "Abajo"],
-            default=["Arriba", "Abajo"],
-            key=f"posicion_{eia}",
-        )
-        irt_cuantil = irt_cuantil[COLUMNAS_TABLA]
-        st.dataframe(irt_cuantil.loc[irt_cuantil["posicion"].isin(posiciones)])
-    # Tabla de cuantiles de personas
-    if st.checkbox(
-        "Mostrar cuantiles de personas.", value=False, key=f"check_tabla_persona_{eia}"
-    ):
-        persona_tabla = personas_eia
-        persona_tabla.loc[:, "puntaje"] = persona_tabla.loc[:, "puntaje"].round(2)
-        persona_tabla = (
-            persona_tabla[["cuantil", "puntaje"]].reset_index(drop=True).transpose()
-        )
-        st.markdown("### Cuantiles de habilidades de las personas.")
-        st.table(persona_tabla)
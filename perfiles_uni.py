@@ -3,6 +3,11 @@ import polars as pl
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+import cortes
+import datos
+import histogramas
+import instrumentacion
+
 NIVELES_GRADO = {
     "Preescolar": [3],
     "Primaria": [1, 2, 3, 4, 5, 6],
@@ -25,7 +30,6 @@ COLOR_LINEA = "#9b5de5"
 COLOR_BARRA = "#bfd3c1"
 RUTA_DICCIONARIO = "data/diccionario.parquet"
 RUTA_PERSONAS = "data/personas_uni.parquet"
-RUTA_PERSONAS_DIST = "data/personas_dist.parquet"
 RUTA_IRT = "data/item_irt_eia.parquet"
 DROP_DICCIONARIO = [
     "fase",
@@ -44,7 +48,7 @@ st.set_page_config(
 )
 
 
-@st.cache_data
+@datos.compartido
 def leer_irt(ruta_diccionario: str, ruta_irt: str) -> pl.DataFrame:
     """Diccionario de variables y lectura de irt."""
     diccionario = pl.read_parquet(RUTA_DICCIONARIO).drop(DROP_DICCIONARIO)
@@ -52,23 +56,22 @@ def leer_irt(ruta_diccionario: str, ruta_irt: str) -> pl.DataFrame:
     return irt
 
 
-@st.cache_data
+@datos.compartido
 def leer_personas(ruta_personas: str) -> pl.DataFrame:
     """Lectura de personas."""
     personas = pl.read_parquet(RUTA_PERSONAS)
     return personas
 
 
-@st.cache_data
-def leer_personas_dist(ruta_personas_dist: str) -> pl.DataFrame:
-    """Lectira de distribución de personas."""
-    personas_dist = pl.read_parquet(ruta_personas_dist)
-    return personas_dist
+@instrumentacion.cacheada(st.cache_resource)
+def leer_cortes(ruta_personas: str) -> cortes.IndiceCortes:
+    """Puntajes ordenados de personas por nivel y grado."""
+    return cortes.IndiceCortes(pl.read_parquet(ruta_personas), ["nivel", "grado"])
 
 
 irt = leer_irt(RUTA_DICCIONARIO, RUTA_IRT)
 personas = leer_personas(RUTA_PERSONAS)
-personas_dist = leer_personas_dist(RUTA_PERSONAS_DIST)
+indice_cortes = leer_cortes(RUTA_PERSONAS)
 
 # Elementos unicos
 procesos = irt["proceso"].unique()
@@ -90,15 +93,16 @@ personas_filtro = personas.filter(
     pl.col("nivel") == sel_nivel,
     pl.col("grado") == str(sel_grado),
 )
-personas_dist_filtro = personas_dist.filter(
-    pl.col("nivel") == sel_nivel,
-    pl.col("grado") == sel_grado,
-)
 
 # Filtro de eia, proceso y campo
 with st.sidebar:
     sel_proceso = st.multiselect("Proceso", options=procesos, default=procesos)
     sel_campo = st.multiselect("Campo formativo", options=campos, default=campos)
+    sel_ancho = st.select_slider(
+        "Ancho de barras de personas",
+        options=histogramas.anchos(),
+        value=histogramas.ANCHO_INICIAL,
+    )
 irt_filtro = irt_filtro.filter(
     pl.col("proceso").is_in(sel_proceso),
     pl.col("campo").is_in(sel_campo),
@@ -107,7 +111,9 @@ irt_filtro = irt_filtro.filter(
 # Genera elementos por cada eia seleccionado
 st.markdown(f"## Grado {sel_grado}")
 
-dificultades = irt_filtro.sort("dificultad")["dificultad"].round(2)
+dificultades = irt_filtro["dificultad"].sort().round(2)
+# Cuantil de personas de cada opción del punto de corte, por búsqueda binaria
+cuantiles = indice_cortes.tabla((sel_nivel, str(sel_grado)), dificultades)
 # Controles de punto corte
 puntaje_min = personas_filtro["puntaje"].min()
 puntaje_max = personas_filtro["puntaje"].max()
@@ -118,90 +124,82 @@ with col_1:
         "Punto de corte",
         options=dificultades,
     )
-    if sel_dif < puntaje_min:
-        sel_dif = puntaje_min
 # Indicador de población debajo del punto de corte
 with col_2:
-    personas_cuantil = personas_filtro.filter(
-        pl.col("puntaje") <= float(sel_dif)
-    ).select(["cuantil", "puntaje"])
-    personas_cuantil = personas_cuantil.with_columns(pl.col("puntaje").round(3))
-    personas_cuantil_corte = personas_cuantil["cuantil"].last()
-    st.metric("Personas debajo del corte.", value=personas_cuantil_corte)
+    st.metric("Personas debajo del corte.", value=cuantiles[sel_dif])
+if sel_dif < puntaje_min:
+    sel_dif = puntaje_min
 # Subplot mapa de Wright
-fig = make_subplots(
-    rows=1,
-    cols=2,
-    column_widths=[0.75, 0.25],
-    subplot_titles=["Items", "Personas"],
-    shared_yaxes=True,
-    horizontal_spacing=0,
-)
-# Un trace de Scatter por cada nivel de respuesta
-for resp in irt_filtro["resp"].unique(maintain_order=True):
-    irt_resp = irt_filtro.filter(pl.col("resp") == resp)
-    fig.add_trace(
-        go.Scatter(
-            x=irt_resp["item"],
-            y=irt_resp["dificultad"],
-            name=resp,
-            mode="markers+text",
-            text=irt_resp["dificultad"].round().cast(pl.String),
-            textposition="top center",
-            hovertext=(
-                irt_resp["criterio"].cast(pl.String)
-                + "<br>"
-                + irt_resp["proceso"].cast(pl.String)
-                + "<br>"
-                + irt_resp["campo"].cast(pl.String)
+with instrumentacion.etapa("make_subplots"):
+    fig = make_subplots(
+        rows=1,
+        cols=2,
+        column_widths=[0.75, 0.25],
+        subplot_titles=["Items", "Personas"],
+        shared_yaxes=True,
+        horizontal_spacing=0,
+    )
+    # Un trace de Scatter por cada nivel de respuesta
+    for resp in irt_filtro["resp"].unique(maintain_order=True):
+        irt_resp = irt_filtro.filter(pl.col("resp") == resp)
+        fig.add_trace(
+            go.Scatter(
+                x=irt_resp["item"],
+                y=irt_resp["dificultad"],
+                name=resp,
+                mode="markers+text",
+                text=irt_resp["dificultad"].round().cast(pl.String),
+                textposition="top center",
+                hovertext=(
+                    irt_resp["criterio"].cast(pl.String)
+                    + "<br>"
+                    + irt_resp["proceso"].cast(pl.String)
+                    + "<br>"
+                    + irt_resp["campo"].cast(pl.String)
+                ),
+                marker=dict(color=COLORES_RESP[resp]),
             ),
-            marker=dict(color=COLORES_RESP[resp]),
+            row=1,
+            col=1,
+        )
+    fig.update_xaxes(title_text="Criterios", row=1, col=1)
+    fig.update_yaxes(title_text="Dificultad")
+    # Trace de personas, en modo vertical
+    # Histograma entre los puntajes mínimo y máximo del grado
+    personas_dist_filtro = histogramas.leer_histograma(
+        sel_nivel, sel_grado, None, sel_ancho, limites=(puntaje_min, puntaje_max)
+    )
+    fig.add_trace(
+        go.Bar(
+            x=personas_dist_filtro["conteo"],
+            y=personas_dist_filtro["dificultad"],
+            marker=dict(color=COLOR_BARRA),
+            orientation="h",
+            showlegend=False,
         ),
         row=1,
+        col=2,
+    )
+    fig.update_xaxes(title_text="Conteo", row=1, col=2)
+    fig.update_yaxes(title_text="Habilidad", side="right", row=1, col=2)
+    # Lineas horizontales en scatter y bar
+    fig.add_hline(y=sel_dif, line_width=1.5, line_color=COLOR_LINEA, row=1, col=2)
+    fig.add_hline(
+        y=sel_dif,
+        line_width=1.5,
+        line_color=COLOR_LINEA,
+        row=1,
         col=1,
     )
-fig.update_xaxes(title_text="Criterios", row=1, col=1)
-fig.update_yaxes(title_text="Dificultad")
-# Trace de personas, en modo vertical
-# personas_dist_filtro
-personas_dist_filtro = personas_dist_filtro.filter(
-    pl.col("dificultad").is_between(
-        puntaje_min,
-        puntaje_max,
-        closed="none",
+    # Layout general del subplot
+    fig.update_layout(
+        barmode="group",
+        bargap=0.0,
+        height=500,
+        margin=dict(t=25, b=15),
     )
-)
-
-fig.add_trace(
-    go.Bar(
-        x=personas_dist_filtro["conteo"],
-        y=personas_dist_filtro["dificultad"],
-        marker=dict(color=COLOR_BARRA),
-        orientation="h",
-        showlegend=False,
-    ),
-    row=1,
-    col=2,
-)
-fig.update_xaxes(title_text="Conteo", row=1, col=2)
-fig.update_yaxes(title_text="Habilidad", side="right", row=1, col=2)
-# Lineas horizontales en scatter y bar
-fig.add_hline(y=sel_dif, line_width=1.5, line_color=COLOR_LINEA, row=1, col=2)
-fig.add_hline(
-    y=sel_dif,
-    line_width=1.5,
-    line_color=COLOR_LINEA,
-    row=1,
-    col=1,
-)
-# Layout general del subplot
-fig.update_layout(
-    barmode="group",
-    bargap=0.0,
-    height=500,
-    margin=dict(t=25, b=15),
-)
-st.plotly_chart(fig)
+with instrumentacion.etapa("plotly_chart"):
+    st.plotly_chart(fig)
 # Criterios arriba y debajo del corte
 if st.checkbox("Mostrar tabla de criterios.", value=False):
     irt_cuantil = irt_filtro.sort("dificultad")
@@ -219,7 +217,8 @@ if st.checkbox("Mostrar tabla de criterios.", value=False):
         default=["Arriba", "Abajo"],
     )
     irt_cuantil = irt_cuantil[COLUMNAS_TABLA]
-    st.dataframe(irt_cuantil.filter(pl.col("posicion").is_in(posiciones)))
+    with instrumentacion.etapa("st.dataframe"):
+        st.dataframe(irt_cuantil.filter(pl.col("posicion").is_in(posiciones)))
 # Tabla de cuantiles de personas
 if st.checkbox("Mostrar cuantiles de personas.", value=False):
     st.markdown("### Cuantiles de habilidades de las personas.")
@@ -231,4 +230,5 @@ if st.checkbox("Mostrar cuantiles de personas.", value=False):
         .reset_index(drop=True)
         .transpose()
     )
-    st.table(persona_tabla)
+    with instrumentacion.etapa("st.table"):
+        st.table(persona_tabla)
@@ -0,0 +1,41 @@
+"""Recorre las páginas sin navegador y escribe sus figuras en el almacén en disco.
+Se usa desde main.py, en procesos separados.
+"""
+
+from streamlit.testing.v1 import AppTest
+
+import cache_figuras
+from recorrido import CONTROLES, combinaciones, widget
+
+# Páginas cuyas figuras pasan por cache_figuras
+PAGINAS = [
+    "conteos.py",
+    "mapa_items.py",
+    "conteos_no_ponderados.py",
+    "conteos_ponderados_polars.py",
+    "medias.py",
+    "irt.py",
+]
+
+
+def precalcular(pagina: str, opcion, destino: str) -> int:
+    """Recorre las combinaciones de una página con su primer control en `opcion`.
+    Parameters:
+        pagina (str): Archivo de la página
+        opcion: Valor del primer control
+        destino (str): Directorio donde se escriben las figuras
+    Returns:
+        combinaciones (int): Número de combinaciones recorridas
+    """
+    cache_figuras.escritura = destino
+    app = AppTest.from_file(pagina, default_timeout=300)
+    app.run()
+    tipo, etiqueta = CONTROLES[pagina][0]
+    widget(app, tipo, etiqueta).set_value(opcion)
+    app.run()
+    total = 0
+    for _ in combinaciones(app, CONTROLES[pagina][1:]):
+        if app.exception:
+            raise RuntimeError(f"{pagina} {opcion}: {app.exception[0].message}")
+        total += 1
+    return total
@@ -0,0 +1,81 @@
+"""Recorre las combinaciones de controles de las páginas sin navegador, con AppTest.
+Lo usan el precálculo de figuras y la exportación de main.py, y los benchmarks.
+"""
+
+from streamlit.testing.v1 import AppTest
+
+# Controles de cada página como (tipo de widget en AppTest, etiqueta), en el
+# orden en que dependen entre sí (p. ej. los grados dependen del nivel). Los
+# selectbox definen los datos de la página; los demás cambian cómo se muestran
+CONTROLES = {
+    "conteos.py": [
+        ("selectbox", "Nivel"),
+        ("selectbox", "Grado"),
+        ("radio", "Ordenar por:"),
+    ],
+    "mapa_items.py": [("selectbox", "Nivel"), ("radio", "Ordenar por:")],
+    "conteos_items.py": [("selectbox", "EIA")],
+    "conteos_no_ponderados.py": [
+        ("selectbox", "EIA"),
+        ("button_group", "Sección"),
+    ],
+    "conteos_ponderados_polars.py": [
+        ("selectbox", "Servicio"),
+        ("selectbox", "EIA"),
+        ("button_group", "Sección"),
+    ],
+    "medias.py": [
+        ("selectbox", "Nivel"),
+        ("selectbox", "Grado"),
+        ("radio", "Ordenar por:"),
+        ("checkbox", "Limites 0-3"),
+    ],
+    "irt.py": [
+        ("selectbox", "Nivel"),
+        ("selectbox", "Grado"),
+        ("radio", "Ordenar por:"),
+        ("checkbox", "Limites 0-800"),
+    ],
+    "perfiles.py": [("selectbox", "Nivel"), ("selectbox", "Grado")],
+    "perfiles_uni.py": [("selectbox", "Nivel"), ("selectbox", "Grado")],
+}
+
+
+def filtros(pagina: str) -> list:
+    """Controles de la página que definen sus datos, sin los de presentación."""
+    return [i for i in CONTROLES[pagina] if i[0] == "selectbox"]
+
+
+def widget(app: AppTest, tipo: str, etiqueta: str):
+    """Widget de la página con la etiqueta dada, None si no se mostró."""
+    return next((i for i in app.get(tipo) if i.label == etiqueta), None)
+
+
+def combinaciones(app: AppTest, controles: list, seleccion: tuple = ()):
+    """Recorre las opciones de cada control, dejando la app en cada combinación.
+    Yields:
+        seleccion (tuple): Pares (etiqueta, opción) de la combinación actual
+    """
+    if not controles:
+        yield seleccion
+        return
+    tipo, etiqueta = controles[0]
+    actual = widget(app, tipo, etiqueta)
+    if actual is None:
+        yield from combinaciones(app, controles[1:], seleccion)
+        return
+    opciones = [False, True] if tipo == "checkbox" else list(actual.options)
+    for opcion in opciones:
+        widget(app, tipo, etiqueta).set_value(opcion)
+        app.run()
+        yield from combinaciones(
+            app, controles[1:], seleccion + ((etiqueta, opcion),)
+        )
+
+
+def primeras_opciones(pagina: str) -> list:
+    """Opciones del primer control de la página, para repartir el trabajo."""
+    app = AppTest.from_file(pagina, default_timeout=300)
+    app.run()
+    tipo, etiqueta = CONTROLES[pagina][0]
+    return list(widget(app, tipo, etiqueta).options)
@@ -1,63 +1,456 @@
+import argparse
+import os
+import uuid
+from textwrap import wrap
+from urllib.parse import quote
+
 import pyarrow
 import polars as pl
 
-PROCESOS = [
-    "No definido",
-    "Comprensión",
-    "Utilización del conocimiento",
-    "Propuesta de solución",
-    "Juicio crítico",
-]
+import esquema
+from construccion import Etapa, ejecutar
 
-CAMPOS = [
-        "Lenguajes",
-        "Saberes y pensamiento científico",
-        "De lo humano y lo comunitario",
-        "Ética, naturaleza y sociedades",
+ENTRADAS = {
+    "diccionario": "data/diccionario.parquet",
+    "rubrica": "data/diccionario_rubrica.parquet",
+    "medias": "data/item_medias.parquet",
+    "irt": "data/item_irt_eia.parquet",
+    "conteo": "data/item_conteo_grado.parquet",
+    "conteo_nacional": "data/item_conteo_nacional.parquet",
+    "conteo_ponderado": "data/item_conteo_ponderado.parquet",
+}
+INTERMEDIOS = {
+    "conteo_base": "data/intermedios/conteo_base.parquet",
+    "medias": "data/intermedios/medias.parquet",
+    "irt": "data/intermedios/irt.parquet",
+}
+FILAS_ROW_GROUP = 2048
+RUTA_CONTEO = "data/st_conteo.parquet"
+RUTA_HECHOS = "data/st_conteo_hechos.parquet"
+RUTA_ITEMS = "data/st_items.parquet"
+RUTA_RUBRICA = "data/st_rubrica.parquet"
+# Conteos de cada fuente con item_id y el esquema canónico, para las páginas
+CONTEOS_TIPADOS = {
+    "st_conteo_grado": ("conteo", "data/st_conteo_grado.parquet"),
+    "st_conteo_nacional": ("conteo_nacional", "data/st_conteo_nacional.parquet"),
+    "st_conteo_ponderado": ("conteo_ponderado", "data/st_conteo_ponderado.parquet"),
+}
+RUTA_PARTICIONES = "data/st_conteo_hechos"
+# Ola (aplicación) de los conteos de ENTRADAS en el dataset particionado. Cada
+# renglón de las particiones lleva su ola en la columna ola
+OLA_INICIAL = "2024"
+# Textos largos que se guardan una vez por item o por item y respuesta en las
+# tablas de dimensiones, en lugar de repetirse en cada renglón de los conteos
+COLS_TEXTO = [
+    "contenido",
+    "pda_grado",
+    "pda",
+    "descriptor",
+    "criterio",
+    "n0",
+    "n1",
+    "n2",
+    "n3",
 ]
+COLS_TEXTO_RESP = ["resp_rubrica", "resp_nivel"]
+COLS_PARTICION = ["nivel", "grado", "eia_clave"]
+COLORES_CAMPO = {
+    "LEN": "#c00000",
+    "SPC": "#0070c0",
+    "ENS": "#00b050",
+    "HYC": "#7030a0",
+}
+# Caracteres por renglón de los títulos de criterio en las gráficas de conteos
+ANCHOS_CRITERIO = [18, 24]
+# Particiones con archivos más chicos que esto se unen al consolidar
+BYTES_MIN_ARCHIVO = 1024**2
+
+
+def crear_conteo_base():
+    """Une conteos por grado con el diccionario y las rúbricas."""
+    # Diccionario de variables
+    diccionario = pl.read_parquet(ENTRADAS["diccionario"]).drop(
+        ["fase", "nivel", "grado"]
+    )
+    # Data de rubricas
+    rubrica = pl.read_parquet(ENTRADAS["rubrica"])
+    # Data de conteos
+    conteo = (
+        pl.read_parquet(ENTRADAS["conteo"])
+        .join(diccionario, how="inner", on="item")
+        .join(rubrica, how="inner", on=["item", "resp"])
+    )
+    conteo = esquema.aplicar(conteo, "st_conteo")
+    conteo.write_parquet(INTERMEDIOS["conteo_base"])
+
+
+def crear_medias_irt():
+    """Medias y dificultades irt con grado del mismo tipo que los conteos."""
+    # Data de medias
+    medias = esquema.aplicar(pl.read_parquet(ENTRADAS["medias"]), "medias")
+    # data irt
+    irt = esquema.aplicar(pl.read_parquet(ENTRADAS["irt"]), "irt")
+    medias.write_parquet(INTERMEDIOS["medias"])
+    irt.write_parquet(INTERMEDIOS["irt"])
+
+
+def crear_conteo():
+    """Agrega al conteo base los auxiliares de orden, medias e irt."""
+    conteo = pl.read_parquet(INTERMEDIOS["conteo_base"])
+    medias = pl.read_parquet(INTERMEDIOS["medias"])
+    irt = pl.read_parquet(INTERMEDIOS["irt"])
+    # Auxiliares para ordenar por nivel de respuesta
+    nivel_0 = (
+        conteo.filter(pl.col("resp") == "N0")
+        .select(["item", "grado", "prop"])
+        .rename({"prop": "nivel_0"})
+    )
+    nivel_3 = (
+        conteo.filter(pl.col("resp") == "N3")
+        .select(["item", "grado", "prop"])
+        .rename({"prop": "nivel_3"})
+    )
+    # Union con conteos
+    conteo = (
+        conteo.join(nivel_0, how="left", on=["item", "grado"])
+        .join(nivel_3, how="left", on=["item", "grado"])
+        .join(medias, how="left", on=["item", "grado"])
+        .join(irt, how="left", on=["item", "grado", "resp"])
+    )
+    # Ordenado por nivel y grado para que cada row group cubra pocos grados y sus
+    # estadísticas permitan a scan_parquet descartar los que no se filtran
+    conteo = conteo.sort(["nivel", "grado", "eia_clave", "item", "resp"])
+    escribir_conteo(esquema.aplicar(conteo, "st_conteo"))
+
+
+def etiquetas_criterio(items: pl.DataFrame) -> pl.DataFrame:
+    """Agrega los títulos html de cada criterio que usan las gráficas de conteos.
+    criterio_color lleva el campo formativo con su color antes del criterio, y
+    criterio_18 y criterio_24 el criterio truncado a tres renglones de ese ancho.
+    Cada criterio distinto se parte una sola vez, al construir la tabla.
+    """
+    campo_color = pl.format(
+        '<span style="color:{};">{}</span><br>',
+        pl.col("campo_clave").cast(pl.String).replace_strict(COLORES_CAMPO),
+        "campo_clave",
+    )
+    criterios = items["criterio"].drop_nulls().unique().to_list()
+    columnas = [pl.concat_str(campo_color, "criterio").alias("criterio_color")]
+    for ancho in ANCHOS_CRITERIO:
+        partidos = {
+            i: "<br>".join(wrap(i, width=ancho, max_lines=3, placeholder="..."))
+            for i in criterios
+        }
+        columnas.append(
+            pl.concat_str(
+                campo_color, pl.col("criterio").replace_strict(partidos, default=None)
+            ).alias(f"criterio_{ancho}")
+        )
+    return items.with_columns(columnas)
+
+
+def crear_dimensiones():
+    """Tablas de items y de rúbricas, con un id entero por item."""
+    # El grado del diccionario es una etiqueta (p. ej. "3° y 4°"), los grados
+    # de aplicación vienen en los conteos
+    items = (
+        pl.read_parquet(ENTRADAS["diccionario"])
+        .drop("grado")
+        .sort("item")
+        .with_row_index("item_id")
+    )
+    items = etiquetas_criterio(esquema.aplicar(items, "st_items"))
+    rubrica = (
+        pl.read_parquet(ENTRADAS["rubrica"])
+        .join(items.select(["item", "item_id"]), how="inner", on="item")
+        .select(["item_id", "resp", *COLS_TEXTO_RESP])
+    )
+    rubrica = esquema.aplicar(rubrica, "st_rubrica").sort(["item_id", "resp"])
+    items.write_parquet(RUTA_ITEMS)
+    rubrica.write_parquet(RUTA_RUBRICA)
+
+
+def crear_hechos():
+    """Conteos sin textos largos, con item_id para unir las dimensiones."""
+    items = pl.read_parquet(RUTA_ITEMS).select(["item", "item_id"])
+    hechos = (
+        pl.read_parquet(RUTA_CONTEO)
+        .drop([*COLS_TEXTO, *COLS_TEXTO_RESP])
+        .join(items, how="inner", on="item")
+    )
+    hechos = esquema.aplicar(
+        hechos.select(["item_id", *hechos.columns[:-1]]), "st_conteo_hechos"
+    )
+    escribir_conteo(hechos, RUTA_HECHOS)
+    # datos.escanear prefiere el dataset particionado si existe, así que se
+    # actualiza junto con el archivo para que no sirva conteos viejos
+    if os.path.isdir(RUTA_PARTICIONES):
+        escribir_particiones(hechos.with_columns(ola=pl.lit(OLA_INICIAL)))
+
+
+def crear_hechos_particionado():
+    """Como crear_hechos, creando también el dataset particionado."""
+    os.makedirs(RUTA_PARTICIONES, exist_ok=True)
+    crear_hechos()
+
+
+def crear_conteos_tipados():
+    """Conteos por grado, nacionales y ponderados con item_id y tipos canónicos."""
+    items = pl.read_parquet(RUTA_ITEMS).select(["item", "item_id"])
+    for nombre, (entrada, ruta) in CONTEOS_TIPADOS.items():
+        conteo = pl.read_parquet(ENTRADAS[entrada]).join(
+            items, how="inner", on="item"
+        )
+        conteo = conteo.select(["item_id", *conteo.columns[:-1]])
+        conteo = esquema.aplicar(conteo, nombre)
+        orden = [
+            i
+            for i in ["nivel", "grado", "servicio", "item", "resp"]
+            if i in conteo.columns
+        ]
+        escribir_conteo(conteo.sort(orden), ruta)
+
 
-# Diccionario de variables
-diccionario = pl.read_parquet("data/diccionario.parquet").drop(
-    ["fase", "nivel", "grado"]
-)
-# Data de rubricas
-rubrica = pl.read_parquet("data/diccionario_rubrica.parquet")
-# Data de medias
-medias = pl.read_parquet("data/item_medias.parquet").with_columns(
-    pl.col("grado").cast(pl.Int32)
-)
-# data irt
-irt = pl.read_parquet("data/item_irt_eia.parquet").with_columns(
-    pl.col("grado").cast(pl.Int32)
-)
-# Data de conteos
-conteo = (
-    pl.read_parquet("data/item_conteo_grado.parquet")
-    .join(diccionario, how="inner", on="item")
-    .join(rubrica, how="inner", on=["item", "resp"])
-    .with_columns(
-        pl.col("proceso").cast(pl.Enum(PROCESOS)),
-        pl.col("campo").cast(pl.Enum(CAMPOS)),
+def escribir_conteo(conteo: pl.DataFrame, ruta: str = RUTA_CONTEO):
+    """Escribe el conteo como un solo archivo parquet."""
+    conteo.write_parquet(ruta, statistics=True, row_group_size=FILAS_ROW_GROUP)
+
+
+def ruta_particion(ruta: str, valores: tuple) -> str:
+    """Directorio hive de una partición, p. ej. ruta/nivel=Primaria/grado=1/..."""
+    niveles = [
+        f"{col}={quote(str(valor), safe='')}"
+        for col, valor in zip(COLS_PARTICION, valores)
+    ]
+    return os.path.join(ruta, *niveles)
+
+
+def archivos_particiones(ruta: str = RUTA_PARTICIONES) -> list:
+    """Archivos parquet de todas las particiones del dataset."""
+    return sorted(
+        os.path.join(directorio, i)
+        for directorio, _, archivos in os.walk(ruta)
+        for i in archivos
+        if i.endswith(".parquet")
+    )
+
+
+def quitar_olas(olas: list, ruta: str = RUTA_PARTICIONES) -> int:
+    """Quita del dataset particionado los renglones de las olas dadas.
+    Parameters:
+        olas (list): Olas que se quitan
+        ruta (str): Directorio raíz del dataset
+    Returns:
+        reescritos (int): Cantidad de archivos reescritos o borrados
+    Raises:
+        ValueError: Si algún archivo no tiene columna ola
+    """
+    reescritos = 0
+    for archivo in archivos_particiones(ruta):
+        if "ola" not in pl.read_parquet_schema(archivo):
+            raise ValueError(
+                f"{archivo} no tiene columna ola, reconstruya el dataset con "
+                "transform_conteos.py --particionado --forzar"
+            )
+        particion = pl.read_parquet(archivo)
+        restantes = particion.filter(~pl.col("ola").is_in(olas))
+        if restantes.height == particion.height:
+            continue
+        if not restantes.is_empty():
+            restantes.write_parquet(
+                os.path.join(os.path.dirname(archivo), f"{uuid.uuid4().hex}.parquet"),
+                statistics=True,
+                row_group_size=FILAS_ROW_GROUP,
+            )
+        os.remove(archivo)
+        reescritos += 1
+    return reescritos
+
+
+def escribir_particiones(conteo: pl.DataFrame, ruta: str = RUTA_PARTICIONES):
+    """Escribe el conteo en el dataset particionado nivel=/grado=/eia_clave=.
+    Cada ola del conteo reemplaza a la misma ola en el dataset, de modo que
+    volver a escribir una ola no duplica renglones; las demás olas se conservan.
+    Parameters:
+        conteo (pl.DataFrame): Conteo o tabla de hechos con columna ola
+        ruta (str): Directorio raíz del dataset
+    Raises:
+        ValueError: Si el conteo no tiene columna ola
+    """
+    if "ola" not in conteo.columns:
+        raise ValueError("El conteo no tiene columna ola")
+    quitar_olas(conteo["ola"].unique().to_list(), ruta)
+    nombre = f"{uuid.uuid4().hex}.parquet"
+    # Las columnas de partición se leen de la ruta, no se guardan en los archivos
+    particiones = conteo.partition_by(COLS_PARTICION, as_dict=True, include_key=False)
+    for valores, particion in particiones.items():
+        directorio = ruta_particion(ruta, valores)
+        os.makedirs(directorio, exist_ok=True)
+        particion.write_parquet(
+            os.path.join(directorio, nombre),
+            statistics=True,
+            row_group_size=FILAS_ROW_GROUP,
+        )
+
+
+def agregar_ola(ruta_ola: str) -> pl.DataFrame:
+    """Escribe en las particiones los hechos de una ola nueva o corregida.
+    Parameters:
+        ruta_ola (str): Parquet con las columnas de st_conteo_hechos y ola
+    Returns:
+        hechos (pl.DataFrame): Hechos escritos, con el esquema canónico
+    Raises:
+        ValueError: Si las columnas no son las de la tabla de hechos más ola
+    """
+    hechos = pl.read_parquet(ruta_ola)
+    esperadas = {*pl.read_parquet_schema(RUTA_HECHOS), "ola"}
+    if set(hechos.columns) != esperadas:
+        raise ValueError(
+            f"{ruta_ola} debe tener las columnas {sorted(esperadas)}, "
+            f"tiene {sorted(hechos.columns)}"
         )
-)
-# Auxiliares para ordenar por nivel de respuesta
-nivel_0 = (
-    conteo.filter(pl.col("resp") == "N0")
-    .select(["item", "grado", "prop"])
-    .rename({"prop": "nivel_0"})
-)
-nivel_3 = (
-    conteo.filter(pl.col("resp") == "N3")
-    .select(["item", "grado", "prop"])
-    .rename({"prop": "nivel_3"})
-)
-# Union con conteos
-conteo = (
-    conteo.join(nivel_0, how="left", on=["item", "grado"])
-    .join(nivel_3, how="left", on=["item", "grado"])
-    .join(medias, how="left", on=["item", "grado"])
-    .join(irt, how="left", on=["item", "grado", "resp"])
-    .with_columns(pl.col("resp").cast(pl.Enum(["N0", "N1", "N2", "N3"])))
-)
-
-conteo.write_parquet("data/st_conteo.parquet")
\ No newline at end of file
+    hechos = esquema.aplicar(hechos, "st_conteo_hechos")
+    escribir_particiones(hechos)
+    return hechos
+
+
+def consolidar_particiones(
+    ruta: str = RUTA_PARTICIONES, bytes_min: int = BYTES_MIN_ARCHIVO
+) -> int:
+    """Une en un solo archivo los archivos chicos de cada partición.
+    Cada ola escrita con escribir_particiones deja un archivo en cada
+    partición; leer muchos archivos pequeños cuesta más que leer uno solo.
+    Parameters:
+        ruta (str): Directorio raíz del dataset
+        bytes_min (int): Solo se unen los archivos más chicos que esto
+    Returns:
+        consolidadas (int): Cantidad de particiones reescritas
+    """
+    consolidadas = 0
+    for directorio, _, archivos in os.walk(ruta):
+        chicos = [
+            os.path.join(directorio, i)
+            for i in archivos
+            if i.endswith(".parquet")
+            and os.path.getsize(os.path.join(directorio, i)) < bytes_min
+        ]
+        if len(chicos) < 2:
+            continue
+        unido = pl.concat([pl.read_parquet(i) for i in chicos], how="vertical")
+        unido.write_parquet(
+            os.path.join(directorio, f"{uuid.uuid4().hex}.parquet"),
+            statistics=True,
+            row_group_size=FILAS_ROW_GROUP,
+        )
+        for i in chicos:
+            os.remove(i)
+        consolidadas += 1
+    return consolidadas
+
+
+def etapas(particionado: bool = False) -> list:
+    """Etapas de construcción de st_conteo y sus dependencias."""
+    return [
+        Etapa(
+            "conteo_base",
+            crear_conteo_base,
+            entradas=[
+                ENTRADAS["conteo"],
+                ENTRADAS["diccionario"],
+                ENTRADAS["rubrica"],
+            ],
+            salidas=[INTERMEDIOS["conteo_base"]],
+            modulos=[esquema],
+        ),
+        Etapa(
+            "medias_irt",
+            crear_medias_irt,
+            entradas=[ENTRADAS["medias"], ENTRADAS["irt"]],
+            salidas=[INTERMEDIOS["medias"], INTERMEDIOS["irt"]],
+            modulos=[esquema],
+        ),
+        Etapa(
+            "st_conteo",
+            crear_conteo,
+            entradas=[
+                INTERMEDIOS["conteo_base"],
+                INTERMEDIOS["medias"],
+                INTERMEDIOS["irt"],
+            ],
+            salidas=[RUTA_CONTEO],
+            modulos=[esquema],
+        ),
+        Etapa(
+            "dimensiones",
+            crear_dimensiones,
+            entradas=[ENTRADAS["diccionario"], ENTRADAS["rubrica"]],
+            salidas=[RUTA_ITEMS, RUTA_RUBRICA],
+            modulos=[esquema],
+        ),
+        Etapa(
+            "st_conteo_hechos",
+            crear_hechos_particionado if particionado else crear_hechos,
+            entradas=[RUTA_CONTEO, RUTA_ITEMS],
+            salidas=[RUTA_HECHOS, RUTA_PARTICIONES] if particionado else [RUTA_HECHOS],
+            modulos=[esquema],
+        ),
+        Etapa(
+            "conteos_tipados",
+            crear_conteos_tipados,
+            entradas=[
+                ENTRADAS["conteo"],
+                ENTRADAS["conteo_nacional"],
+                ENTRADAS["conteo_ponderado"],
+                RUTA_ITEMS,
+            ],
+            salidas=[ruta for _, ruta in CONTEOS_TIPADOS.values()],
+            modulos=[esquema],
+        ),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Crea st_conteo y sus tablas de hechos y dimensiones."
+    )
+    parser.add_argument(
+        "--particionado",
+        action="store_true",
+        help=f"Escribe también el dataset particionado en {RUTA_PARTICIONES}/",
+    )
+    parser.add_argument(
+        "--agregar",
+        metavar="RUTA",
+        help=(
+            "Parquet con los hechos de una ola y su columna ola; reemplaza esa "
+            "ola en las particiones sin tocar las demás"
+        ),
+    )
+    parser.add_argument(
+        "--consolidar",
+        action="store_true",
+        help="Une los archivos chicos de cada partición",
+    )
+    parser.add_argument(
+        "--forzar",
+        action="store_true",
+        help="Reconstruye todas las etapas aunque sus entradas no hayan cambiado",
+    )
+    args = parser.parse_args()
+
+    if args.agregar:
+        hechos = agregar_ola(args.agregar)
+        olas = ", ".join(hechos["ola"].unique().sort().to_list())
+        print(f"Olas escritas en {RUTA_PARTICIONES}: {olas}")
+    else:
+        resultados = ejecutar(etapas(args.particionado), forzar=args.forzar)
+        for i in resultados:
+            estado = "ejecutada" if i["ejecutada"] else "sin cambios"
+            print(f"{i['nombre']:<24} {estado:<12} {i['segundos']:.3f} s")
+    if args.consolidar:
+        consolidadas = consolidar_particiones()
+        print(f"Particiones consolidadas: {consolidadas}")
+
+
+if __name__ == "__main__":
+    main()